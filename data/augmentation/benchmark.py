@@ -0,0 +1,179 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Benchmark of the damage mask generators and the alpha blending of fusion.py.
+
+fusion.py generates the mask of a damage patch at the patch resolution (after the resize), instead of at the
+resolution of the damage image followed by a resize. For every mask mode this script times both orders and
+checks that the resulting masks are statistically equivalent, pixel by pixel: the mean mask value, the
+fraction of pixels where the damage stays visible (>= 16, the faint blur tails below that are not) and the
+fraction the mask keeps mostly opaque (>= 128), averaged over
+--samples masks. A statistic is equivalent when both orders differ by less than --tolerance relative to the
+full-resolution value (the stripes cover well under 1% of the mask, an absolute tolerance would accept any
+stripe), or by less than three standard errors.
+
+For the blending it reports the megapixels (of damage patch) per second of blend_damage_patch, which blends in
+fixed point in place, against the float32 blend it replaced, and the largest difference between the two.
+
+Parameters:
+  --damage_size      : Width and height of the damage image (default: 1200 900).
+  --scale            : Size of the patch relative to the damage image (default: 0.4).
+  --samples          : Number of masks per mode and order (default: 200).
+  --tolerance        : Largest accepted relative difference of a statistic (default: 0.05).
+  --seed             : Random seed (default: 0).
+  --tombstone_size   : Width and height of the tombstone image of the blending benchmark (default: 3000 4000).
+  --patch_scale      : Size of the blended patch relative to the tombstone image (default: 0.65).
+  --repeats          : Number of blends per implementation (default: 20).
+
+Example:
+  python benchmark.py --damage_size 2000 1500 --scale 0.3
+"""
+
+import time
+import random
+import argparse
+import numpy as np
+import cv2
+
+from fusion import create_complex_mask, blend_damage_patch
+
+MODES = ["cloud", "stripe", "irregular"]
+STATISTICS = ["mean", "visible", "opaque"]
+
+
+def mask_statistics(mask):
+    """Mean value (0-1), fraction of pixels >= 16 and fraction of pixels >= 128 of a uint8 mask"""
+    return mask.mean() / 255.0, np.count_nonzero(mask >= 16) / mask.size, np.count_nonzero(mask >= 128) / mask.size
+
+
+def full_resolution_mask(damage_size, patch_size, mode):
+    """Mask at the damage image resolution, resized to the patch (the original order)"""
+    mask = create_complex_mask(damage_size[1], damage_size[0], mode=mode)
+    return cv2.resize(mask, patch_size, interpolation=cv2.INTER_AREA)
+
+
+def patch_resolution_mask(damage_size, patch_size, mode):
+    """Mask generated directly at the patch resolution"""
+    scale = np.sqrt(patch_size[0] / damage_size[0] * patch_size[1] / damage_size[1])
+    return create_complex_mask(patch_size[1], patch_size[0], mode=mode, scale=scale)
+
+
+def run(generate, damage_size, patch_size, mode, samples, seed):
+    """
+    Generate samples masks, returns the seconds per mask and an array (samples x statistics).
+    Mask i is generated from seed + i, so both orders draw the same shapes (except for the cloud noise).
+    """
+    stats = []
+    seconds = 0.0
+    for i in range(samples):
+        random.seed(seed + i)
+        np.random.seed(seed + i)
+        start = time.perf_counter()
+        mask = generate(damage_size, patch_size, mode)
+        seconds += time.perf_counter() - start
+        stats.append(mask_statistics(mask))
+    return seconds / samples, np.array(stats)
+
+
+def compare(reference, candidate, tolerance):
+    """
+    Per statistic: reference mean, candidate mean, difference and whether they are equivalent, i.e. differ by
+    at most tolerance times the reference mean or three standard errors
+    """
+    rows = []
+    n = len(reference)
+    for i, name in enumerate(STATISTICS):
+        ref, cand = reference[:, i], candidate[:, i]
+        diff = cand.mean() - ref.mean()
+        se = np.sqrt(ref.var(ddof=1) / n + cand.var(ddof=1) / n)
+        rows.append((name, ref.mean(), cand.mean(), diff, abs(diff) <= max(tolerance * abs(ref.mean()), 3 * se)))
+    return rows
+
+
+def float_blend(tombstone_img, damage_img, overall_alpha):
+    """The float32 blend_damage_patch fusion.py used before, as a reference"""
+    th, tw, _ = tombstone_img.shape
+    ph, pw, _ = damage_img.shape
+    x = random.randint(0, th - ph)
+    y = random.randint(0, tw - pw)
+    roi = tombstone_img[x:x + ph, y:y + pw].astype(np.float32)
+    damage_bgr = damage_img[:, :, :3].astype(np.float32)
+    damage_alpha = (damage_img[:, :, 3].astype(np.float32) / 255.0) * overall_alpha
+    damage_alpha = np.expand_dims(damage_alpha, axis=2)
+    blended = (1 - damage_alpha) * roi + damage_alpha * damage_bgr
+    tombstone_img[x:x + ph, y:y + pw] = blended.astype(np.uint8)
+    return tombstone_img
+
+
+def run_blend(blend, tombstone_img, damage_img, overall_alpha, repeats, seed):
+    """Blend damage_img repeats times onto copies of tombstone_img, returns megapixels per second and the last output"""
+    seconds = 0.0
+    output = None
+    for i in range(repeats):
+        output = tombstone_img.copy()
+        random.seed(seed + i)
+        start = time.perf_counter()
+        output = blend(output, damage_img, overall_alpha)
+        seconds += time.perf_counter() - start
+    megapixels = damage_img.shape[0] * damage_img.shape[1] * repeats / 1e6
+    return megapixels / seconds, output
+
+
+def benchmark_blend(tombstone_size, patch_scale, repeats, seed):
+    rng = np.random.default_rng(seed)
+    tw, th = tombstone_size
+    tombstone_img = rng.integers(0, 256, size=(th, tw, 3), dtype=np.uint8)
+    damage_img = rng.integers(0, 256, size=(int(th * patch_scale), int(tw * patch_scale), 4), dtype=np.uint8)
+    overall_alpha = 0.7
+    print(f"\nBlending a {damage_img.shape[1]}x{damage_img.shape[0]} patch onto a {tw}x{th} tombstone, "
+          f"{repeats} times")
+    float_speed, float_output = run_blend(float_blend, tombstone_img, damage_img, overall_alpha, repeats, seed)
+    fixed_speed, fixed_output = run_blend(blend_damage_patch, tombstone_img, damage_img, overall_alpha, repeats,
+                                          seed)
+    diff = np.abs(float_output.astype(np.int16) - fixed_output)
+    print(f"  float32     {float_speed:8.1f} MP/s")
+    print(f"  fixed point {fixed_speed:8.1f} MP/s ({fixed_speed / float_speed:.1f}x)")
+    print(f"  max difference {diff.max()}, pixels differing {np.count_nonzero(diff) / diff.size:.1%}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the damage mask generators of fusion.py.")
+    parser.add_argument("--damage_size", type=int, nargs=2, default=[1200, 900],
+                        help="Width and height of the damage image (default: 1200 900)")
+    parser.add_argument("--scale", type=float, default=0.4,
+                        help="Size of the patch relative to the damage image (default: 0.4)")
+    parser.add_argument("--samples", type=int, default=200,
+                        help="Number of masks per mode and order (default: 200)")
+    parser.add_argument("--tolerance", type=float, default=0.05,
+                        help="Largest accepted relative difference of a statistic (default: 0.05)")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed (default: 0)")
+    parser.add_argument("--tombstone_size", type=int, nargs=2, default=[3000, 4000],
+                        help="Width and height of the tombstone image of the blending benchmark (default: 3000 4000)")
+    parser.add_argument("--patch_scale", type=float, default=0.65,
+                        help="Size of the blended patch relative to the tombstone image (default: 0.65)")
+    parser.add_argument("--repeats", type=int, default=20,
+                        help="Number of blends per implementation (default: 20)")
+    args = parser.parse_args()
+
+    damage_size = tuple(args.damage_size)
+    patch_size = (int(damage_size[0] * args.scale), int(damage_size[1] * args.scale))
+    print(f"Damage image {damage_size[0]}x{damage_size[1]}, patch {patch_size[0]}x{patch_size[1]}, "
+          f"{args.samples} masks per mode")
+    all_equivalent = True
+    for mode in MODES:
+        full_seconds, full_stats = run(full_resolution_mask, damage_size, patch_size, mode, args.samples,
+                                       args.seed)
+        patch_seconds, patch_stats = run(patch_resolution_mask, damage_size, patch_size, mode, args.samples,
+                                         args.seed)
+        print(f"\n{mode}: {full_seconds * 1000:.2f} ms -> {patch_seconds * 1000:.2f} ms per mask "
+              f"({full_seconds / patch_seconds:.1f}x)")
+        for name, ref, cand, diff, equivalent in compare(full_stats, patch_stats, args.tolerance):
+            all_equivalent &= equivalent
+            print(f"  {name:8s} full {ref:.4f}  patch {cand:.4f}  diff {diff:+.4f} ({diff / ref:+.1%})  "
+                  f"{'ok' if equivalent else 'DIFFERENT'}")
+    print("\nAll masks statistically equivalent." if all_equivalent else "\nSome masks differ, see above.")
+    benchmark_blend(tuple(args.tombstone_size), args.patch_scale, args.repeats, args.seed)
+
+
+if __name__ == "__main__":
+    main()
@@ -26,13 +26,29 @@ Parameters:
   --alpha_min        : Minimum overall alpha blending value for damage (default: 0.5).
   --alpha_max        : Maximum overall alpha blending value for damage (default: 0.8).
   --mask_mode        : Mode for mask generation: "cloud", "stripe", "irregular" or "random" (default: random).
+  --pool_size        : Number of pre-masked damage variants kept per damage image (default: 0, a new mask is
+                       generated for every overlay).
+  --workers          : Number of worker processes (default: 0, all images in this process). With --workers N
+                       every image is seeded from its file name and --seed, so the output does not depend on N.
+  --seed             : Base seed of the per-image seeds and of the mask pool (default: 42).
+
+Every damage image is read and made transparent only once (see OverlayBank), instead of once per overlay.
+Damage images larger than their patch are resized before they are masked, so masks are generated at the
+(smaller) patch resolution, with kernel sizes and stripe thickness scaled along; benchmark.py compares both.
+
+To use augmented images without writing them to disk (e.g. for inference or fine-tuning data), import
+AugmentedImages, which augments and encodes them lazily.
 """
 
 import os
 import cv2
+import zlib
 import random
 import argparse
 import numpy as np
+import multiprocessing as mp
+from functools import lru_cache
+from collections import OrderedDict
 
 random.seed(42)
 
@@ -49,11 +65,43 @@ def create_transparent_overlay(damage_img, bg_color=(255, 255, 255), threshold=3
     return damage_bgra
 
 
-def create_irregular_mask(h, w, perturbation=0.5, blur_kernel=(9, 9)):
+def _blur(mask, kernel, scale=1.0):
+    """
+    Gaussian blur with a kernel size given in damage-image pixels. At scale != 1 the kernel and the sigma
+    OpenCV derives from it are scaled along, so the blur covers the same part of the damage image.
+    """
+    if scale == 1:
+        return cv2.GaussianBlur(mask, kernel, 0)
+    # sigma OpenCV uses for sigma=0, see cv2.getGaussianKernel
+    sigma = (0.3 * ((kernel[0] - 1) * 0.5 - 1) + 0.8) * scale
+    size = tuple(max(1, int(round(k * scale)) | 1) for k in kernel)
+    return cv2.GaussianBlur(mask, size, sigma)
+
+
+@lru_cache(maxsize=8)
+def _polar_grid(h, w):
+    """
+    Distance to the centre, and angle bin and fraction (for interpolation over 360 angles), of every pixel of
+    an h x w mask, in float32. Cached, as the same patch size often comes back (mask pools, benchmarks).
+    """
+    y_coords = np.arange(h, dtype=np.float32)[:, None] - np.float32(h / 2)
+    x_coords = np.arange(w, dtype=np.float32)[None, :] - np.float32(w / 2)
+    distances = np.sqrt(x_coords ** 2 + y_coords ** 2)
+    angles_pixel = np.arctan2(y_coords, x_coords)
+    angles_pixel[angles_pixel < 0] += np.float32(2 * np.pi)
+    position = angles_pixel * np.float32(360 / (2 * np.pi))
+    bins = np.minimum(position.astype(np.int32), 359)
+    fraction = position - bins
+    for grid in (distances, bins, fraction):
+        grid.setflags(write=False)
+    return distances, bins, fraction
+
+
+def create_irregular_mask(h, w, perturbation=0.5, blur_kernel=(9, 9), scale=1.0):
     """
     Generate an irregular mask using an elliptical base with smoothed random perturbations.
+    scale is the size of the mask relative to the damage image, kernel sizes are given at scale 1.
     """
-    center_x, center_y = w / 2, h / 2
     a = (w / 2) * random.uniform(0.5, 0.7)
     b = (h / 2) * random.uniform(0.5, 0.7)
     angles = np.linspace(0, 2 * np.pi, num=360, endpoint=False)
@@ -63,49 +111,76 @@ def create_irregular_mask(h, w, perturbation=0.5, blur_kernel=(9, 9)):
     smooth_variations = np.convolve(variations, kernel, mode='same')
     r_base = 1 / np.sqrt((np.cos(angles) / a) ** 2 + (np.sin(angles) / b) ** 2)
     effective_radii = r_base * (1 + smooth_variations)
-    y_indices, x_indices = np.indices((h, w))
-    x_coords = x_indices - center_x
-    y_coords = y_indices - center_y
-    distances = np.sqrt(x_coords ** 2 + y_coords ** 2)
-    angles_pixel = np.arctan2(y_coords, x_coords)
-    angles_pixel[angles_pixel < 0] += 2 * np.pi
-    effective_radii_pixel = np.interp(angles_pixel.flatten(), angles, effective_radii).reshape(h, w)
-    mask = np.zeros((h, w), dtype=np.uint8)
-    mask[distances <= effective_radii_pixel] = 255
-    mask = cv2.GaussianBlur(mask, blur_kernel, 0)
+    # as np.interp: linear between the 360 angles, constant after the last one
+    effective_radii = np.append(effective_radii, effective_radii[-1]).astype(np.float32)
+    distances, bins, fraction = _polar_grid(h, w)
+    lower = effective_radii[bins]
+    effective_radii_pixel = lower + (effective_radii[bins + 1] - lower) * fraction
+    mask = (distances <= effective_radii_pixel).astype(np.uint8) * np.uint8(255)
+    mask = _blur(mask, blur_kernel, scale)
     return mask
 
 
-def create_cloud_mask(h, w, blur_kernel=(31, 31), threshold=128):
+# smallest scale cloud masks are generated at
+CLOUD_MIN_SCALE = 0.4
+
+
+def create_cloud_mask(h, w, blur_kernel=(31, 31), threshold=128, scale=1.0):
     """
     Generate a cloud-like mask using random noise, Gaussian blur, and thresholding.
+    scale is the size of the mask relative to the damage image, kernel sizes are given at scale 1.
     """
-    noise = np.random.rand(h, w)
-    noise_img = (noise * 255).astype(np.uint8)
-    blurred = cv2.GaussianBlur(noise_img, blur_kernel, 0)
-    # Threshold to create cloud-like patches
-    ret, cloud_mask = cv2.threshold(blurred, threshold, 255, cv2.THRESH_BINARY)
+    if scale < CLOUD_MIN_SCALE:
+        # below CLOUD_MIN_SCALE the cloud edges get thinner than a pixel; generate at that scale and resize
+        work_scale = CLOUD_MIN_SCALE / scale
+        work_h, work_w = max(1, int(round(h * work_scale))), max(1, int(round(w * work_scale)))
+        cloud_mask = create_cloud_mask(work_h, work_w, blur_kernel, threshold, scale=CLOUD_MIN_SCALE)
+        return cv2.resize(cloud_mask, (w, h), interpolation=cv2.INTER_AREA)
+    noise_img = np.random.randint(0, 255, size=(h, w), dtype=np.uint8)
+    if scale == 1:
+        blurred = _blur(noise_img, blur_kernel)
+        # Threshold to create cloud-like patches
+        ret, cloud_mask = cv2.threshold(blurred, threshold, 255, cv2.THRESH_BINARY)
+    else:
+        # a smaller kernel averages fewer pixels, so the blurred noise spreads 1 / scale times wider around its
+        # mean; shrink it back so that the threshold keeps the same fraction of pixels (+ 0.5: uint8 rounding)
+        blurred = _blur(noise_img.astype(np.float32), blur_kernel, scale)
+        blurred = (blurred - 127) * np.float32(scale) + 127
+        ret, cloud_mask = cv2.threshold(blurred, threshold + 0.5, 255, cv2.THRESH_BINARY)
+        cloud_mask = cloud_mask.astype(np.uint8)
     # Optionally, further blur to smooth the boundaries
-    cloud_mask = cv2.GaussianBlur(cloud_mask, (15, 15), 0)
+    cloud_mask = _blur(cloud_mask, (15, 15), scale)
     return cloud_mask
 
 
-def create_stripe_mask(h, w, thickness_range=(5, 15), blur_kernel=(15, 15)):
+def create_stripe_mask(h, w, thickness_range=(5, 15), blur_kernel=(15, 15), scale=1.0):
     """
-    Generate a slender stripe mask by drawing a random line, dilating it, and blurring.
+    Generate a slender stripe mask by drawing a random line of a random thickness, and blurring.
+    scale is the size of the mask relative to the damage image, thickness and kernel sizes are given at scale 1.
     """
     mask = np.zeros((h, w), dtype=np.uint8)
     pt1 = (random.randint(0, w - 1), random.randint(0, h - 1))
     angle = random.uniform(0, 2 * np.pi)
     length = random.randint(min(h, w) // 2, min(h, w))
     pt2 = (int(pt1[0] + length * np.cos(angle)), int(pt1[1] + length * np.sin(angle)))
-    thickness = random.randint(*thickness_range)
-    cv2.line(mask, pt1, pt2, 255, thickness=thickness)
-    mask = cv2.GaussianBlur(mask, blur_kernel, 0)
+    # the line is drawn with its exact (sub-pixel) thickness: every pixel is covered by the part of it that lies
+    # within half the thickness of the segment. cv2.line only draws odd integer widths, which made the stripes
+    # of small scales up to two pixels wider than the stripes of the damage image resized to them.
+    half = random.randint(*thickness_range) * scale / 2
+    left, right = max(0, int(min(pt1[0], pt2[0]) - half) - 1), min(w, int(max(pt1[0], pt2[0]) + half) + 2)
+    top, bottom = max(0, int(min(pt1[1], pt2[1]) - half) - 1), min(h, int(max(pt1[1], pt2[1]) + half) + 2)
+    if left < right and top < bottom:
+        ys, xs = np.mgrid[top:bottom, left:right].astype(np.float32)
+        dx, dy = pt2[0] - pt1[0], pt2[1] - pt1[1]
+        t = np.clip(((xs - pt1[0]) * dx + (ys - pt1[1]) * dy) / max(dx * dx + dy * dy, 1), 0, 1)
+        dist = np.hypot(xs - pt1[0] - t * dx, ys - pt1[1] - t * dy)
+        coverage = np.clip(np.minimum(dist + 0.5, half) - np.maximum(dist - 0.5, -half), 0, 1)
+        mask[top:bottom, left:right] = np.round(coverage * 255).astype(np.uint8)
+    mask = _blur(mask, blur_kernel, scale)
     return mask
 
 
-def create_complex_mask(h, w, mode="random"):
+def create_complex_mask(h, w, mode="random", scale=1.0):
     """
     Generate a complex mask according to the specified mode.
     Modes:
@@ -117,17 +192,17 @@ def create_complex_mask(h, w, mode="random"):
     if mode == "random":
         mode = random.choice(["cloud", "stripe", "irregular"])
     if mode == "cloud":
-        return create_cloud_mask(h, w)
+        return create_cloud_mask(h, w, scale=scale)
     elif mode == "stripe":
-        return create_stripe_mask(h, w)
+        return create_stripe_mask(h, w, scale=scale)
     elif mode == "irregular":
-        return create_irregular_mask(h, w)
+        return create_irregular_mask(h, w, scale=scale)
     else:
         # Fallback to irregular
-        return create_irregular_mask(h, w)
+        return create_irregular_mask(h, w, scale=scale)
 
 
-def apply_complex_mask(damage_bgra, mask_mode="random"):
+def apply_complex_mask(damage_bgra, mask_mode="random", scale=1.0):
     """
     Apply a complex mask to the damage image.
     The generated mask (with values 0-255) multiplies the existing alpha channel.
@@ -135,81 +210,324 @@ def apply_complex_mask(damage_bgra, mask_mode="random"):
     Parameters:
       damage_bgra : Input damage image in BGRA format.
       mask_mode   : Mode for mask generation ("cloud", "stripe", "irregular", or "random").
+      scale       : Size of damage_bgra relative to the original damage image, when it has already been resized.
 
     Returns:
       The BGRA damage image with modified alpha channel.
     """
     h, w, _ = damage_bgra.shape
-    complex_mask = create_complex_mask(h, w, mode=mask_mode)
-    complex_mask = complex_mask.astype(np.float32) / 255.0
-    current_alpha = damage_bgra[:, :, 3].astype(np.float32) / 255.0
-    new_alpha = np.clip(current_alpha * complex_mask, 0, 1)
-    damage_bgra[:, :, 3] = (new_alpha * 255).astype(np.uint8)
+    complex_mask = create_complex_mask(h, w, mode=mask_mode, scale=scale)
+    # alpha * mask / 255, rounded down, in integers
+    new_alpha = damage_bgra[:, :, 3].astype(np.uint16) * complex_mask
+    new_alpha //= 255
+    damage_bgra[:, :, 3] = new_alpha
     return damage_bgra
 
 
+class OverlayBank(object):
+    """
+    Damage images of a folder, decoded and made transparent once, kept in memory as BGRA arrays.
+
+    With pool_size > 0, the bank also keeps pool_size pre-masked variants (apply_complex_mask) of every
+    damage image for mask_mode, so an overlay only needs to pick a variant, resize it and blend it.
+    The pool is generated up front from its own seed, so it does not depend on the images processed later.
+    """
+
+    def __init__(self, damage_folder, image_extensions=('.jpg', '.jpeg', '.png', '.bmp', '.tiff'),
+                 bg_color=(255, 255, 255), threshold=30, object_alpha=255, pool_size=0, mask_mode="random",
+                 pool_seed=0):
+        self.damage_folder = damage_folder
+        self.pool_size = pool_size
+        self.mask_mode = mask_mode
+        # keep the listing order of os.listdir, random.choice(self.files) then picks the same files as before
+        self.files = [f for f in os.listdir(damage_folder) if f.lower().endswith(image_extensions)]
+        self.overlays = {}
+        for damage_file in self.files:
+            d_path = os.path.join(damage_folder, damage_file)
+            damage_img = cv2.imread(d_path)
+            if damage_img is None:
+                print(f"Unable to read damage image: {d_path}")
+                continue
+            # Create transparent damage image (remove fixed background)
+            self.overlays[damage_file] = create_transparent_overlay(damage_img, bg_color=bg_color,
+                                                                    threshold=threshold, object_alpha=object_alpha)
+        # key: damage file, value: list of pre-masked variants
+        self.pool = {}
+        if pool_size > 0:
+            py_state, np_state = random.getstate(), np.random.get_state()
+            random.seed(pool_seed)
+            np.random.seed(pool_seed)
+            for damage_file, overlay in self.overlays.items():
+                self.pool[damage_file] = [apply_complex_mask(overlay.copy(), mask_mode=mask_mode)
+                                          for _ in range(pool_size)]
+            random.setstate(py_state)
+            np.random.set_state(np_state)
+
+    def __len__(self):
+        return len(self.files)
+
+    def get(self, damage_file):
+        """Return a copy of the transparent damage image, or None if it could not be read"""
+        overlay = self.overlays.get(damage_file)
+        return None if overlay is None else overlay.copy()
+
+    def variant(self, damage_file, index):
+        """Return pre-masked variant index % pool_size of a damage image (shared, do not modify it)"""
+        variants = self.pool.get(damage_file)
+        return None if not variants else variants[index % self.pool_size]
+
+    def patch(self, damage_file, mask_mode, size):
+        """
+        Return a masked damage patch resized to size (w, h), or None if the damage image could not be read.
+        A pre-masked variant is resized; otherwise the mask is generated at the smaller of the two
+        resolutions: a damage image larger than the patch is resized first and masked at the patch resolution.
+        """
+        if self.pool_size > 0 and mask_mode == self.mask_mode:
+            variant = self.variant(damage_file, random.randrange(self.pool_size))
+            return None if variant is None else cv2.resize(variant, size, interpolation=cv2.INTER_AREA)
+        overlay = self.overlays.get(damage_file)
+        if overlay is None:
+            return None
+        oh, ow, _ = overlay.shape
+        scale = np.sqrt(size[0] / ow * size[1] / oh)
+        if scale >= 1:
+            # Apply complex mask (cloud, stripe, or irregular) for rich shapes
+            damage_img = apply_complex_mask(overlay.copy(), mask_mode=mask_mode)
+            return cv2.resize(damage_img, size, interpolation=cv2.INTER_AREA)
+        damage_resized = cv2.resize(overlay, size, interpolation=cv2.INTER_AREA)
+        return apply_complex_mask(damage_resized, mask_mode=mask_mode, scale=scale)
+
+
 def blend_damage_patch(tombstone_img, damage_img, overall_alpha):
     """
     Blend a damage patch (with transparency) onto the tombstone image using per-pixel alpha blending.
+    The blend is computed in 8.8 fixed point (uint16) and written into tombstone_img in place:
+        weight  = alpha * round(overall_alpha * 256) / 256              (0-255)
+        blended = (roi * (255 - weight) + damage * weight) / 255        (rounded)
     """
     th, tw, _ = tombstone_img.shape
     ph, pw, _ = damage_img.shape
     x = random.randint(0, th - ph)
     y = random.randint(0, tw - pw)
-    roi = tombstone_img[x:x + ph, y:y + pw].astype(np.float32)
-    damage_bgr = damage_img[:, :, :3].astype(np.float32)
-    damage_alpha = (damage_img[:, :, 3].astype(np.float32) / 255.0) * overall_alpha
-    damage_alpha = np.expand_dims(damage_alpha, axis=2)
-    blended = (1 - damage_alpha) * roi + damage_alpha * damage_bgr
-    tombstone_img[x:x + ph, y:y + pw] = blended.astype(np.uint8)
+    roi = tombstone_img[x:x + ph, y:y + pw]
+    weight = damage_img[:, :, 3].astype(np.uint16)
+    weight *= min(256, max(0, int(round(overall_alpha * 256))))
+    weight >>= 8
+    inverse = 255 - weight
+    # one channel at a time, broadcasting the weights over the channels is slower than the loop
+    acc = np.empty((ph, pw), dtype=np.uint16)
+    tmp = np.empty((ph, pw), dtype=np.uint16)
+    for c in range(3):
+        # at most 255 * 255 + 128 + 254, fits in uint16
+        np.multiply(roi[:, :, c], inverse, out=acc)
+        np.multiply(damage_img[:, :, c], weight, out=tmp)
+        acc += tmp
+        # divide by 255 with rounding: (acc + 128 + ((acc + 128) >> 8)) >> 8
+        acc += 128
+        np.right_shift(acc, 8, out=tmp)
+        acc += tmp
+        acc >>= 8
+        roi[:, :, c] = acc
     return tombstone_img
 
 
+def image_seed(file_name, seed=42):
+    """
+    Deterministic seed of one tombstone image, derived from its file name and the base seed, so that its
+    augmentation does not depend on the order (or the process) in which the images are processed.
+    """
+    return (zlib.crc32(file_name.encode("utf-8")) ^ (seed * 2654435761)) % (2 ** 32)
+
+
+def augment_image(tombstone_img, bank, min_overlays, max_overlays, min_scale, max_scale, alpha_min, alpha_max,
+                  mask_mode):
+    """
+    Overlay a random number of damage patches from bank onto one tombstone image.
+    Returns the augmented image and the number of overlays.
+    """
+    num_overlays = random.randint(min_overlays, max_overlays)
+    for _ in range(num_overlays):
+        damage_file = random.choice(bank.files)
+        th_img, tw_img, _ = tombstone_img.shape
+        scale_factor = random.uniform(min_scale, max_scale)
+        new_w = int(tw_img * scale_factor)
+        new_h = int(th_img * scale_factor)
+        damage_resized = bank.patch(damage_file, mask_mode, (new_w, new_h))
+        if damage_resized is None:
+            continue
+        overall_alpha = random.uniform(alpha_min, alpha_max)
+        tombstone_img = blend_damage_patch(tombstone_img, damage_resized, overall_alpha)
+    return tombstone_img, num_overlays
+
+
+def augment_seeded(tombstone_img, file_name, bank, seed, min_overlays, max_overlays, min_scale, max_scale,
+                   alpha_min, alpha_max, mask_mode):
+    """
+    augment_image with the seed of file_name (image_seed), so the result only depends on the file name, the
+    base seed and the parameters. The global random state of the caller is restored afterwards.
+    """
+    py_state, np_state = random.getstate(), np.random.get_state()
+    file_seed = image_seed(file_name, seed)
+    random.seed(file_seed)
+    np.random.seed(file_seed)
+    try:
+        return augment_image(tombstone_img, bank, min_overlays, max_overlays, min_scale, max_scale, alpha_min,
+                             alpha_max, mask_mode)
+    finally:
+        random.setstate(py_state)
+        np.random.set_state(np_state)
+
+
+# state of a worker process, set by _init_worker
+_worker_bank = None
+_worker_options = None
+
+
+def _init_worker(bank, options):
+    global _worker_bank, _worker_options
+    # with fork the bank is inherited from the parent, not pickled
+    _worker_bank = bank
+    _worker_options = options
+    # one process per core already, avoid oversubscribing the cores with OpenCV threads
+    cv2.setNumThreads(1)
+
+
+def _process_tombstone(t_file):
+    """Augment one tombstone image with its own seed, in a worker process"""
+    options = _worker_options
+    t_path = os.path.join(options["tombstone_folder"], t_file)
+    tombstone_img = cv2.imread(t_path)
+    if tombstone_img is None:
+        return t_file, None, t_path
+    tombstone_img, num_overlays = augment_seeded(tombstone_img, t_file, _worker_bank, options["seed"],
+                                                 options["min_overlays"], options["max_overlays"],
+                                                 options["min_scale"], options["max_scale"], options["alpha_min"],
+                                                 options["alpha_max"], options["mask_mode"])
+    output_path = os.path.join(options["output_folder"], t_file)
+    cv2.imwrite(output_path, tombstone_img)
+    return t_file, num_overlays, output_path
+
+
 def process_images(tombstone_folder, damage_folder, output_folder, min_overlays, max_overlays,
-                   min_scale, max_scale, alpha_min, alpha_max, mask_mode):
+                   min_scale, max_scale, alpha_min, alpha_max, mask_mode, pool_size=0, workers=0, seed=42):
     """
     Process all tombstone images by randomly overlaying pre-processed damage patches.
     The same damage image may be reused.
+
+    With workers=0 the images are processed in one process from the global random state (seeded once at
+    import). With workers >= 1 every image gets its own seed (image_seed) and the images are distributed over
+    a pool of worker processes; the outputs are then identical for any number of workers.
     """
     if not os.path.exists(output_folder):
         os.makedirs(output_folder)
     image_extensions = ('.jpg', '.jpeg', '.png', '.bmp', '.tiff')
     tombstone_files = [f for f in os.listdir(tombstone_folder) if f.lower().endswith(image_extensions)]
-    damage_files = [f for f in os.listdir(damage_folder) if f.lower().endswith(image_extensions)]
-    if not damage_files:
+    bank = OverlayBank(damage_folder, image_extensions=image_extensions, pool_size=pool_size, mask_mode=mask_mode,
+                       pool_seed=seed)
+    if not len(bank):
         print("No damage images found in the damage folder.")
         return
+    if workers > 0:
+        options = {"tombstone_folder": tombstone_folder, "output_folder": output_folder,
+                   "min_overlays": min_overlays, "max_overlays": max_overlays, "min_scale": min_scale,
+                   "max_scale": max_scale, "alpha_min": alpha_min, "alpha_max": alpha_max, "mask_mode": mask_mode,
+                   "seed": seed}
+        # fork shares the overlay bank with the workers without copying it, spawn pickles it once per worker
+        method = "fork" if "fork" in mp.get_all_start_methods() else "spawn"
+        with mp.get_context(method).Pool(workers, initializer=_init_worker, initargs=(bank, options)) as pool:
+            for t_file, num_overlays, path in pool.imap_unordered(_process_tombstone, tombstone_files):
+                if num_overlays is None:
+                    print(f"Unable to read tombstone image: {path}")
+                else:
+                    print(f"Processed {t_file} with {num_overlays} overlay(s) -> {path}")
+        return
     for t_file in tombstone_files:
         t_path = os.path.join(tombstone_folder, t_file)
         tombstone_img = cv2.imread(t_path)
         if tombstone_img is None:
             print(f"Unable to read tombstone image: {t_path}")
             continue
-        num_overlays = random.randint(min_overlays, max_overlays)
-        for _ in range(num_overlays):
-            damage_file = random.choice(damage_files)
-            d_path = os.path.join(damage_folder, damage_file)
-            damage_img = cv2.imread(d_path)
-            if damage_img is None:
-                print(f"Unable to read damage image: {d_path}")
-                continue
-            # Create transparent damage image (remove fixed background)
-            damage_img = create_transparent_overlay(damage_img, bg_color=(255, 255, 255), threshold=30,
-                                                    object_alpha=255)
-            # Apply complex mask (cloud, stripe, or irregular) for rich shapes
-            damage_img = apply_complex_mask(damage_img, mask_mode=mask_mode)
-            th_img, tw_img, _ = tombstone_img.shape
-            scale_factor = random.uniform(min_scale, max_scale)
-            new_w = int(tw_img * scale_factor)
-            new_h = int(th_img * scale_factor)
-            damage_resized = cv2.resize(damage_img, (new_w, new_h), interpolation=cv2.INTER_AREA)
-            overall_alpha = random.uniform(alpha_min, alpha_max)
-            tombstone_img = blend_damage_patch(tombstone_img, damage_resized, overall_alpha)
+        tombstone_img, num_overlays = augment_image(tombstone_img, bank, min_overlays, max_overlays,
+                                                    min_scale, max_scale, alpha_min, alpha_max, mask_mode)
         output_path = os.path.join(output_folder, t_file)
         cv2.imwrite(output_path, tombstone_img)
         print(f"Processed {t_file} with {num_overlays} overlay(s) -> {output_path}")
 
 
+class AugmentedImages(object):
+    """
+    Tombstone images augmented on the fly, without writing them to an output folder.
+
+    Iterating yields (idx, image bytes) per tombstone, e.g. ("t00004", b"\\xff\\xd8..."), in file name order.
+    Every image is augmented with its own seed (see augment_seeded), so the bytes are the same as the files
+    process_images writes with workers >= 1 and the same seed and parameters. With cache_size > 0 the encoded
+    results of the cache_size most recently used images are kept in memory.
+
+    Example:
+        images = AugmentedImages("../images", "../noises", alpha_min=0.3, alpha_max=0.5, cache_size=64)
+        for idx, image_bytes in images:
+            image = Image.open(io.BytesIO(image_bytes))
+        idx, image_bytes = images["t00004"]
+    """
+
+    def __init__(self, tombstone_folder, damage_folder, min_overlays=2, max_overlays=5, min_scale=0.5,
+                 max_scale=0.8, alpha_min=0.6, alpha_max=0.8, mask_mode="random", pool_size=0, seed=42,
+                 image_format=".jpg", cache_size=0, bank=None):
+        image_extensions = ('.jpg', '.jpeg', '.png', '.bmp', '.tiff')
+        self.tombstone_folder = tombstone_folder
+        self.files = sorted(f for f in os.listdir(tombstone_folder) if f.lower().endswith(image_extensions))
+        self.index = {os.path.splitext(f)[0]: f for f in self.files}
+        if bank is None:
+            bank = OverlayBank(damage_folder, image_extensions=image_extensions, pool_size=pool_size,
+                               mask_mode=mask_mode, pool_seed=seed)
+        self.bank = bank
+        self.params = (min_overlays, max_overlays, min_scale, max_scale, alpha_min, alpha_max, mask_mode)
+        self.seed = seed
+        self.image_format = image_format
+        self.cache_size = cache_size
+        # key: file name, value: encoded image, least recently used first
+        self.cache = OrderedDict()
+
+    def __len__(self):
+        return len(self.files)
+
+    def augment(self, t_file):
+        """Return the augmented image (BGR array) of a tombstone file, or None if it could not be read"""
+        tombstone_img = cv2.imread(os.path.join(self.tombstone_folder, t_file))
+        if tombstone_img is None:
+            return None
+        tombstone_img, _ = augment_seeded(tombstone_img, t_file, self.bank, self.seed, *self.params)
+        return tombstone_img
+
+    def encode(self, t_file):
+        """Return the encoded augmented image of a tombstone file, or None if it could not be read"""
+        if t_file in self.cache:
+            self.cache.move_to_end(t_file)
+            return self.cache[t_file]
+        tombstone_img = self.augment(t_file)
+        if tombstone_img is None:
+            print(f"Unable to read tombstone image: {os.path.join(self.tombstone_folder, t_file)}")
+            return None
+        ok, buffer = cv2.imencode(self.image_format, tombstone_img)
+        image_bytes = buffer.tobytes() if ok else None
+        if self.cache_size > 0 and image_bytes is not None:
+            self.cache[t_file] = image_bytes
+            if len(self.cache) > self.cache_size:
+                self.cache.popitem(last=False)
+        return image_bytes
+
+    def __getitem__(self, key):
+        """key is a position (int) or a tombstone id, e.g. "t00004"; returns (idx, image bytes)"""
+        t_file = self.files[key] if isinstance(key, int) else self.index[key]
+        return os.path.splitext(t_file)[0], self.encode(t_file)
+
+    def __iter__(self):
+        for t_file in self.files:
+            image_bytes = self.encode(t_file)
+            if image_bytes is not None:
+                yield os.path.splitext(t_file)[0], image_bytes
+
+
 def main():
     parser = argparse.ArgumentParser(
         description="Blend damage images (with complex natural transparent masks) onto tombstone images using alpha blending."
@@ -233,10 +551,17 @@ def main():
                         help="Maximum overall alpha value for blending (default: 0.8)")
     parser.add_argument("--mask_mode", type=str, default="random",
                         help='Mask generation mode: "cloud", "stripe", "irregular", or "random" (default: random)')
+    parser.add_argument("--pool_size", type=int, default=0,
+                        help="Pre-masked variants kept per damage image (default: 0, mask every overlay anew)")
+    parser.add_argument("--workers", type=int, default=0,
+                        help="Worker processes, each image seeded from its file name (default: 0, serial)")
+    parser.add_argument("--seed", type=int, default=42,
+                        help="Base seed of the per-image seeds and of the mask pool (default: 42)")
     args = parser.parse_args()
     process_images(args.tombstone_folder, args.damage_folder, args.output_folder,
                    args.min_overlays, args.max_overlays, args.min_scale, args.max_scale,
-                   args.alpha_min, args.alpha_max, args.mask_mode)
+                   args.alpha_min, args.alpha_max, args.mask_mode, pool_size=args.pool_size,
+                   workers=args.workers, seed=args.seed)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,223 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Downscaled copies of the tombstone images, sized to the pixel budget of the Qwen2.5-VL processor.
+
+The processor resizes every image to at most max_pixels = 1280 * 28 * 28 (about 1 MP), with sides that are
+multiples of 28, but the photos in data/images are full camera resolution, so every pipeline decodes far
+more pixels than the model ever sees. This script stores, per tombstone, a copy at exactly the size the
+processor would resize it to (so the processor does not resize it again), decoded with JPEG draft mode
+(the decoder itself reduces the image by 1/2, 1/4 or 1/8 before the final resize). Images within the budget
+are copied as they are.
+
+The EXIF data is kept in the copies, and the GPS tags of every image are also written to a sidecar JSON
+(t00004.jpg -> t00004.json, with the original size), so that GPS lookups do not need to open the image at all.
+A copy is rebuilt when the original changes or max_pixels differs.
+
+Pipelines opt in by pointing their image folder to the cache folder (fusion.py --tombstone_folder, the
+RimAG/RibAG EXIF readers), or with --image_cache (qwen_infer.py, sharded_infer.py), which uses the cached copy
+of an image when there is one.
+
+Parameters:
+  --image_folder     : Folder containing the original tombstone images (default: ../images).
+  --cache_folder     : Folder the downscaled copies and sidecars are written to (default: ../images_small).
+  --max_pixels       : Pixel budget (default: 1280 * 28 * 28, max_pixels of qwen_infer.py).
+  --min_pixels       : Minimum number of pixels (default: 256 * 28 * 28, min_pixels of qwen_infer.py).
+  --quality          : JPEG quality of the copies (default: 95).
+  --workers          : Number of worker processes (default: 0, all images in this process).
+  --force            : Rebuild every copy, also the ones that are up to date.
+"""
+
+import argparse
+import json
+import math
+import multiprocessing as mp
+import os
+import shutil
+
+from PIL import Image
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png')
+
+# pixel budget of the Qwen2.5-VL processor, see parsing/few_shot/qwen_infer.py
+MIN_PIXELS = 256 * 28 * 28
+MAX_PIXELS = 1280 * 28 * 28
+
+# EXIF tag of the GPS information
+GPS_INFO = 34853
+
+
+def smart_resize(height, width, factor=28, min_pixels=MIN_PIXELS, max_pixels=MAX_PIXELS):
+    """
+    Size the Qwen2.5-VL image processor resizes an image to (as qwen_vl_utils.smart_resize): both sides
+    multiples of factor, and the number of pixels between min_pixels and max_pixels, keeping the aspect ratio.
+    """
+    h_bar = max(factor, round(height / factor) * factor)
+    w_bar = max(factor, round(width / factor) * factor)
+    if h_bar * w_bar > max_pixels:
+        beta = math.sqrt((height * width) / max_pixels)
+        h_bar = math.floor(height / beta / factor) * factor
+        w_bar = math.floor(width / beta / factor) * factor
+    elif h_bar * w_bar < min_pixels:
+        beta = math.sqrt(min_pixels / (height * width))
+        h_bar = math.ceil(height * beta / factor) * factor
+        w_bar = math.ceil(width * beta / factor) * factor
+    return h_bar, w_bar
+
+
+def _json_value(value):
+    """EXIF values (rationals, tuples, bytes) as JSON values"""
+    if isinstance(value, (tuple, list)):
+        return [_json_value(v) for v in value]
+    if isinstance(value, bytes):
+        return value.decode("latin-1")
+    if isinstance(value, (int, float, str)) or value is None:
+        return value
+    return float(value)
+
+
+def read_gps(image):
+    """GPS tags of an opened PIL image, by name (GPSLatitude, GPSLatitudeRef, ...), {} without GPS"""
+    from PIL.ExifTags import GPSTAGS
+
+    try:
+        gps_info = image.getexif().get_ifd(GPS_INFO)
+    except Exception:
+        return {}
+    return {GPSTAGS.get(key, str(key)): _json_value(value) for key, value in gps_info.items()}
+
+
+def sidecar_path(cache_folder, file_name):
+    return os.path.join(cache_folder, os.path.splitext(file_name)[0] + ".json")
+
+
+def load_sidecar(cache_folder, file_name):
+    """Sidecar of a cached image (original size, size, GPS tags), or None if there is none"""
+    path = sidecar_path(cache_folder, file_name)
+    if not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def is_fresh(image_path, cache_folder, max_pixels):
+    """True if the cached copy of image_path exists and was made from the current file with max_pixels"""
+    file_name = os.path.basename(image_path)
+    sidecar = load_sidecar(cache_folder, file_name)
+    if sidecar is None or not os.path.exists(os.path.join(cache_folder, file_name)):
+        return False
+    stat = os.stat(image_path)
+    return (sidecar.get("source_bytes") == stat.st_size and sidecar.get("source_mtime") == stat.st_mtime
+            and sidecar.get("max_pixels") == max_pixels)
+
+
+def cached_image(image_path, cache_folder):
+    """Path of the cached copy of image_path if there is one, image_path otherwise"""
+    if not cache_folder:
+        return image_path
+    cached_path = os.path.join(cache_folder, os.path.basename(image_path))
+    return cached_path if os.path.exists(cached_path) else image_path
+
+
+def downscale_image(image_path, cache_folder, max_pixels=MAX_PIXELS, min_pixels=MIN_PIXELS, quality=95):
+    """
+    Write the downscaled copy of one image and its sidecar to cache_folder.
+    Returns (original size, cached size) as (width, height) tuples.
+    """
+    file_name = os.path.basename(image_path)
+    output_path = os.path.join(cache_folder, file_name)
+    stat = os.stat(image_path)
+    with Image.open(image_path) as image:
+        width, height = image.size
+        gps = read_gps(image)
+        exif = image.info.get("exif")
+        new_height, new_width = smart_resize(height, width, min_pixels=min_pixels, max_pixels=max_pixels)
+        if width * height <= max_pixels:
+            # within the budget, the processor only rounds the sides, keep the original file
+            shutil.copyfile(image_path, output_path)
+            new_width, new_height = width, height
+        else:
+            # JPEG draft mode: decode at the smallest 1/2, 1/4 or 1/8 scale that is still >= the target size
+            image.draft("RGB", (new_width, new_height))
+            image = image.convert("RGB").resize((new_width, new_height), Image.BICUBIC)
+            save_options = {"quality": quality}
+            if exif:
+                save_options["exif"] = exif
+            image.save(output_path, format="JPEG" if file_name.lower().endswith(('.jpg', '.jpeg')) else None,
+                       **save_options)
+    sidecar = {
+        "source": file_name,
+        "source_size": [width, height],
+        "source_bytes": stat.st_size,
+        "source_mtime": stat.st_mtime,
+        "size": [new_width, new_height],
+        "max_pixels": max_pixels,
+        "gps": gps,
+    }
+    with open(sidecar_path(cache_folder, file_name), "w", encoding="utf-8") as f:
+        json.dump(sidecar, f, ensure_ascii=False, indent=4)
+    return (width, height), (new_width, new_height)
+
+
+def _downscale_task(task):
+    image_path, cache_folder, max_pixels, min_pixels, quality = task
+    try:
+        return os.path.basename(image_path), downscale_image(image_path, cache_folder, max_pixels, min_pixels,
+                                                             quality), None
+    except Exception as e:
+        return os.path.basename(image_path), None, str(e)
+
+
+def build_cache(image_folder, cache_folder, max_pixels=MAX_PIXELS, min_pixels=MIN_PIXELS, quality=95, workers=0,
+                force=False):
+    if not os.path.exists(cache_folder):
+        os.makedirs(cache_folder)
+    file_names = sorted(f for f in os.listdir(image_folder) if f.lower().endswith(IMAGE_EXTENSIONS))
+    pending = [f for f in file_names
+               if force or not is_fresh(os.path.join(image_folder, f), cache_folder, max_pixels)]
+    print(f"Total images: {len(file_names)}, up to date: {len(file_names) - len(pending)}")
+    tasks = [(os.path.join(image_folder, f), cache_folder, max_pixels, min_pixels, quality) for f in pending]
+    if workers > 0:
+        pool = mp.Pool(workers)
+        results = pool.imap_unordered(_downscale_task, tasks)
+    else:
+        pool = None
+        results = map(_downscale_task, tasks)
+    source_pixels = cached_pixels = 0
+    for file_name, sizes, error in results:
+        if error is not None:
+            print(f"Unable to downscale {file_name}: {error}")
+            continue
+        (width, height), (new_width, new_height) = sizes
+        source_pixels += width * height
+        cached_pixels += new_width * new_height
+        print(f"Cached {file_name}: {width}x{height} -> {new_width}x{new_height}")
+    if pool is not None:
+        pool.close()
+        pool.join()
+    if source_pixels:
+        print(f"Pixels to decode: {source_pixels / 1e6:.1f} MP -> {cached_pixels / 1e6:.1f} MP")
+    print(f"Cache complete: {cache_folder}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Downscale the tombstone images to the pixel budget of the VL processor.")
+    parser.add_argument("--image_folder", type=str, default="../images",
+                        help="Folder containing the original tombstone images")
+    parser.add_argument("--cache_folder", type=str, default="../images_small",
+                        help="Folder the downscaled copies and sidecars are written to")
+    parser.add_argument("--max_pixels", type=int, default=MAX_PIXELS,
+                        help="Pixel budget (default: 1280 * 28 * 28)")
+    parser.add_argument("--min_pixels", type=int, default=MIN_PIXELS,
+                        help="Minimum number of pixels (default: 256 * 28 * 28)")
+    parser.add_argument("--quality", type=int, default=95, help="JPEG quality of the copies (default: 95)")
+    parser.add_argument("--workers", type=int, default=0,
+                        help="Number of worker processes (default: 0, all images in this process)")
+    parser.add_argument("--force", action="store_true", help="Rebuild every copy")
+    args = parser.parse_args()
+    build_cache(args.image_folder, args.cache_folder, args.max_pixels, args.min_pixels, args.quality,
+                args.workers, args.force)
+
+
+if __name__ == "__main__":
+    main()
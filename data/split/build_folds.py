@@ -0,0 +1,160 @@
+"""
+Build k-fold or multiple seeded train/test splits of the tombstones for LLaMA-Factory in one pass.
+
+Every entry (the messages and images of one tombstone) is serialized once and the same line is written into
+every fold that contains it, as compact JSON Lines. The entries are built from the annotations as in
+split_for_llamafactory.py, or taken from existing LLaMA-Factory JSON files (--entries), e.g. the train and test
+files of a RibAG/RimAG pipeline, so the retrieval step does not have to run again for every fold.
+
+With --seeds, split s shuffles the tombstones exactly as split_for_llamafactory.py does with --seed s, so
+--seeds 42 gives the paper split. With --kfold k, the tombstones are shuffled once with --seed and cut into k
+folds, fold i being the test set of split fold{i}.
+
+Output (in --output_dir):
+  <split>/train.jsonl, <split>/test.jsonl : entries of every split, one JSON object per line.
+  folds.json                              : ids of every split and the SHA-1 of every serialized entry.
+  dataset_info.json                       : LLaMA-Factory dataset definitions of all splits.
+
+Parameters:
+  --kfold           : Number of folds (k-fold cross-validation).
+  --seeds           : Seeds of the train/test splits, e.g. 1 2 3 (default: 42 without --kfold).
+  --seed            : Shuffle seed of the k folds (default: 42).
+  --train_size      : Number of train tombstones of the seeded splits (default: 600).
+  --entries         : LLaMA-Factory JSON files to take the entries from (default: build them from the annotations).
+  --annotation_file : TMR annotations (or a .npz corpus, see split_for_llamafactory.load_annotations).
+  --image_root      : Image folder written into the entries built from the annotations.
+  --output_dir      : Folder the splits are written to (default: folds).
+
+Example:
+  python build_folds.py --kfold 5
+  python build_folds.py --seeds 1 2 3 --entries ../../parsing/RibAG/geo/tomb_parsing_train_rag.json \\
+                        ../../parsing/RibAG/geo/tomb_parsing_test_rag.json --output_dir geo_seeds
+"""
+
+import json
+import random
+import hashlib
+import argparse
+import os
+import re
+
+from split_for_llamafactory import load_annotations, build_entries
+
+IMAGE_ID = re.compile(r"(t\d{5})\.\w+$")
+
+
+def load_entries(entry_files):
+    """{id: entry} of existing LLaMA-Factory JSON files, the id is taken from the image file name"""
+    entries = {}
+    for entry_file in entry_files:
+        with open(entry_file, encoding="utf-8") as f:
+            for entry in json.load(f):
+                match = IMAGE_ID.search(entry["images"][0])
+                if match is None:
+                    print(f"No tombstone id in {entry['images'][0]} ({entry_file}), skipped.")
+                    continue
+                entries[match.group(1)] = entry
+    return entries
+
+
+def seeded_splits(ids, seeds, train_size):
+    """{name: (train ids, test ids)}, shuffled as split_for_llamafactory.py"""
+    splits = {}
+    for seed in seeds:
+        random.seed(seed)
+        shuffled = list(ids)
+        random.shuffle(shuffled)
+        splits[f"seed{seed}"] = (shuffled[:train_size], shuffled[train_size:])
+    return splits
+
+
+def kfold_splits(ids, k, seed):
+    """{name: (train ids, test ids)}, fold i being the test set of split fold{i}"""
+    random.seed(seed)
+    shuffled = list(ids)
+    random.shuffle(shuffled)
+    # the first len % k folds get one tombstone more
+    size, rest = divmod(len(shuffled), k)
+    folds = []
+    start = 0
+    for i in range(k):
+        end = start + size + (1 if i < rest else 0)
+        folds.append(shuffled[start:end])
+        start = end
+    splits = {}
+    for i, test in enumerate(folds):
+        train = [idx for j, fold in enumerate(folds) if j != i for idx in fold]
+        splits[f"fold{i}"] = (train, test)
+    return splits
+
+
+def dataset_info(names):
+    """LLaMA-Factory dataset definitions (sharegpt format) of the written splits"""
+    info = {}
+    for name in names:
+        for part in ("train", "test"):
+            info[f"tomb_{name}_{part}"] = {
+                "file_name": f"{name}/{part}.jsonl",
+                "formatting": "sharegpt",
+                "columns": {"messages": "messages", "images": "images"},
+                "tags": {"role_tag": "from", "content_tag": "value", "user_tag": "human", "assistant_tag": "gpt"},
+            }
+    return info
+
+
+def write_splits(splits, serialized, output_dir):
+    for name, (train, test) in splits.items():
+        os.makedirs(os.path.join(output_dir, name), exist_ok=True)
+        for part, ids in (("train", train), ("test", test)):
+            with open(os.path.join(output_dir, name, f"{part}.jsonl"), "w", encoding="utf-8") as f:
+                f.writelines(serialized[idx] for idx in ids)
+        print(f"{name}: {len(train)} train, {len(test)} test")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="k-fold / multi-seed splits of the tombstones for LLaMA-Factory.")
+    parser.add_argument("--kfold", type=int, default=None, help="Number of folds")
+    parser.add_argument("--seeds", type=int, nargs="+", default=None, help="Seeds of the train/test splits")
+    parser.add_argument("--seed", type=int, default=42, help="Shuffle seed of the k folds (default: 42)")
+    parser.add_argument("--train_size", type=int, default=600, help="Train size of the seeded splits (default: 600)")
+    parser.add_argument("--entries", type=str, nargs="*", default=[],
+                        help="LLaMA-Factory JSON files to take the entries from")
+    parser.add_argument("--annotation_file", type=str, default="../annotation/tombs_grounded.txt",
+                        help="TMR annotations")
+    parser.add_argument("--image_root", type=str, default="/projects/0/prjs0885/LLaMA-Factory/tombreader/data",
+                        help="Image folder written into the entries built from the annotations")
+    parser.add_argument("--output_dir", type=str, default="folds", help="Folder the splits are written to")
+    args = parser.parse_args()
+
+    if args.entries:
+        entries = load_entries(args.entries)
+    else:
+        annotations = load_annotations(args.annotation_file)
+        items = [{"id": idx} for idx in annotations]
+        entries = dict(zip(annotations, build_entries(items, annotations, args.image_root)))
+    # in the order of the annotation file, as the original split shuffles it
+    ids = sorted(entries)
+
+    splits = {}
+    if args.kfold:
+        splits.update(kfold_splits(ids, args.kfold, args.seed))
+    if args.seeds or not args.kfold:
+        splits.update(seeded_splits(ids, args.seeds or [42], args.train_size))
+
+    # every entry is serialized once, and the line reused by every split
+    serialized = {idx: json.dumps(entries[idx], ensure_ascii=False) + "\n" for idx in ids}
+    write_splits(splits, serialized, args.output_dir)
+
+    manifest = {
+        "splits": {name: {"train": train, "test": test} for name, (train, test) in splits.items()},
+        "sha1": {idx: hashlib.sha1(line.encode("utf-8")).hexdigest() for idx, line in serialized.items()},
+    }
+    with open(os.path.join(args.output_dir, "folds.json"), "w", encoding="utf-8") as f:
+        json.dump(manifest, f)
+    with open(os.path.join(args.output_dir, "dataset_info.json"), "w", encoding="utf-8") as f:
+        json.dump(dataset_info(splits), f, indent=2)
+    print(f"{len(splits)} split(s) of {len(ids)} tombstones written to {args.output_dir}")
+
+
+if __name__ == "__main__":
+    main()
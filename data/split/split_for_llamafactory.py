@@ -1,90 +1,156 @@
+"""
+Split the annotated tombstones into train and test sets for LLaMA-Factory.
+
+The split is written as a manifest (split_manifest.json): the tombstone ids of every set with the SHA-1 of
+their TMR (and of their image with --hash_images), so a split can be checked and rebuilt without the images.
+The LLaMA-Factory JSON files are generated from the manifest, with the image paths under --image_root, and
+the train_images / test_images folders are filled with symbolic links (or hard links) to ../images instead of
+copies, so building a split takes no extra disk space.
+
+Parameters:
+  --annotation_file : TMR annotations, the id of a TMR is its position in the file (or a .npz corpus).
+  --image_dir       : Folder containing the tombstone images (default: ../images).
+  --train_size      : Number of tombstones in the train set (default: 600).
+  --seed            : Shuffle seed (default: 42, the split used in the paper).
+  --manifest        : Manifest file (default: split_manifest.json).
+  --from_manifest   : Do not shuffle, rebuild the JSON files (and links) from an existing manifest.
+  --image_root      : Image folder written into the JSON files
+                      (default: /projects/0/prjs0885/LLaMA-Factory/tombreader/data).
+  --link            : "symlink" (default), "hardlink" or "none" for the train_images / test_images folders.
+  --hash_images     : Also store the SHA-1 of every image in the manifest.
+"""
+
 import json
 import random
-import shutil
+import hashlib
+import argparse
 import os
+import sys
 
-random.seed(42)
-
-with open("../annotation/tombs_grounded.txt", encoding="utf-8") as f:
-    lines = f.read()
-
-data = lines.split("\n\n")
-index = [f"t{i:05d}" for i in range(len(data))]
-
-combined = list(zip(index, data))
-random.shuffle(combined)
-
-index, data = zip(*combined)
-
-train_data = []
-for i in range(600):
-    idx = index[i]
-    d = data[i]
-    train_data.append({
-        "messages": [
-            {
-                "from": "human",
-                "value": "<image>Generate a meaning representation in PENMAN format for this image of a tombstone.",
-            },
-            {
-                "from": "gpt",
-                "value": f"{d}",
-            },
-        ],
-        "images": [
-            f"/projects/0/prjs0885/LLaMA-Factory/tombreader/data/{idx}.jpg",
-        ]
-    })
-
-train_file_path = 'tomb_parsing_train.json'
-with open(train_file_path, 'w') as json_file:
-    json.dump(train_data, json_file)
-
-test_data = []
-for i in range(600, len(data)):
-    idx = index[i]
-    d = data[i]
-    test_data.append({
-        "messages": [
-            {
-                "from": "human",
-                "value": "<image>Generate a meaning representation in PENMAN format for this image of a tombstone.",
-            },
-            {
-                "from": "gpt",
-                "value": f"{d}",
-            },
-        ],
-        "images": [
-            f"/projects/0/prjs0885/LLaMA-Factory/tombreader/data/{idx}.jpg",
-        ]
-    })
-
-test_file_path = 'tomb_parsing_test.json'
-with open(test_file_path, 'w') as json_file:
-    json.dump(test_data, json_file)
-
-source_dir = "../images"
-train_dest_dir = "train_images"
-test_dest_dir = "test_images"
-
-os.makedirs(train_dest_dir, exist_ok=True)
-os.makedirs(test_dest_dir, exist_ok=True)
-
-for i in range(600):
-    idx = index[i]
-    src_file = os.path.join(source_dir, f"{idx}.jpg")
-    dst_file = os.path.join(train_dest_dir, f"{idx}.jpg")
-    if os.path.exists(src_file):
-        shutil.copy(src_file, dst_file)
-    else:
-        print(f"Train image {src_file} not found!")
-
-for i in range(600, len(data)):
-    idx = index[i]
-    src_file = os.path.join(source_dir, f"{idx}.jpg")
-    dst_file = os.path.join(test_dest_dir, f"{idx}.jpg")
-    if os.path.exists(src_file):
-        shutil.copy(src_file, dst_file)
+# the annotations are read by parsing/evaluation/utils/tmr_corpus.py (also its .npz corpus)
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "parsing", "evaluation", "utils"))
+from tmr_corpus import load_annotations
+
+PROMPT = "<image>Generate a meaning representation in PENMAN format for this image of a tombstone."
+
+
+def sha1_text(text):
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+def sha1_file(path):
+    digest = hashlib.sha1()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def make_manifest(annotations, train_size=600, seed=42, image_dir=None, hash_images=False):
+    """Shuffle the ids as the original split script did, and return the manifest of the split"""
+    random.seed(seed)
+    combined = list(annotations.items())
+    random.shuffle(combined)
+
+    def entry(idx, d):
+        item = {"id": idx, "sha1": sha1_text(d)}
+        if hash_images:
+            image_path = os.path.join(image_dir, f"{idx}.jpg")
+            item["image_sha1"] = sha1_file(image_path) if os.path.exists(image_path) else None
+        return item
+
+    return {
+        "seed": seed,
+        "train_size": train_size,
+        "splits": {
+            "train": [entry(idx, d) for idx, d in combined[:train_size]],
+            "test": [entry(idx, d) for idx, d in combined[train_size:]],
+        },
+    }
+
+
+def check_manifest(manifest, annotations):
+    """Report the ids whose TMR changed since the manifest was written"""
+    changed = [item["id"] for items in manifest["splits"].values() for item in items
+               if sha1_text(annotations[item["id"]]) != item["sha1"]]
+    if changed:
+        print(f"{len(changed)} annotation(s) changed since the manifest was written: {', '.join(changed[:10])}")
+    return changed
+
+
+def build_entries(items, annotations, image_root):
+    entries = []
+    for item in items:
+        idx = item["id"]
+        entries.append({
+            "messages": [
+                {
+                    "from": "human",
+                    "value": PROMPT,
+                },
+                {
+                    "from": "gpt",
+                    "value": f"{annotations[idx]}",
+                },
+            ],
+            "images": [
+                f"{image_root}/{idx}.jpg",
+            ]
+        })
+    return entries
+
+
+def link_images(items, image_dir, dest_dir, mode="symlink"):
+    """Link (instead of copy) the images of a set into dest_dir"""
+    os.makedirs(dest_dir, exist_ok=True)
+    for item in items:
+        src_file = os.path.join(image_dir, f"{item['id']}.jpg")
+        dst_file = os.path.join(dest_dir, f"{item['id']}.jpg")
+        if not os.path.exists(src_file):
+            print(f"Image {src_file} not found!")
+            continue
+        if os.path.lexists(dst_file):
+            os.remove(dst_file)
+        if mode == "hardlink":
+            os.link(src_file, dst_file)
+        else:
+            os.symlink(os.path.relpath(src_file, dest_dir), dst_file)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Train/test split of the tombstones for LLaMA-Factory.")
+    parser.add_argument("--annotation_file", type=str, default="../annotation/tombs_grounded.txt",
+                        help="TMR annotations")
+    parser.add_argument("--image_dir", type=str, default="../images", help="Folder containing the images")
+    parser.add_argument("--train_size", type=int, default=600, help="Number of train tombstones (default: 600)")
+    parser.add_argument("--seed", type=int, default=42, help="Shuffle seed (default: 42)")
+    parser.add_argument("--manifest", type=str, default="split_manifest.json", help="Manifest file")
+    parser.add_argument("--from_manifest", action="store_true",
+                        help="Rebuild the JSON files and links from the existing manifest")
+    parser.add_argument("--image_root", type=str, default="/projects/0/prjs0885/LLaMA-Factory/tombreader/data",
+                        help="Image folder written into the JSON files")
+    parser.add_argument("--link", type=str, default="symlink", choices=["symlink", "hardlink", "none"],
+                        help="How to fill train_images / test_images (default: symlink)")
+    parser.add_argument("--hash_images", action="store_true", help="Store the SHA-1 of every image")
+    args = parser.parse_args()
+
+    annotations = load_annotations(args.annotation_file)
+    if args.from_manifest:
+        with open(args.manifest, encoding="utf-8") as f:
+            manifest = json.load(f)
+        check_manifest(manifest, annotations)
     else:
-        print(f"Test image {src_file} not found!")
+        manifest = make_manifest(annotations, args.train_size, args.seed, args.image_dir, args.hash_images)
+        with open(args.manifest, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=1)
+
+    for name, items in manifest["splits"].items():
+        with open(f"tomb_parsing_{name}.json", "w") as json_file:
+            json.dump(build_entries(items, annotations, args.image_root), json_file)
+        if args.link != "none":
+            link_images(items, args.image_dir, f"{name}_images", args.link)
+        print(f"{name}: {len(items)} tombstones")
+
+
+if __name__ == "__main__":
+    main()
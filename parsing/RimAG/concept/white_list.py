@@ -1,6 +1,9 @@
 import re
 from collections import Counter
 import matplotlib.pyplot as plt
+import numpy as np
+
+SYNSET_PATTERN = r'\b[a-z]+\.(?:n|v|a|r|s)\.\d{2}\b'
 
 
 def extract_synsets_from_file(filepath):
@@ -15,11 +18,28 @@ def extract_synsets_from_file(filepath):
         print(f"文件 {filepath} 未找到。")
         return []
     # 正则表达式匹配形如 "widow.n.01" 的格式
-    pattern = r'\b[a-z]+\.(?:n|v|a|r|s)\.\d{2}\b'
-    synsets = re.findall(pattern, content)
+    synsets = re.findall(SYNSET_PATTERN, content)
     return synsets
 
 
+def count_synsets_in_corpus(filepath):
+    """
+    从 columnar corpus（.npz，见 parsing/evaluation/utils/tmr_corpus.py）中统计 synset 出现频率。
+    不再扫描文本：对 concept 列做一次 bincount，只对 symbol 表用正则表达式
+    （和文本上的正则表达式一样，mother-in-law.n.01 也计为 law.n.01）。
+    """
+    with np.load(filepath) as corpus:
+        symbols = corpus["symbols"].tolist()
+        counts = np.bincount(corpus["concepts"], minlength=len(symbols)).tolist()
+    pattern = re.compile(SYNSET_PATTERN)
+    counter = Counter()
+    for symbol, count in zip(symbols, counts):
+        if count:
+            for synset in pattern.findall(symbol):
+                counter[synset] += count
+    return counter
+
+
 def plot_synset_distribution(counter):
     """
     绘制 synset 出现频率的分布图
@@ -38,12 +58,15 @@ def plot_synset_distribution(counter):
 
 if __name__ == "__main__":
     filepath = "/Users/xiaozhang/code/multi-modal-PMB/tomb/tombreader/annotation/tombs_grounded.txt"  # 确保该文件路径正确
-    synset_list = extract_synsets_from_file(filepath)
+    # 也可以是 tmr_corpus.py 导出的 .npz 文件
+    if filepath.endswith(".npz"):
+        counter = count_synsets_in_corpus(filepath)
+    else:
+        counter = Counter(extract_synsets_from_file(filepath))
 
-    if not synset_list:
+    if not counter:
         print("没有提取到 synset。")
     else:
-        counter = Counter(synset_list)
         print("各 synset 出现频率：")
         for syn, cnt in counter.most_common():
             print(f"{syn}: {cnt}")
@@ -0,0 +1,229 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Batched inscription classification with Qwen2.5-VL, without free-text answers.
+
+classify.py asks the nine questions in one free-text prompt, generates up to 512 tokens per image, and
+process_answer.py has to split the answer into nine fields (and drops the answers that do not have nine).
+Here every question is asked separately and answered by a single forward pass: the yes/no dimensions compare
+the next-token logits of "Yes" and "No", the language and the font style compare the first tokens of a fixed
+set of labels. Prompts of several images and questions are batched together, nothing is sampled, and the
+labels go straight into a typed table (TSV): strings for language and font style, 0/1 for the yes/no
+dimensions, with the probability of "Yes" in the p_* columns. read_table returns the rows with these types.
+
+Parameters:
+  --model            : Model name (default: Qwen/Qwen2.5-VL-72B-Instruct).
+  --folder_path      : Folder containing the tombstone images.
+  --output_path      : TSV file the table is (incrementally) saved to (default: inscription_labels.tsv).
+  --batch_size       : Number of prompts per forward pass (default: 9, one image).
+"""
+
+import argparse
+import csv
+import os
+from collections import Counter
+
+import torch
+from transformers import Qwen2_5_VLForConditionalGeneration, AutoProcessor
+from qwen_vl_utils import process_vision_info
+
+# Select device dynamically
+device = "cuda" if torch.cuda.is_available() else "cpu"
+
+min_pixels = 256 * 28 * 28
+max_pixels = 1280 * 28 * 28
+
+# labels of the open dimensions, as answered in qwen_72b_answer_new_2.json
+LANGUAGES = ["Dutch", "English", "French", "German", "Frisian", "Latin", "Italian", "Spanish", "Indonesian", "Greek"]
+FONT_STYLES = ["Serif", "Sans-serif", "Gothic", "Script"]
+
+# dimensions with a fixed set of labels: (name, question, labels)
+LABEL_QUESTIONS = [
+    ("language", "In which language is the inscription written?", LANGUAGES),
+    ("font_style", "What is the font style of the inscription?", FONT_STYLES),
+]
+
+# yes/no dimensions, named as in process_answer.py: (name, question)
+YES_NO_QUESTIONS = [
+    ("coreference", "Is there complex coreference to someone? Only answer 'Yes' if there is ambiguous or "
+                    "multi-step reference between entities, beyond simple possessives like 'our father'."),
+    ("rhetorical_devices", "Does the inscription use rhetorical devices?"),
+    ("syntactic_complexity", "Is the syntax of the inscription complex?"),
+    ("figurative_language", "Does the inscription use figurative language?"),
+    ("anaphoric_deictic_pronouns", "Does the inscription contain pronouns?"),
+    ("abbreviated_names", "Does the inscription contain abbreviated names (but not person names)?"),
+    ("multiple_persons", "Does the inscription contain the names of multiple persons?"),
+]
+
+# columns of the table and their types
+TABLE_COLUMNS = ([("file", str)] + [(name, str) for name, _, _ in LABEL_QUESTIONS]
+                 + [(name, bool) for name, _ in YES_NO_QUESTIONS]
+                 + [(f"p_{name}", float) for name, _ in YES_NO_QUESTIONS])
+
+
+def load_model(model_name):
+    model = Qwen2_5_VLForConditionalGeneration.from_pretrained(
+        model_name,
+        torch_dtype="auto",
+        device_map="auto"
+    )
+    model.eval()
+    processor = AutoProcessor.from_pretrained(model_name, min_pixels=min_pixels, max_pixels=max_pixels)
+    # the answer token is scored at the last position, so pad on the left
+    processor.tokenizer.padding_side = "left"
+    return model, processor
+
+
+def first_token_ids(tokenizer, labels):
+    """Id of the first token of every label; the first tokens must differ to tell the labels apart"""
+    ids = [tokenizer.encode(label, add_special_tokens=False)[0] for label in labels]
+    if len(set(ids)) != len(ids):
+        shared = {tokenizer.decode([i]): [label for label, j in zip(labels, ids) if j == i]
+                  for i in ids if ids.count(i) > 1}
+        raise ValueError(f"Labels {labels} do not start with different tokens: {shared}")
+    return ids
+
+
+def label_token_ids(tokenizer):
+    """{labels: first token ids} of every question, checked once before any image is classified"""
+    label_sets = [labels for _, _, labels in LABEL_QUESTIONS] + [["Yes", "No"]]
+    return {tuple(labels): first_token_ids(tokenizer, labels) for labels in label_sets}
+
+
+def build_prompts(image_path):
+    """(dimension, messages, labels) of every question about one image"""
+    prompts = []
+    for name, question, labels in LABEL_QUESTIONS:
+        text = f"{question} Answer with one of: {', '.join(labels)}. Do not give any other text."
+        prompts.append((name, text, labels))
+    for name, question in YES_NO_QUESTIONS:
+        prompts.append((name, f"{question} Answer with Yes or No only.", ["Yes", "No"]))
+    return [(name, [{"role": "user", "content": [{"type": "image", "image": image_path},
+                                                 {"type": "text", "text": text}]}], labels)
+            for name, text, labels in prompts]
+
+
+@torch.no_grad()
+def score_prompts(model, processor, prompts, token_ids):
+    """
+    Probabilities of the labels of every prompt, from the logits of the first answer token
+    Arguments:
+        token_ids: {labels: first token ids} (label_token_ids)
+    """
+    texts = [processor.apply_chat_template(messages, tokenize=False, add_generation_prompt=True)
+             for _, messages, _ in prompts]
+    image_inputs, video_inputs = process_vision_info([messages for _, messages, _ in prompts])
+    inputs = processor(
+        text=texts,
+        images=image_inputs,
+        videos=video_inputs,
+        padding=True,
+        return_tensors="pt",
+    ).to(device)
+    # one forward pass, only the logits of the next token are kept
+    output = model.generate(**inputs, max_new_tokens=1, do_sample=False, temperature=None, top_p=None,
+                            top_k=None, output_logits=True, return_dict_in_generate=True)
+    logits = output.logits[0].float()
+    probabilities = []
+    for row, (_, _, labels) in enumerate(prompts):
+        ids = torch.tensor(token_ids[tuple(labels)], device=logits.device)
+        probabilities.append(torch.softmax(logits[row, ids], dim=-1).tolist())
+    return probabilities
+
+
+def classify(model, processor, image_paths, token_ids, batch_size=9):
+    """One typed row per image, see TABLE_COLUMNS"""
+    prompts = [(image_path, prompt) for image_path in image_paths for prompt in build_prompts(image_path)]
+    rows = {image_path: {"file": os.path.basename(image_path)} for image_path in image_paths}
+    for start in range(0, len(prompts), batch_size):
+        batch = prompts[start:start + batch_size]
+        for (image_path, (name, _, labels)), probs in zip(batch, score_prompts(model, processor,
+                                                                                 [p for _, p in batch],
+                                                                                 token_ids)):
+            row = rows[image_path]
+            if labels == ["Yes", "No"]:
+                row[name] = probs[0] > probs[1]
+                row[f"p_{name}"] = probs[0]
+            else:
+                row[name] = labels[max(range(len(labels)), key=probs.__getitem__)]
+    return [rows[image_path] for image_path in image_paths]
+
+
+def write_table(rows, path):
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f, delimiter="\t")
+        writer.writerow([name for name, _ in TABLE_COLUMNS])
+        for row in rows:
+            writer.writerow([int(row[name]) if kind is bool else (f"{row[name]:.4f}" if kind is float else row[name])
+                             for name, kind in TABLE_COLUMNS])
+
+
+def read_table(path):
+    """Rows of a table written by write_table, with the types of TABLE_COLUMNS"""
+    types = dict(TABLE_COLUMNS)
+    rows = []
+    with open(path, encoding="utf-8", newline="") as f:
+        for record in csv.DictReader(f, delimiter="\t"):
+            rows.append({name: (value == "1" if types[name] is bool else types[name](value))
+                         for name, value in record.items()})
+    return rows
+
+
+def summarize(rows):
+    """Distribution of every dimension, as process_answer.py prints it"""
+    for name, kind in TABLE_COLUMNS[1:]:
+        if kind is float:
+            continue
+        counter = Counter(row[name] for row in rows)
+        print(f"{name}: {dict(counter)}")
+    for name, _ in YES_NO_QUESTIONS:
+        files = [row["file"] for row in rows if row[name]]
+        print(f"{name} Yes: {files} (count: {len(files)})")
+
+
+def process_folder(model, processor, folder_path, output_path, token_ids, batch_size=9):
+    rows = read_table(output_path) if os.path.exists(output_path) else []
+    done = {row["file"] for row in rows}
+    file_names = [f for f in sorted(os.listdir(folder_path))
+                  if f.lower().endswith(('.png', '.jpg', '.jpeg')) and f not in done]
+    print(f"Total files to process: {len(file_names) + len(done)}")
+    print(f"Already processed files: {len(done)}")
+    # a few images at a time, so that the table can be saved incrementally
+    images_per_step = max(1, batch_size // len(build_prompts("")))
+    for start in range(0, len(file_names), images_per_step):
+        image_paths = [os.path.join(folder_path, f) for f in file_names[start:start + images_per_step]]
+        try:
+            rows.extend(classify(model, processor, image_paths, token_ids, batch_size))
+        except Exception as e:
+            print(f"Error processing {', '.join(map(os.path.basename, image_paths))}: {e}")
+            continue
+        write_table(rows, output_path)
+        print(f"Processed ({len(rows)}/{len(file_names) + len(done)})")
+    summarize(rows)
+    print(f"Processing complete. Results saved to {output_path}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Batched Yes/No logit classification of tombstone inscriptions.")
+    parser.add_argument("--model", type=str, default="Qwen/Qwen2.5-VL-72B-Instruct",
+                        help="Model name (default: Qwen/Qwen2.5-VL-72B-Instruct)")
+    parser.add_argument("--folder_path", type=str,
+                        default="/gpfs/work4/0/prjs0885/Tombstone-Parsing/data/split/test_images",
+                        help="Folder containing the tombstone images")
+    parser.add_argument("--output_path", type=str, default="inscription_labels.tsv",
+                        help="TSV file the table is saved to")
+    parser.add_argument("--batch_size", type=int, default=9,
+                        help="Number of prompts per forward pass (default: 9, the questions of one image)")
+    args = parser.parse_args()
+
+    model, processor = load_model(args.model)
+    # a label set the tokenizer can not tell apart would make every batch fail, so stop before the first one
+    try:
+        token_ids = label_token_ids(processor.tokenizer)
+    except ValueError as e:
+        parser.exit(1, f"{e}\nChange the labels in LABEL_QUESTIONS so that their first tokens differ.\n")
+    process_folder(model, processor, args.folder_path, args.output_path, token_ids, args.batch_size)
+
+
+if __name__ == "__main__":
+    main()
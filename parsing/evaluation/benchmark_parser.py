@@ -0,0 +1,129 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Benchmark of utils/penman_parser.py against amr.AMR.parse_AMR_line.
+
+Every TMR of the annotation file (and of the prediction files, if given) is read as smatch reads it, and
+parsed into triples by both parsers: parse_AMR_line + rename_node + get_triples, and parse_penman + triples.
+The script reports the time per TMR of both, the time of parse_penman alone (the integer triples), and
+checks that both parsers reject the same TMRs and return the same triples, in the same order, for the others.
+For the rejected TMRs the error of parse_penman (with its offset) is shown.
+
+Parameters:
+  --annotation_file  : TMR annotations (default: ../../data/annotation/tombs_grounded.txt).
+  --predictions      : Prediction files to include: JSON {image: TMR} of the few-shot scripts, or JSON Lines
+                       with a "predict" field (default: none).
+  --repeats          : Number of timed passes, the fastest is reported (default: 5).
+  --show_errors      : Number of parse errors to show (default: 5).
+
+Example:
+  python benchmark_parser.py --predictions ../few_shot/qwen_7b/qwen_7b_*_shot.json
+"""
+
+import io
+import sys
+import json
+import time
+import argparse
+import contextlib
+
+from utils.penman_parser import parse_penman, get_penman_line
+
+try:
+    import amr
+except ImportError:
+    amr = None
+
+
+def load_tmrs(annotation_file, prediction_files):
+    """
+    (source, TMR on one line) of every TMR, as smatch reads them. Predictions that are not a string (e.g. the
+    lists of answers of llava_7b_one_shot.json) are kept as an empty line, so they count as ill-formed.
+    """
+    with open(annotation_file, "r", encoding="utf-8") as f:
+        texts = [("gold", text) for text in f.read().split("\n\n") if text.strip()]
+    for prediction_file in prediction_files:
+        with open(prediction_file, "r", encoding="utf-8") as f:
+            if prediction_file.endswith(".jsonl"):
+                predictions = [json.loads(line)["predict"] for line in f if line.strip()]
+            else:
+                predictions = list(json.load(f).values())
+        texts.extend((prediction_file, text if isinstance(text, str) else "") for text in predictions)
+    return [(source, get_penman_line(io.StringIO(text))) for source, text in texts]
+
+
+def amr_triples(line):
+    # parse_AMR_line prints its errors to amr.ERROR_LOG
+    amr_obj = amr.AMR.parse_AMR_line(line)
+    if amr_obj is None:
+        raise ValueError("amr.AMR.parse_AMR_line could not parse the AMR")
+    amr_obj.rename_node("a")
+    return amr_obj.get_triples()
+
+
+def penman_triples(line):
+    return parse_penman(line).triples("a")
+
+
+def parse_all(parse, lines):
+    """Triples of every line, None for the lines that could not be parsed"""
+    results = []
+    for line in lines:
+        try:
+            results.append(parse(line))
+        except Exception:
+            results.append(None)
+    return results
+
+
+def best_time(parse, lines, repeats):
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        parse_all(parse, lines)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark of penman_parser.py against the amr module.")
+    parser.add_argument("--annotation_file", type=str, default="../../data/annotation/tombs_grounded.txt",
+                        help="TMR annotations")
+    parser.add_argument("--predictions", type=str, nargs="*", default=[], help="Prediction files to include")
+    parser.add_argument("--repeats", type=int, default=5, help="Number of timed passes (default: 5)")
+    parser.add_argument("--show_errors", type=int, default=5, help="Number of parse errors to show (default: 5)")
+    args = parser.parse_args()
+
+    tmrs = load_tmrs(args.annotation_file, args.predictions)
+    sources = sorted(set(source for source, _ in tmrs), key=lambda source: source != "gold")
+    for source in sources:
+        lines = [line for s, line in tmrs if s == source]
+        print(f"\n{source}: {len(lines)} TMRs, {sum(map(len, lines)) / 1e6:.2f} M characters")
+        penman_seconds = best_time(penman_triples, lines, args.repeats)
+        parse_seconds = best_time(parse_penman, lines, args.repeats)
+        new = parse_all(penman_triples, lines)
+        print(f"  parse_penman + triples  {penman_seconds / len(lines) * 1e6:8.1f} us per TMR")
+        print(f"  parse_penman            {parse_seconds / len(lines) * 1e6:8.1f} us per TMR")
+        if amr is not None:
+            with contextlib.redirect_stdout(io.StringIO()):
+                amr.ERROR_LOG = sys.stdout
+                amr_seconds = best_time(amr_triples, lines, args.repeats)
+                old = parse_all(amr_triples, lines)
+            ratio = amr_seconds / penman_seconds
+            relative = f"{ratio:.1f}x slower" if ratio >= 1 else f"{1 / ratio:.1f}x faster"
+            print(f"  amr module              {amr_seconds / len(lines) * 1e6:8.1f} us per TMR ({relative})")
+            same_rejected = sum((a is None) == (b is None) for a, b in zip(old, new))
+            same_triples = sum(a == b for a, b in zip(old, new) if a is not None and b is not None)
+            parsed = sum(a is not None and b is not None for a, b in zip(old, new))
+            print(f"  same accept/reject {same_rejected}/{len(lines)}, same triples {same_triples}/{parsed}")
+        rejected = [line for line, triples in zip(lines, new) if triples is None]
+        print(f"  ill-formed: {len(rejected)}")
+        for line in rejected[:args.show_errors]:
+            try:
+                parse_penman(line)
+            except ValueError as e:
+                print(f"    {e}")
+
+
+if __name__ == "__main__":
+    main()
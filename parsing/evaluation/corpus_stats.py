@@ -0,0 +1,257 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Statistics of the dataset: the TMR corpus and the inscription classifier labels.
+
+The corpus is loaded as columns (utils/tmr_corpus.py, from the .npz corpus or the annotation file) and every
+distribution is a scan of the columns (bincount / masks over the node, edge and attribute arrays), instead of
+re.findall over the text (RimAG/concept/white_list.py) and Counters over records (process_answer.py):
+  - samples: tombstones, nodes, edges and attributes (per tombstone)
+  - synset frequencies (and parts of speech) of the concepts, role frequencies
+  - entities (:ent) per tombstone
+  - date coverage: tombstones with a :dob / :dod, and dates with a day, month and year
+  - geo / hco density: codes per tombstone and per name
+  - language, font style and yes/no category counts of the classifier labels, read from the free-text answers
+    of classify.py (JSON) or from the table of classify_batched.py (TSV)
+The statistics are cached in --cache_file, keyed by the SHA-1 of the input files.
+
+Parameters:
+  --annotation_file : TMR annotations, or a .npz corpus (default: ../../data/annotation/tombs_grounded.txt).
+  --classifier      : Classifier labels, JSON answers or TSV tables
+                      (default: ../classify_inscription/qwen_72b_answer_new_2.json).
+  --cache_file      : JSON file with the cached statistics (default: corpus_stats_cache.json).
+  --output          : Also save the statistics to this JSON file.
+  --top             : Number of most frequent synsets and roles shown (default: 20).
+"""
+
+import re
+import csv
+import json
+import hashlib
+import argparse
+import os
+
+import numpy as np
+
+from utils.tmr_corpus import load_corpus
+from utils.tmr_graph import ROLE, DST, NODE
+
+# increase when the statistics change, so that cached statistics are recomputed
+STATS_VERSION = 1
+
+SYNSET = re.compile(r"[a-z][a-z_-]*\.([nvars])\.\d{2}")
+
+# dimensions of the classifier answers, in the order of classify.py
+DIMENSIONS = ["language", "font_style", "coreference", "rhetorical_devices", "syntactic_complexity",
+              "figurative_language", "anaphoric_deictic_pronouns", "abbreviated_names", "multiple_persons"]
+OPEN_DIMENSIONS = ["language", "font_style"]
+
+
+def file_sha1(path):
+    digest = hashlib.sha1()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def ranked(counts, labels):
+    """{label: count} of the non-zero counts, most frequent first"""
+    order = np.argsort(-counts, kind="stable")
+    return {labels[i]: int(counts[i]) for i in order if counts[i]}
+
+
+def distribution(values):
+    """{value: number of occurrences} of an integer array, and its mean"""
+    counts = np.bincount(values) if len(values) else np.zeros(0, dtype=np.int64)
+    return {"mean": float(values.mean()) if len(values) else 0.0,
+            "counts": {int(value): int(count) for value, count in enumerate(counts) if count}}
+
+
+def corpus_stats(corpus):
+    n = len(corpus)
+    symbols = corpus.symbols.tolist()
+    edges, attributes = corpus.edges, corpus.attributes
+    # tombstone of every edge and attribute, and their nodes as rows of the node columns
+    edge_tombstones = np.repeat(np.arange(n), np.diff(corpus.edge_offsets))
+    attribute_tombstones = np.repeat(np.arange(n), np.diff(corpus.attribute_offsets))
+    edge_dst = edges[:, DST] + corpus.node_offsets[edge_tombstones]
+    attribute_nodes = attributes[:, NODE] + corpus.node_offsets[attribute_tombstones]
+    ids = dict(zip(["TOP", "ent", "dob", "dod", "dom", "moy", "yoc", "nam", "geo", "hco"],
+                   corpus.symbol_ids(["TOP", "ent", "dob", "dod", "dom", "moy", "yoc", "nam", "geo", "hco"])))
+
+    def per_tombstone(tombstones, roles, role):
+        return np.bincount(tombstones[roles == ids[role]], minlength=n)
+
+    stats = {
+        "samples": {
+            "tombstones": n,
+            "parsed": int(np.count_nonzero(corpus.parsed)),
+            "truncated": int(np.count_nonzero(corpus.truncated)),
+            "nodes": len(corpus.concepts),
+            "edges": len(edges),
+            "attributes": int(np.count_nonzero(attributes[:, ROLE] != ids["TOP"])),
+            "symbols": len(symbols),
+            "nodes_per_tombstone": distribution(np.diff(corpus.node_offsets)),
+        },
+    }
+
+    # concepts: the synsets among the symbols are found once, the concepts are counted with one bincount
+    concept_counts = corpus.concept_counts()
+    pos = np.array([(match.group(1) if match else "") for match in map(SYNSET.fullmatch, symbols)])
+    synset_counts = np.where(pos != "", concept_counts, 0)
+    stats["synsets"] = ranked(synset_counts, symbols)
+    stats["concepts_not_synsets"] = ranked(concept_counts - synset_counts, symbols)
+    stats["parts_of_speech"] = {p: int(synset_counts[pos == p].sum()) for p in "nvars"}
+
+    # roles of the relations and of the attributes (without the TOP of every root)
+    roles = np.concatenate((edges[:, ROLE], attributes[:, ROLE]))
+    stats["roles"] = ranked(np.bincount(roles[roles != ids["TOP"]], minlength=len(symbols)), symbols)
+
+    stats["entities_per_tombstone"] = distribution(per_tombstone(edge_tombstones, edges[:, ROLE], "ent"))
+
+    # dates: which nodes (rows of the node columns) have a day, a month and a year
+    has = {}
+    for field in ("dom", "moy", "yoc"):
+        has[field] = np.zeros(len(corpus.concepts), dtype=bool)
+        has[field][attribute_nodes[attributes[:, ROLE] == ids[field]]] = True
+    stats["dates"] = {}
+    for role in ("dob", "dod"):
+        dates = edge_dst[edges[:, ROLE] == ids[role]]
+        stats["dates"][role] = {
+            "tombstones": int(np.count_nonzero(per_tombstone(edge_tombstones, edges[:, ROLE], role))),
+            "dates": len(dates),
+            "complete": int(np.count_nonzero(has["dom"][dates] & has["moy"][dates] & has["yoc"][dates])),
+            "year": int(np.count_nonzero(has["yoc"][dates])),
+        }
+
+    names = int(np.count_nonzero(attributes[:, ROLE] == ids["nam"]))
+    stats["codes"] = {"names": names}
+    for role in ("geo", "hco"):
+        codes = per_tombstone(attribute_tombstones, attributes[:, ROLE], role)
+        stats["codes"][role] = {
+            "codes": int(codes.sum()),
+            "tombstones": int(np.count_nonzero(codes)),
+            "per_tombstone": float(codes.mean()) if n else 0.0,
+            "per_name": float(codes.sum() / names) if names else 0.0,
+        }
+    return stats
+
+
+def load_classifier_labels(path):
+    """
+    {image: labels in the order of DIMENSIONS} of classifier labels: the JSON answers of classify.py (split as
+    in process_answer.py, answers without nine fields are skipped) or a TSV table of classify_batched.py.
+    The yes/no dimensions are "Yes" or "No".
+    """
+    labels = {}
+    if path.endswith(".tsv"):
+        with open(path, encoding="utf-8", newline="") as f:
+            for record in csv.DictReader(f, delimiter="\t"):
+                labels[record["file"]] = [record[dim] if dim in OPEN_DIMENSIONS
+                                          else ("Yes" if record[dim] == "1" else "No") for dim in DIMENSIONS]
+    else:
+        with open(path, encoding="utf-8") as f:
+            answers = json.load(f)
+        for image, content in answers.items():
+            parts = [re.sub(r"^\d+\.\s*", "", p.strip()).rstrip(":") for p in content.split("\n") if p.strip()]
+            if len(parts) == len(DIMENSIONS):
+                labels[image] = [part if dim in OPEN_DIMENSIONS else ("Yes" if "Yes" in part else "No")
+                                 for dim, part in zip(DIMENSIONS, parts)]
+    return labels
+
+
+def load_classifier_columns(path):
+    """{dimension: array of labels} of classifier labels, see load_classifier_labels"""
+    columns = np.array(list(load_classifier_labels(path).values()), dtype=str).reshape(-1, len(DIMENSIONS))
+    return {dim: columns[:, i] for i, dim in enumerate(DIMENSIONS)}
+
+
+def classifier_stats(columns):
+    stats = {"records": len(columns[DIMENSIONS[0]])}
+    for dim in DIMENSIONS:
+        labels, counts = np.unique(columns[dim], return_counts=True)
+        stats[dim] = ranked(counts, labels.tolist())
+    return stats
+
+
+def compute_stats(annotation_file, classifier_files):
+    stats = {"corpus": corpus_stats(load_corpus(annotation_file))}
+    for path in classifier_files:
+        stats[os.path.basename(path)] = classifier_stats(load_classifier_columns(path))
+    return stats
+
+
+def cached_stats(annotation_file, classifier_files, cache_file):
+    """Statistics of the input files, taken from cache_file if the files did not change"""
+    inputs = [annotation_file] + list(classifier_files)
+    key = hashlib.sha1(json.dumps([STATS_VERSION] + [file_sha1(path) for path in inputs]).encode()).hexdigest()
+    cache = {}
+    if cache_file and os.path.exists(cache_file):
+        with open(cache_file, encoding="utf-8") as f:
+            cache = json.load(f)
+    if key in cache:
+        print(f"Statistics of {', '.join(inputs)} taken from {cache_file}")
+        return cache[key]
+    stats = compute_stats(annotation_file, classifier_files)
+    if cache_file:
+        cache[key] = stats
+        with open(cache_file, "w", encoding="utf-8") as f:
+            json.dump(cache, f, ensure_ascii=False)
+    return stats
+
+
+def print_report(stats, top=20):
+    corpus = stats["corpus"]
+    samples = corpus["samples"]
+    print(f"Tombstones: {samples['tombstones']} ({samples['parsed']} parsed, {samples['truncated']} truncated)")
+    print(f"Nodes: {samples['nodes']}, edges: {samples['edges']}, attributes: {samples['attributes']}, "
+          f"symbols: {samples['symbols']}, nodes per tombstone: {samples['nodes_per_tombstone']['mean']:.2f}")
+    print(f"\nSynsets: {len(corpus['synsets'])} different, parts of speech: {corpus['parts_of_speech']}")
+    for synset, count in list(corpus["synsets"].items())[:top]:
+        print(f"  {synset}: {count}")
+    print(f"\nRoles: {len(corpus['roles'])} different")
+    for role, count in list(corpus["roles"].items())[:top]:
+        print(f"  {role}: {count}")
+    entities = corpus["entities_per_tombstone"]
+    print(f"\nEntities per tombstone: mean {entities['mean']:.2f}, distribution {entities['counts']}")
+    print("\nDates:")
+    for role, dates in corpus["dates"].items():
+        print(f"  {role}: {dates['tombstones']} tombstones, {dates['dates']} dates, "
+              f"{dates['complete']} with day, month and year, {dates['year']} with a year")
+    codes = corpus["codes"]
+    print(f"\nCodes ({codes['names']} names):")
+    for role in ("geo", "hco"):
+        c = codes[role]
+        print(f"  {role}: {c['codes']} codes in {c['tombstones']} tombstones, {c['per_tombstone']:.2f} per tombstone, "
+              f"{c['per_name']:.3f} per name")
+    for name, labels in stats.items():
+        if name == "corpus":
+            continue
+        print(f"\nClassifier labels {name} ({labels['records']} records):")
+        for dim in DIMENSIONS:
+            print(f"  {dim}: {labels[dim]}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Statistics of the TMR corpus and the classifier labels.")
+    parser.add_argument("--annotation_file", type=str, default="../../data/annotation/tombs_grounded.txt",
+                        help="TMR annotations, or a .npz corpus")
+    parser.add_argument("--classifier", type=str, nargs="*",
+                        default=["../classify_inscription/qwen_72b_answer_new_2.json"],
+                        help="Classifier labels, JSON answers (classify.py) or TSV tables (classify_batched.py)")
+    parser.add_argument("--cache_file", type=str, default="corpus_stats_cache.json",
+                        help="JSON file with the cached statistics")
+    parser.add_argument("--output", type=str, default=None, help="Also save the statistics to this JSON file")
+    parser.add_argument("--top", type=int, default=20, help="Number of most frequent synsets and roles shown")
+    args = parser.parse_args()
+
+    stats = cached_stats(args.annotation_file, args.classifier, args.cache_file)
+    print_report(stats, args.top)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(stats, f, ensure_ascii=False, indent=1)
+
+
+if __name__ == "__main__":
+    main()
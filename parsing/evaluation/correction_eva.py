@@ -0,0 +1,102 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Smatch of post-corrected predictions (e.g. RieAG/rag/hco_geo_combine.py, which only replaces :geo and :hco
+codes) against the pre-correction run.
+
+The predictions of both files are scored against the gold TMRs as in graph_eva.py, through the smatch cache
+(utils/smatch_cache.py): the pre-correction pairs are usually cached already, the unchanged predictions are
+taken from the cache, and every corrected prediction is rescored from the alignment of its previous version
+(the hill-climbing starts from the previous best mapping, or with --delta, only the triples that changed are
+rescored under that mapping).
+
+Parameters:
+  --predictions : Corrected predictions, JSON Lines with "label" and "predict" (default:
+                  generated_predictions_updated.jsonl).
+  --previous    : Predictions before the correction, in the same order (default: generated_predictions.jsonl).
+  --cache_file  : JSON file with the cached smatch results (default: smatch_cache.json).
+  --delta       : Only rescore the changed triples when the nodes of a prediction did not change.
+"""
+
+import re
+import json
+import time
+import argparse
+
+from utils.smatch import compute_f
+from utils.smatch_cache import SmatchCache
+
+
+def load_pairs(path):
+    """(gold, prediction) pairs of a prediction file, the root of the prediction renamed as in graph_eva.py"""
+    pairs = []
+    with open(path, "r", encoding="utf-8") as file:
+        for line in file:
+            data = json.loads(line)
+            label_t_code = re.search(r"\(t\d+\b", data["label"])
+            if label_t_code:
+                data["predict"] = re.sub(r"\(t\d+\b", label_t_code.group(0), data["predict"], count=1)
+            pairs.append((data["label"], data["predict"]))
+    return pairs
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Smatch of corrected predictions, warm-started from the "
+                                                 "pre-correction run.")
+    parser.add_argument("--predictions", type=str, default="generated_predictions_updated.jsonl",
+                        help="Corrected predictions (JSON Lines)")
+    parser.add_argument("--previous", type=str, default="generated_predictions.jsonl",
+                        help="Predictions before the correction (JSON Lines)")
+    parser.add_argument("--cache_file", type=str, default="smatch_cache.json",
+                        help="JSON file with the cached smatch results")
+    parser.add_argument("--delta", action="store_true",
+                        help="Only rescore the changed triples when the nodes of a prediction did not change")
+    args = parser.parse_args()
+
+    pairs = load_pairs(args.predictions)
+    previous_pairs = load_pairs(args.previous)
+    if len(pairs) != len(previous_pairs):
+        print(f"Warning: {len(pairs)} corrected and {len(previous_pairs)} previous predictions, "
+              f"only the first {min(len(pairs), len(previous_pairs))} are compared")
+
+    cache = SmatchCache(args.cache_file)
+    start = time.perf_counter()
+    previous_f1 = corrected_f1 = 0.0
+    changed = ill_form = previous_ill_form = 0
+    for i, ((gold, predict), (_, previous)) in enumerate(zip(pairs, previous_pairs)):
+        idx = f"t{i:05d}"
+        try:
+            before = compute_f(*cache.match(gold, previous)[:3])[2]
+        except Exception as e:
+            print(f"tombstone {idx}, previous generation error: {e}")
+            before = 0.0
+            previous_ill_form += 1
+        try:
+            after = compute_f(*cache.rescore(gold, previous, predict, delta=args.delta)[:3])[2]
+        except Exception:
+            try:
+                # the previous prediction was ill-formed, the corrected one is scored from scratch
+                after = compute_f(*cache.match(gold, predict)[:3])[2]
+            except Exception as e:
+                print(f"tombstone {idx}, generation error: {e}")
+                after = 0.0
+                ill_form += 1
+        if predict != previous:
+            changed += 1
+            print(f"tombstone {idx}, f1 score {before:.4f} -> {after:.4f}")
+        previous_f1 += before
+        corrected_f1 += after
+    cache.save()
+
+    total = min(len(pairs), len(previous_pairs))
+    print(f"{changed} of {total} predictions changed, {cache.misses} pairs scored, {cache.hits} taken from the "
+          f"cache in {time.perf_counter() - start:.2f} s")
+    if total:
+        print(f"avg f1 score before the correction: {previous_f1 / total}")
+        print(f"avg f1 score after the correction: {corrected_f1 / total}")
+        print(f"ill-formed before the correction: {previous_ill_form / total}")
+        print(f"ill-formed: {ill_form / total}")
+
+
+if __name__ == "__main__":
+    main()
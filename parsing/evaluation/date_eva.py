@@ -1,20 +1,34 @@
 import json
 import re
 
+from utils.tmr_graph import TMRGraph, unquote
+
+
 def extract_dates(penman_text):
     """
-    利用正则表达式从 penman notation 文本中提取所有 date 信息。
+    从 penman notation 文本解析出的 TMRGraph 中提取所有 date 信息（:dob 和 :dod 指向的节点）。
     例如，对于以下片段：
          :dob (x5 / date.n.05
                   :dom "12"
                   :moy "10"
                   :yoc "1926")
     返回的集合中包含 "12-10-1926"（这里使用 日-月-年 格式）。
+    无法解析的文本（ill-formed 的预测）仍然用正则表达式提取。
     """
-    pattern = r':(dob|dod)\s*\([^)]*?:dom\s*"([^"]+)"\s*:moy\s*"([^"]+)"\s*:yoc\s*"([^"]+)"'
-    matches = re.findall(pattern, penman_text, re.DOTALL | re.MULTILINE)
-    # 对于每个匹配，构造 "dom-moy-yoc" 的日期字符串
-    dates = set(f"{m[1]}-{m[2]}-{m[3]}" for m in matches)
+    try:
+        graph = TMRGraph.from_penman(penman_text)
+    except ValueError:
+        pattern = r':(dob|dod)\s*\([^)]*?:dom\s*"([^"]+)"\s*:moy\s*"([^"]+)"\s*:yoc\s*"([^"]+)"'
+        matches = re.findall(pattern, penman_text, re.DOTALL | re.MULTILINE)
+        # 对于每个匹配，构造 "dom-moy-yoc" 的日期字符串
+        return set(f"{m[1]}-{m[2]}-{m[3]}" for m in matches)
+    dates = set()
+    for node in graph.targets("dob") + graph.targets("dod"):
+        # 每个字段取第一个带引号的值
+        fields = [[value for value in map(unquote, graph.values(role, node)) if value]
+                  for role in ("dom", "moy", "yoc")]
+        if all(fields):
+            dates.add("-".join(values[0] for values in fields))
     return dates
 
 def compute_f1_scores(jsonl_file):
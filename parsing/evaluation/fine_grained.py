@@ -2,7 +2,7 @@ import os
 import re
 import json
 
-from utils.smatch import score_amr_pairs
+from utils.smatch_cache import SmatchCache
 
 if __name__ == '__main__':
     # 1. 定义各维度对应的图片文件名列表
@@ -317,6 +317,8 @@ if __name__ == '__main__':
 
     # 6. 构造 gold_dict，用于后续对比
     gold_dict = {f"t{i:05d}": label for i, label in enumerate(labels)}
+    # smatch 结果缓存：之前运行中算过的 (gold, predict) 对直接复用
+    smatch_cache = SmatchCache("smatch_cache.json")
 
     # 7. 遍历预测结果，计算 Smatch 得分并分类汇总
     for i, predict in enumerate(predicts):
@@ -348,8 +350,8 @@ if __name__ == '__main__':
             #                                               :nam "HARM BORK"))))
             # '''
 
-            (precision, recall, best_f_score), unmatched_1, unmatched_2 = score_amr_pairs(
-                [gold_penman], [pred_penman]
+            (precision, recall, best_f_score), unmatched_1, unmatched_2 = smatch_cache.score_amr_pair(
+                gold_penman, pred_penman
             )
 
             # 存储 overall 分数
@@ -380,6 +382,9 @@ if __name__ == '__main__':
         except Exception as e:
             print(f"Error processing {idx}: {e}")
 
+    smatch_cache.save()
+    print(f"smatch cache: {smatch_cache.hits} pairs reused, {smatch_cache.misses} scored")
+
     # 8. 计算并打印各维度的平均得分
     # overall
     if overall_score:
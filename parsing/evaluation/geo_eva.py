@@ -1,17 +1,30 @@
 import json
 import re
 
+from utils.tmr_graph import TMRGraph, unquote
+
+
 def extract_geo_codes(penman_text):
     """
-    利用正则表达式从 penman notation 文本中提取所有 geo code。
+    从 penman notation 文本解析出的 TMRGraph 中提取所有 geo code（有 :nam 的节点的 :geo 值）。
     例如，对于以下片段：
        :nam "SEBALDEBUREN" :geo "2747409"
     返回的集合中包含 "2747409"。
+    无法解析的文本（ill-formed 的预测）仍然用正则表达式提取。
     """
-    pattern = r':nam\s*"([^"]+?)"\s*:geo\s*"([^"]+?)"'
-    matches = re.findall(pattern, penman_text, re.DOTALL | re.MULTILINE)
-    # 返回所有匹配中第二个括号内的内容（即 geo code）
-    codes = set(match[1] for match in matches)
+    try:
+        graph = TMRGraph.from_penman(penman_text)
+    except ValueError:
+        pattern = r':nam\s*"([^"]+?)"\s*:geo\s*"([^"]+?)"'
+        matches = re.findall(pattern, penman_text, re.DOTALL | re.MULTILINE)
+        # 返回所有匹配中第二个括号内的内容（即 geo code）
+        return set(match[1] for match in matches)
+    codes = set()
+    for node in range(len(graph)):
+        if graph.values("nam", node):
+            codes.update(unquote(value) for value in graph.values("geo", node))
+    codes.discard(None)
+    codes.discard("")
     return codes
 
 def compute_f1_scores(jsonl_file):
@@ -1,4 +1,4 @@
-from utils.smatch import score_amr_pairs
+from utils.smatch_cache import SmatchCache
 import json
 import re
 
@@ -18,6 +18,9 @@ with open("generated_predictions.jsonl", "r", encoding="utf-8") as file:
 
 gold_dict = {f"t{i:05d}": label for i, label in enumerate(labels)}
 
+# smatch results of the pairs scored in earlier runs, only new or changed pairs are scored
+smatch_cache = SmatchCache("smatch_cache.json")
+
 avg_f1 = 0
 ill_form = 0
 unmatched_stats = {}
@@ -28,7 +31,7 @@ for i, predict in enumerate(predicts):
         idx = f"t{i:05d}"
         gold_penman = gold_dict[idx]
         pred_penman = predict
-        (precision, recall, best_f_score), unmatched_1, unmatched_2 = score_amr_pairs([gold_penman], [pred_penman])
+        (precision, recall, best_f_score), unmatched_1, unmatched_2 = smatch_cache.score_amr_pair(gold_penman, pred_penman)
         avg_f1 += best_f_score
         print(f"tombstone {idx}, get {best_f_score} f1 score.")
 
@@ -36,6 +39,9 @@ for i, predict in enumerate(predicts):
         print(f"tombstone {idx}, generation error: {e}")
         ill_form += 1
 
+smatch_cache.save()
+print(f"smatch cache: {smatch_cache.hits} pairs reused, {smatch_cache.misses} scored")
+
 total = len(predicts)
 print(f"avg f1 score: {avg_f1 / total}")
 if total - ill_form > 0:
@@ -1,16 +1,22 @@
 import json
 import re
 
+from utils.tmr_graph import TMRGraph, unquote
+
+
 def extract_hco_codes(penman_text):
     """
-    使用正则表达式从复杂嵌套的 PENMAN notation 文本中提取所有 hco code。
+    从 PENMAN notation 文本解析出的 TMRGraph 中提取所有 hco code（数字的 :hco 值）。
+    无法解析的文本（ill-formed 的预测）仍然用正则表达式提取。
     """
-    # 更新正则表达式以匹配可能的嵌套结构
-    pattern = r'\:hco\s*"(\d+)"'
-    matches = re.findall(pattern, penman_text)
-    # 返回所有匹配的 hco codes
-    codes = set(matches)
-    return codes
+    try:
+        graph = TMRGraph.from_penman(penman_text)
+    except ValueError:
+        pattern = r'\:hco\s*"(\d+)"'
+        # 返回所有匹配的 hco codes
+        return set(re.findall(pattern, penman_text))
+    codes = set(unquote(value) for value in graph.values("hco"))
+    return set(code for code in codes if code and code.isdigit())
 
 def compute_f1_scores(jsonl_file):
     """
@@ -0,0 +1,270 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Evaluation of many systems against one gold: a systems x metrics table.
+
+graph_eva.py, syn_eva.py, geo_eva.py, hco_eva.py, date_eva.py and fine_grained.py evaluate one prediction
+file each, and parse every gold TMR again for every file and every metric. Here the gold TMRs are parsed once
+(their smatch triples, fine-grained node sets and geo / hco / date codes), shared by the worker processes, and
+the (system, tombstone) pairs of all prediction files are scheduled on one process pool. The smatch matches are
+taken from / added to the smatch cache (utils/smatch_cache.py), so only new pairs are hill-climbed.
+
+Metrics of every system:
+  - smatch_micro  : corpus-level smatch F1 (summed triple counts, ill-formed predictions have no test triple)
+  - smatch_macro  : average smatch F1 per tombstone, 0 for ill-formed predictions (the avg f1 of graph_eva.py)
+  - ill_formed    : share of ill-formed predictions
+  - geo, hco, date: micro F1 of the codes and dates (geo_eva.py, hco_eva.py, date_eva.py)
+  - fine-grained F of syn_eva.py (nam, rol, Concepts, ...) over the well-formed predictions
+  - cat_<dimension>: smatch_macro on the tombstones the inscription classifier labels "Yes" for a dimension
+    (the categories of fine_grained.py), if --classifier is given
+
+Parameters:
+  --predictions     : Prediction files, JSON {image: TMR} of the few-shot scripts (scored against
+                      --annotation_file) or JSON Lines with "label" and "predict" (mapped to their
+                      tombstone by image or by label, see significance.record_id). Both can be mixed.
+  --annotation_file : Gold TMRs of the JSON prediction files (default: ../../data/annotation/tombs_grounded.txt).
+  --classifier      : Classifier labels for the per-category metrics, JSON answers of classify.py or TSV tables
+                      of classify_batched.py (default: ../classify_inscription/qwen_72b_answer_new_2.json).
+  --cache_file      : JSON file with the cached smatch results (default: smatch_cache.json).
+  --workers         : Number of processes (default: 1).
+  --output          : Also save the table (one row per system) to this TSV file.
+
+Example:
+  python multi_eva.py --predictions ../few_shot/qwen_*/qwen_*_shot.json --workers 8 --output systems.tsv
+"""
+
+import os
+import csv
+import time
+import argparse
+import multiprocessing as mp
+from collections import defaultdict
+
+import numpy as np
+
+from utils import smatch
+from utils.smatch_cache import SmatchCache
+from utils.tmr_corpus import load_annotations
+from corpus_stats import DIMENSIONS, OPEN_DIMENSIONS, load_classifier_labels
+from significance import gold_ids, load_system, micro_f1
+from syn_eva import node_sets, count_nodes
+from geo_eva import extract_geo_codes
+from hco_eva import extract_hco_codes
+from date_eva import extract_dates
+
+EXTRACTORS = {"geo": extract_geo_codes, "hco": extract_hco_codes, "date": extract_dates}
+
+# (system, tombstone) pairs per task of the process pool
+CHUNK = 16
+
+
+class GoldTMR(object):
+    """
+    A gold TMR, parsed once for all metrics.
+    Members:
+        text: the TMR
+        triples: normalized smatch triples (smatch.get_normalized_triples, prefix "a"), None if ill-formed
+        nodes: fine-grained node sets (syn_eva.node_sets), None if ill-formed
+        codes: {"geo" / "hco" / "date": set of codes}
+    """
+
+    __slots__ = ("text", "triples", "nodes", "codes")
+
+    def __init__(self, text):
+        self.text = text
+        try:
+            self.triples = smatch.get_normalized_triples(smatch.get_penman_line([text]), "a")
+        except Exception:
+            self.triples = None
+        try:
+            self.nodes = node_sets(text)
+        except Exception:
+            self.nodes = None
+        self.codes = {name: extract(text) for name, extract in EXTRACTORS.items()}
+
+
+_gold = {}
+
+
+def _init_worker(gold):
+    global _gold
+    _gold = gold
+
+
+def score_pair(gold, predict, entry=None):
+    """
+    All metrics of one prediction against a GoldTMR.
+    Arguments:
+        entry: cached smatch match of the pair (see SmatchCache.match), None to score it
+    Returns:
+        smatch entry (None if the prediction or the gold is ill-formed), {metric: (inter, pred, gold)} of the
+        fine-grained node sets (None if they could not be compared), {"geo" / "hco" / "date": (tp, fp, fn)}
+    """
+    if entry is None and gold.triples is not None:
+        try:
+            triples = smatch.get_normalized_triples(smatch.get_penman_line([predict]), "b")
+        except Exception:
+            triples = None
+        if triples is not None:
+            mapping, match_num, test_num, gold_num, _, _ = smatch.match_triples(gold.triples, triples)
+            # clear the matching triple dictionary for the next AMR pair
+            smatch.match_triple_dict.clear()
+            entry = [match_num, test_num, gold_num, mapping]
+    nodes = None
+    if gold.nodes is not None:
+        try:
+            inters, golds, preds = count_nodes(node_sets(predict), gold.nodes, defaultdict(int), defaultdict(int),
+                                               defaultdict(int))
+            nodes = {metric: (inters[metric], preds[metric], golds[metric]) for metric in gold.nodes}
+        except Exception:
+            nodes = None
+    codes = {}
+    for name, extract in EXTRACTORS.items():
+        predicted = extract(predict)
+        codes[name] = (len(gold.codes[name] & predicted), len(predicted - gold.codes[name]),
+                       len(gold.codes[name] - predicted))
+    return entry, nodes, codes
+
+
+def _score_chunk(jobs):
+    """score_pair of (system, key, predict, cached entry) jobs"""
+    return [(system, key, predict, entry is None) + score_pair(_gold[key], predict, entry)
+            for system, key, predict, entry in jobs]
+
+
+def f1(tp, fp, fn):
+    precision = tp / (tp + fp) if tp + fp > 0 else 0.0
+    recall = tp / (tp + fn) if tp + fn > 0 else 0.0
+    return 2 * precision * recall / (precision + recall) if precision + recall > 0 else 0.0
+
+
+def summarize(results, gold, categories):
+    """
+    Metrics of one system.
+    Arguments:
+        results: {key: (smatch entry, node counts, code counts)} of its predictions
+        gold: {key: GoldTMR}
+        categories: {category: set of keys}
+    """
+    keys = sorted(results)
+    counts = np.zeros((len(keys), 3), dtype=np.int64)
+    for i, key in enumerate(keys):
+        entry = results[key][0]
+        if entry is not None:
+            counts[i] = entry[:3]
+        elif gold[key].triples is not None:
+            counts[i, 2] = sum(len(triples) for triples in gold[key].triples)
+    pair_f1 = micro_f1(counts)
+    row = {"tombstones": len(keys),
+           "ill_formed": float(np.mean([results[key][0] is None for key in keys])) if keys else 0.0,
+           "smatch_micro": float(micro_f1(counts.sum(axis=0))),
+           "smatch_macro": float(pair_f1.mean()) if keys else 0.0}
+    for name in EXTRACTORS:
+        row[name] = f1(*np.sum([results[key][2][name] for key in keys], axis=0)) if keys else 0.0
+    nodes = defaultdict(lambda: np.zeros(3, dtype=np.int64))
+    for key in keys:
+        for metric, node_counts in (results[key][1] or {}).items():
+            nodes[metric] += node_counts
+    for metric in sorted(nodes):
+        inter, pred, gold_count = nodes[metric]
+        row[metric] = f1(inter, pred - inter, gold_count - inter)
+    positions = {key: i for i, key in enumerate(keys)}
+    for category, members in categories.items():
+        rows = [positions[key] for key in members if key in positions]
+        row[f"cat_{category}"] = float(pair_f1[rows].mean()) if rows else 0.0
+    return row
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Evaluate many systems against one gold (systems x metrics).")
+    parser.add_argument("--predictions", type=str, nargs="+", required=True, help="Prediction files")
+    parser.add_argument("--annotation_file", type=str, default="../../data/annotation/tombs_grounded.txt",
+                        help="Gold TMRs of the JSON prediction files")
+    parser.add_argument("--classifier", type=str, default="../classify_inscription/qwen_72b_answer_new_2.json",
+                        help="Classifier labels for the per-category metrics (empty: none)")
+    parser.add_argument("--cache_file", type=str, default="smatch_cache.json",
+                        help="JSON file with the cached smatch results")
+    parser.add_argument("--workers", type=int, default=1, help="Number of processes (default: 1)")
+    parser.add_argument("--output", type=str, default=None, help="Also save the table to this TSV file")
+    args = parser.parse_args()
+
+    annotations = load_annotations(args.annotation_file)
+    ids_by_text = gold_ids(annotations)
+    systems = [load_system(path, annotations, ids_by_text) for path in args.predictions]
+    names = [os.path.splitext(os.path.basename(path))[0] for path in args.predictions]
+    # JSON and JSON Lines files are keyed by the same tombstone ids, a mismatch shows up as a small overlap
+    for name, system in zip(names, systems):
+        print(f"{name}: {len(system)} tombstones")
+    common = set.intersection(*(set(system) for system in systems)) if systems else set()
+    print(f"{len(common)} tombstones predicted by all {len(systems)} systems")
+
+    # every gold TMR once, JSON Lines files bring their own labels (the same text is parsed once)
+    start = time.perf_counter()
+    parsed = {}
+    gold = {}
+    origin = {}
+    for name, system in zip(names, systems):
+        for key, (label, _) in system.items():
+            if key not in gold:
+                if label not in parsed:
+                    parsed[label] = GoldTMR(label)
+                gold[key] = parsed[label]
+                origin[key] = name
+            elif " ".join(gold[key].text.split()) != " ".join(label.split()):
+                raise ValueError(f"{origin[key]} and {name} disagree on the gold TMR of {key}")
+    print(f"{len(gold)} gold TMRs parsed in {time.perf_counter() - start:.2f} s")
+
+    categories = {}
+    if args.classifier:
+        labels = load_classifier_labels(args.classifier)
+        for i, dim in enumerate(DIMENSIONS):
+            if dim not in OPEN_DIMENSIONS:
+                categories[dim] = {os.path.splitext(image)[0] for image, row in labels.items() if row[i] == "Yes"}
+
+    cache = SmatchCache(args.cache_file)
+    jobs = []
+    for s, system in enumerate(systems):
+        for key, (label, predict) in system.items():
+            try:
+                entry = cache.lookup(label, predict)
+            except Exception:
+                entry = None
+            jobs.append((s, key, predict, entry))
+    chunks = [jobs[i:i + CHUNK] for i in range(0, len(jobs), CHUNK)]
+
+    start = time.perf_counter()
+    if args.workers > 1:
+        with mp.get_context("spawn").Pool(args.workers, initializer=_init_worker, initargs=(gold,)) as pool:
+            scored = [result for results in pool.imap_unordered(_score_chunk, chunks) for result in results]
+    else:
+        _init_worker(gold)
+        scored = [result for chunk in chunks for result in _score_chunk(chunk)]
+    results = [{} for _ in systems]
+    for s, key, predict, new, entry, nodes, codes in scored:
+        if new and entry is not None:
+            cache.store(gold[key].text, predict, entry)
+        results[s][key] = entry, nodes, codes
+    cache.save()
+    print(f"{len(jobs)} (system, tombstone) pairs of {len(systems)} systems evaluated in "
+          f"{time.perf_counter() - start:.2f} s ({cache.hits} smatch matches taken from the cache)")
+
+    rows = [summarize(result, gold, categories) for result in results]
+    metrics = list(dict.fromkeys(metric for row in rows for metric in row))
+    # one column per system, the TSV file has one row per system
+    print(f"\n{'metric':<28}" + "".join(f"{name[-24:]:>26}" for name in names))
+    for metric in metrics:
+        values = [row.get(metric, 0.0) for row in rows]
+        print(f"{metric:<28}" + "".join(f"{value:>26}" if isinstance(value, int) else f"{value:>26.4f}"
+                                         for value in values))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8", newline="") as f:
+            writer = csv.writer(f, delimiter="\t")
+            writer.writerow(["system"] + metrics)
+            for name, row in zip(names, rows):
+                writer.writerow([name] + [row.get(metric, 0) if isinstance(row.get(metric, 0), int)
+                                          else f"{row.get(metric, 0.0):.4f}" for metric in metrics])
+        print(f"\nTable saved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,323 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Robustness sweep: noise level x model x smatch in one run.
+
+For every augmentation setting of a grid (overall alpha range x number of overlays), the tombstone images are
+augmented on the fly (fusion.AugmentedImages, nothing is written to disk), parsed by every model and scored
+against the gold TMRs with smatch, as in graph_eva.py. The result is a robustness table with one row per model
+and setting, including the clean images as baseline, printed and saved as TSV.
+
+Parses are cached by model, tombstone id and image content (--cache_file), so the clean images are parsed once per model and
+reused by every later run, as is every augmented image that was parsed before with the same seed.
+
+Models are pluggable: anything with a key attribute and a parse(idx, image_bytes) method returning a PENMAN
+string can be added to make_parser. "dummy" needs no model: it returns the gold TMR with a share of its
+attribute values replaced, the share being the fraction of pixels the noise changed, so the sweep can be tried
+(and mocked) on CPU.
+
+Parameters:
+  --models           : Models to sweep, "dummy" or Qwen2.5-VL model names (default: dummy).
+  --image_folder     : Folder containing the clean tombstone images (default: ../../data/images).
+  --damage_folder    : Folder containing the damage images (default: ../../data/noises).
+  --annotation_file  : Gold TMRs, the id of a TMR is its position in the file (or a .npz corpus).
+  --alphas           : Overall alpha ranges of the grid, as min:max (default: 0.2:0.4 0.4:0.6 0.6:0.8).
+  --overlays         : Number of overlays of the grid, as min:max (default: 1:2 2:5).
+  --mask_mode        : Mask mode of fusion.py (default: random).
+  --seed             : Augmentation seed (default: 42).
+  --workers          : Settings evaluated in parallel, each worker loads its own copy of the models
+                       (default: 1; keep 1 for large models).
+  --cache_file       : JSON file with the cached parses (default: robustness_cache.json).
+  --output           : TSV file the table is saved to (default: robustness.tsv).
+  --augmentation_dir : Folder containing fusion.py (default: ../../data/augmentation).
+  --parser_dir       : Folder containing qwen_infer.py (default: ../few_shot).
+  --shots, --example_folder, --decoding : few-shot examples and decoding preset of the Qwen models.
+
+Example:
+  python robustness_sweep.py --models dummy --alphas 0.3:0.5 0.6:0.8 --overlays 1:3 --workers 4
+  python robustness_sweep.py --models Qwen/Qwen2.5-VL-7B-Instruct --shots t00004 --decoding greedy
+"""
+
+import argparse
+import csv
+import hashlib
+import json
+import multiprocessing as mp
+import os
+import random
+import re
+import shutil
+import sys
+import tempfile
+
+from utils.smatch import score_amr_pairs
+from utils.tmr_corpus import load_annotations
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg')
+
+ATTRIBUTE_VALUE = re.compile(r'(:\w+ )"[^"]*"')
+
+
+class DummyParser(object):
+    """
+    Stand-in for a VL model: the gold TMR, with a share of its quoted attribute values replaced by "UNK".
+    The share is the fraction of pixels that differ (by more than 24 in a channel) from the clean image.
+    """
+
+    key = "dummy"
+
+    def __init__(self, gold, image_folder):
+        self.gold = gold
+        self.image_folder = image_folder
+
+    def noise_fraction(self, idx, image_bytes):
+        import cv2
+        import numpy as np
+
+        image = cv2.imdecode(np.frombuffer(image_bytes, dtype=np.uint8), cv2.IMREAD_COLOR)
+        clean = cv2.imread(os.path.join(self.image_folder, f"{idx}.jpg"))
+        if image is None or clean is None or image.shape != clean.shape:
+            return 1.0
+        return float((cv2.absdiff(image, clean).max(axis=2) > 24).mean())
+
+    def parse(self, idx, image_bytes):
+        gold = self.gold[idx]
+        values = list(ATTRIBUTE_VALUE.finditer(gold))
+        count = int(round(self.noise_fraction(idx, image_bytes) * len(values)))
+        # the same values are replaced on every run
+        order = sorted(range(len(values)), key=lambda i: hashlib.sha1(f"{idx}:{i}".encode()).hexdigest())
+        replaced = set(values[i].start() for i in order[:count])
+        return ATTRIBUTE_VALUE.sub(lambda m: m.group(1) + '"UNK"' if m.start() in replaced else m.group(0), gold)
+
+
+class QwenParser(object):
+    """Few-shot Qwen2.5-VL parser of qwen_infer.py; the image bytes are written to a temporary {idx}.jpg"""
+
+    def __init__(self, model_name, args):
+        import qwen_infer
+
+        self.qwen_infer = qwen_infer
+        self.model, self.processor = qwen_infer.load_model(model_name)
+        self.examples = qwen_infer.load_examples(args.annotation_file, args.example_folder, args.shots)
+        self.decoding = args.decoding
+        self.key = f"{model_name}|{','.join(args.shots)}|{args.decoding}"
+        self.tmp_dir = tempfile.mkdtemp(prefix="robustness_")
+
+    def parse(self, idx, image_bytes):
+        # the prompt mentions the file name of the image, so keep it
+        image_path = os.path.join(self.tmp_dir, f"{idx}.jpg")
+        with open(image_path, "wb") as f:
+            f.write(image_bytes)
+        text, _ = self.qwen_infer.process_image(self.model, self.processor, image_path, self.examples,
+                                                stop_on_close=True, decoding=self.decoding)
+        return text
+
+    def __del__(self):
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+
+def make_parser(model, gold, args):
+    if model == "dummy":
+        return DummyParser(gold, args.image_folder)
+    return QwenParser(model, args)
+
+
+def parse_range(text, cast):
+    low, high = text.split(":")
+    return cast(low), cast(high)
+
+
+def build_grid(alphas, overlays):
+    """The clean baseline followed by every (alpha range, overlay range) setting"""
+    grid = [{"name": "clean", "alpha": (0.0, 0.0), "overlays": (0, 0)}]
+    for alpha in alphas:
+        for overlay in overlays:
+            grid.append({"name": f"a{alpha[0]:g}-{alpha[1]:g}_o{overlay[0]}-{overlay[1]}", "alpha": alpha,
+                         "overlays": overlay})
+    return grid
+
+
+# state of a worker process, set by _init_worker
+_state = {}
+
+
+def setting_images(setting, args, file_names):
+    """(idx, image bytes) of a setting; the clean setting reads the original files"""
+    if setting["name"] == "clean":
+        for file_name in file_names:
+            with open(os.path.join(args.image_folder, file_name), "rb") as f:
+                yield os.path.splitext(file_name)[0], f.read()
+        return
+    from fusion import AugmentedImages, OverlayBank
+
+    if "bank" not in _state:
+        # the damage images are the same for every setting, read them once per process
+        _state["bank"] = OverlayBank(args.damage_folder, mask_mode=args.mask_mode)
+    images = AugmentedImages(args.image_folder, args.damage_folder, min_overlays=setting["overlays"][0],
+                             max_overlays=setting["overlays"][1], alpha_min=setting["alpha"][0],
+                             alpha_max=setting["alpha"][1], mask_mode=args.mask_mode, seed=args.seed,
+                             bank=_state["bank"])
+    for file_name in file_names:
+        yield images[os.path.splitext(file_name)[0]]
+
+
+def _init_worker(args, gold, cache):
+    if args.augmentation_dir not in sys.path:
+        sys.path.append(args.augmentation_dir)
+    if args.parser_dir not in sys.path:
+        sys.path.append(args.parser_dir)
+    _state.update({"args": args, "gold": gold, "cache": cache, "parsers": {}})
+
+
+def run_setting(task):
+    """
+    Parse and score all images of one setting with one model.
+    Returns (model, setting name, {idx: f1 or None if ill-formed}, new cache entries).
+    """
+    model, setting, file_names = task
+    args, gold, cache = _state["args"], _state["gold"], _state["cache"]
+    if model not in _state["parsers"]:
+        _state["parsers"][model] = make_parser(model, gold, args)
+    parser = _state["parsers"][model]
+    scores = {}
+    new_entries = {}
+    for idx, image_bytes in setting_images(setting, args, file_names):
+        if image_bytes is None:
+            continue
+        # the prompt contains the file name, so identical images of different tombstones are parsed apart
+        cache_key = f"{parser.key}|{idx}|{hashlib.sha1(image_bytes).hexdigest()}"
+        if cache_key in cache:
+            predict = cache[cache_key]
+        elif cache_key in new_entries:
+            predict = new_entries[cache_key]
+        else:
+            predict = parser.parse(idx, image_bytes)
+            new_entries[cache_key] = predict
+        # smatch restarts are random, score every pair from the same state
+        random.seed(args.seed)
+        try:
+            (precision, recall, best_f_score), _, _ = score_amr_pairs([gold[idx]], [predict])
+            scores[idx] = best_f_score
+        except Exception as e:
+            print(f"{model} {setting['name']} tombstone {idx}, generation error: {e}")
+            scores[idx] = None
+    return model, setting["name"], scores, new_entries
+
+
+def summarize(model, setting, scores):
+    """Row of the table of one model and setting, the scores are None if no image could be read"""
+    f1s = [f for f in scores.values() if f is not None]
+    total = len(scores)
+    return {
+        "model": model,
+        "setting": setting["name"],
+        "alpha_min": setting["alpha"][0],
+        "alpha_max": setting["alpha"][1],
+        "min_overlays": setting["overlays"][0],
+        "max_overlays": setting["overlays"][1],
+        "images": total,
+        "f1": sum(f1s) / total if total else None,
+        "f1_well_formed": sum(f1s) / len(f1s) if f1s else None,
+        "ill_formed": (total - len(f1s)) / total if total else None,
+    }
+
+
+def format_score(value, spec):
+    """A score of the table, "-" for a setting without images"""
+    return "-" if value is None else format(value, spec)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Robustness sweep over noise settings and models.")
+    parser.add_argument("--models", type=str, nargs="+", default=["dummy"],
+                        help='Models to sweep, "dummy" or Qwen2.5-VL model names (default: dummy)')
+    parser.add_argument("--image_folder", type=str, default="../../data/images",
+                        help="Folder containing the clean tombstone images")
+    parser.add_argument("--damage_folder", type=str, default="../../data/noises",
+                        help="Folder containing the damage images")
+    parser.add_argument("--annotation_file", type=str, default="../../data/annotation/tombs_grounded.txt",
+                        help="Gold TMRs, the id of a TMR is its position in the file")
+    parser.add_argument("--alphas", type=str, nargs="+", default=["0.2:0.4", "0.4:0.6", "0.6:0.8"],
+                        help="Overall alpha ranges, as min:max")
+    parser.add_argument("--overlays", type=str, nargs="+", default=["1:2", "2:5"],
+                        help="Numbers of overlays, as min:max")
+    parser.add_argument("--mask_mode", type=str, default="random", help="Mask mode of fusion.py")
+    parser.add_argument("--seed", type=int, default=42, help="Augmentation seed (default: 42)")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Settings evaluated in parallel, each worker loads its own models (default: 1)")
+    parser.add_argument("--cache_file", type=str, default="robustness_cache.json",
+                        help="JSON file with the cached parses")
+    parser.add_argument("--output", type=str, default="robustness.tsv", help="TSV file the table is saved to")
+    parser.add_argument("--augmentation_dir", type=str, default="../../data/augmentation",
+                        help="Folder containing fusion.py")
+    parser.add_argument("--parser_dir", type=str, default="../few_shot", help="Folder containing qwen_infer.py")
+    parser.add_argument("--shots", type=str, nargs="*", default=[],
+                        help="Ids of the few-shot examples of the Qwen models, e.g. t00004")
+    parser.add_argument("--example_folder", type=str,
+                        default="/gpfs/work4/0/prjs0885/Tombstone-Parsing/data/split/train_images",
+                        help="Folder containing the images of the examples")
+    parser.add_argument("--decoding", type=str, default="greedy", choices=["beam", "greedy", "sample"],
+                        help="Decoding preset of the Qwen models (default: greedy)")
+    args = parser.parse_args()
+
+    gold = load_annotations(args.annotation_file)
+    file_names = sorted(f for f in os.listdir(args.image_folder)
+                        if f.lower().endswith(IMAGE_EXTENSIONS) and os.path.splitext(f)[0] in gold)
+
+    if os.path.exists(args.cache_file):
+        with open(args.cache_file, "r", encoding="utf-8") as f:
+            cache = json.load(f)
+    else:
+        cache = {}
+
+    grid = build_grid([parse_range(a, float) for a in args.alphas], [parse_range(o, int) for o in args.overlays])
+    settings = {setting["name"]: setting for setting in grid}
+    tasks = [(model, setting, file_names) for model in args.models for setting in grid]
+    print(f"{len(file_names)} images, {len(grid)} settings, {len(args.models)} model(s), "
+          f"{len(cache)} cached parses")
+
+    rows = []
+    if args.workers > 1:
+        with mp.get_context("spawn").Pool(args.workers, initializer=_init_worker,
+                                          initargs=(args, gold, cache)) as pool:
+            results = pool.imap_unordered(run_setting, tasks)
+            for model, name, scores, new_entries in results:
+                cache.update(new_entries)
+                rows.append(summarize(model, settings[name], scores))
+                print(f"{model} {name}: f1 {format_score(rows[-1]['f1'], '.4f')}, {len(new_entries)} new parses")
+    else:
+        _init_worker(args, gold, cache)
+        for task in tasks:
+            model, name, scores, new_entries = run_setting(task)
+            cache.update(new_entries)
+            rows.append(summarize(model, settings[name], scores))
+            print(f"{model} {name}: f1 {format_score(rows[-1]['f1'], '.4f')}, {len(new_entries)} new parses")
+
+    with open(args.cache_file, "w", encoding="utf-8") as f:
+        json.dump(cache, f, ensure_ascii=False)
+
+    # robustness curve: the drop of every setting relative to the clean images of the same model, none for a
+    # setting (or a clean baseline) without images
+    order = {name: i for i, name in enumerate(settings)}
+    rows.sort(key=lambda row: (args.models.index(row["model"]), order[row["setting"]]))
+    clean = {row["model"]: row["f1"] for row in rows if row["setting"] == "clean"}
+    for row in rows:
+        baseline = clean.get(row["model"], row["f1"])
+        row["delta_f1"] = row["f1"] - baseline if row["f1"] is not None and baseline is not None else None
+
+    fields = ["model", "setting", "alpha_min", "alpha_max", "min_overlays", "max_overlays", "images", "f1",
+              "f1_well_formed", "ill_formed", "delta_f1"]
+    with open(args.output, "w", encoding="utf-8", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=fields, delimiter="\t")
+        writer.writeheader()
+        writer.writerows(rows)
+
+    print(f"\n{'model':30s} {'setting':18s} {'f1':>7s} {'ill':>6s} {'delta':>7s}")
+    for row in rows:
+        print(f"{row['model'][:30]:30s} {row['setting']:18s} {format_score(row['f1'], '7.4f'):>7s} "
+              f"{format_score(row['ill_formed'], '6.1%'):>6s} {format_score(row['delta_f1'], '+7.4f'):>7s}")
+    print(f"Table saved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,243 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Bootstrap confidence intervals and paired significance tests of the smatch F1 of several systems.
+
+Every prediction is scored against its gold TMR once (through the smatch cache, utils/smatch_cache.py), and
+only the triple counts of the pairs are kept: (match, test, gold) per tombstone and system, saved with
+--counts. The corpus-level (micro) F1 of a system is 2 * sum(match) / (sum(test) + sum(gold)), so resampling
+is a weighted sum of the counts: a bootstrap resample is a vector of multiplicities of the tombstones, and the
+sums of all resamples and all systems are one matrix product. The same resamples are used for all systems.
+
+  - bootstrap CI: percentile interval of the micro F1 over --resamples resamples of the tombstones
+  - approximate randomization test of every pair of systems: the predictions of both systems are swapped per
+    tombstone with probability 1/2, p = (1 + resamples with a difference >= the observed one) / (resamples + 1)
+
+Ill-formed predictions count as no match and no test triple (they only lower the recall). Only the tombstones
+predicted by all systems are compared.
+
+Parameters:
+  --predictions     : Prediction files, JSON {image: TMR} of the few-shot scripts (scored against
+                      --annotation_file) or JSON Lines with "label" and "predict" (mapped to
+                      their tombstone by image or by label, see record_id).
+  --annotation_file : Gold TMRs of the JSON prediction files (default: ../../data/annotation/tombs_grounded.txt).
+  --cache_file      : JSON file with the cached smatch results (default: smatch_cache.json).
+  --resamples       : Number of bootstrap / randomization resamples (default: 10000).
+  --confidence      : Confidence level of the intervals (default: 0.95).
+  --seed            : Seed of the resamples (default: 42).
+  --counts          : Also save the triple counts to this .npz file.
+  --output          : Also save the comparison table to this TSV file.
+
+Example:
+  python significance.py --predictions ../few_shot/qwen_7b/qwen_7b_*_shot.json ../few_shot/qwen_72b/*.json
+"""
+
+import os
+import re
+import csv
+import json
+import time
+import argparse
+
+import numpy as np
+
+from utils.smatch_cache import SmatchCache
+from utils.tmr_corpus import load_annotations
+
+# resamples per matrix product, bounds the memory of the weight matrices
+CHUNK = 1000
+
+
+def gold_ids(annotations):
+    """{gold TMR with its whitespace collapsed: id} of the annotations, to find the tombstone of a JSON Lines label"""
+    return {" ".join(text.split()): idx for idx, text in annotations.items()}
+
+
+def record_id(record, annotations, ids_by_text):
+    """
+    Id of the tombstone of a JSON Lines record: the image of the record ("images" of the LLaMA-Factory split),
+    else the tombstone whose gold TMR is the label, else the root variable of the label (t00265 in
+    "(t00265 / tombstone.n.01"). None if the record can not be mapped to a tombstone of the annotations.
+    """
+    if record.get("images"):
+        idx = os.path.splitext(os.path.basename(record["images"][0]))[0]
+        if idx in annotations:
+            return idx
+    idx = ids_by_text.get(" ".join(record["label"].split()))
+    if idx is not None:
+        return idx
+    root = re.match(r"\s*\((t\d+)\b", record["label"])
+    if root and root.group(1) in annotations:
+        return root.group(1)
+    return None
+
+
+def load_system(path, annotations, ids_by_text=None):
+    """
+    {id: (gold TMR, predicted TMR)} of a prediction file, keyed by tombstone id for both formats: a JSON file
+    {image: TMR} is scored against the annotations, the lines of a JSON Lines file (in the order of a test
+    split, not of the annotations) against their label and mapped to their tombstone with record_id.
+    Predictions that are not a string (e.g. lists of answers) are kept as "", i.e. ill-formed.
+    """
+    with open(path, encoding="utf-8") as f:
+        if path.endswith(".jsonl"):
+            records = [json.loads(line) for line in f if line.strip()]
+        else:
+            predictions = json.load(f)
+            return {os.path.splitext(image)[0]: (annotations[os.path.splitext(image)[0]],
+                                                 text if isinstance(text, str) else "")
+                    for image, text in predictions.items() if os.path.splitext(image)[0] in annotations}
+    if ids_by_text is None:
+        ids_by_text = gold_ids(annotations)
+    system = {}
+    unknown = 0
+    for record in records:
+        idx = record_id(record, annotations, ids_by_text)
+        if idx is None:
+            unknown += 1
+            continue
+        predict = record["predict"]
+        system[idx] = (record["label"], predict if isinstance(predict, str) else "")
+    if unknown:
+        print(f"Warning: {unknown} lines of {path} do not match a tombstone of the annotations, skipped")
+    return system
+
+
+def pair_counts(cache, pairs):
+    """(match, test, gold) triple counts of (gold, prediction) pairs, an int64 array of shape (pairs, 3)"""
+    counts = np.zeros((len(pairs), 3), dtype=np.int64)
+    for i, (gold, predict) in enumerate(pairs):
+        try:
+            counts[i] = cache.match(gold, predict)[:3]
+        except Exception:
+            # ill-formed prediction (or gold): only the gold triples count
+            try:
+                counts[i, 2] = sum(len(triples) for triples in cache.triples(gold, "a")[0])
+            except Exception:
+                pass
+    return counts
+
+
+def micro_f1(sums):
+    """F1 of summed (match, test, gold) counts, over the last axis"""
+    sums = np.asarray(sums, dtype=np.float64)
+    total = sums[..., 1] + sums[..., 2]
+    return np.divide(2 * sums[..., 0], total, out=np.zeros_like(total), where=total > 0)
+
+
+def bootstrap_weights(rng, n, resamples):
+    """Multiplicities of n items in bootstrap resamples, as (chunk, n) matrices of at most CHUNK resamples"""
+    for start in range(0, resamples, CHUNK):
+        size = min(CHUNK, resamples - start)
+        picks = rng.integers(0, n, size=(size, n)) + (np.arange(size) * n)[:, None]
+        yield np.bincount(picks.ravel(), minlength=size * n).reshape(size, n)
+
+
+def bootstrap_ci(counts, resamples=10000, confidence=0.95, seed=42):
+    """
+    Percentile bootstrap intervals of the micro F1 of systems.
+    Arguments:
+        counts: (systems, items, 3) triple counts, the items of all systems resampled together
+    Returns:
+        (systems, 2) array of the lower and upper bounds
+    """
+    systems, n, _ = counts.shape
+    rng = np.random.default_rng(seed)
+    flat = counts.transpose(1, 0, 2).reshape(n, systems * 3)
+    f1 = np.concatenate([micro_f1((weights @ flat).reshape(-1, systems, 3))
+                         for weights in bootstrap_weights(rng, n, resamples)])
+    tail = (1 - confidence) / 2 * 100
+    return np.percentile(f1, [tail, 100 - tail], axis=0).T
+
+
+def randomization_test(counts_a, counts_b, resamples=10000, seed=42):
+    """
+    Paired approximate randomization test of the micro F1 of two systems on the same items.
+    Returns:
+        observed difference F1(a) - F1(b), two-sided p-value
+    """
+    rng = np.random.default_rng(seed)
+    sums_a, sums_b = counts_a.sum(axis=0), counts_b.sum(axis=0)
+    observed = micro_f1(sums_a) - micro_f1(sums_b)
+    # swapping item i moves counts_b[i] - counts_a[i] from b to a
+    difference = counts_b - counts_a
+    exceed = 0
+    for start in range(0, resamples, CHUNK):
+        swaps = rng.random((min(CHUNK, resamples - start), len(difference))) < 0.5
+        moved = swaps @ difference
+        scores = micro_f1(sums_a + moved) - micro_f1(sums_b - moved)
+        # tolerance for the floating point error of equal differences
+        exceed += int(np.count_nonzero(np.abs(scores) >= abs(observed) - 1e-12))
+    return float(observed), (exceed + 1) / (resamples + 1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bootstrap CIs and paired randomization tests of smatch F1.")
+    parser.add_argument("--predictions", type=str, nargs="+", required=True, help="Prediction files")
+    parser.add_argument("--annotation_file", type=str, default="../../data/annotation/tombs_grounded.txt",
+                        help="Gold TMRs of the JSON prediction files")
+    parser.add_argument("--cache_file", type=str, default="smatch_cache.json",
+                        help="JSON file with the cached smatch results")
+    parser.add_argument("--resamples", type=int, default=10000, help="Number of resamples (default: 10000)")
+    parser.add_argument("--confidence", type=float, default=0.95, help="Confidence level (default: 0.95)")
+    parser.add_argument("--seed", type=int, default=42, help="Seed of the resamples (default: 42)")
+    parser.add_argument("--counts", type=str, default=None, help="Also save the triple counts to this .npz file")
+    parser.add_argument("--output", type=str, default=None, help="Also save the comparison table to this TSV file")
+    args = parser.parse_args()
+
+    annotations = load_annotations(args.annotation_file)
+    ids_by_text = gold_ids(annotations)
+    systems = [load_system(path, annotations, ids_by_text) for path in args.predictions]
+    names = [os.path.splitext(os.path.basename(path))[0] for path in args.predictions]
+    keys = sorted(set.intersection(*(set(system) for system in systems)))
+    for name, system in zip(names, systems):
+        print(f"{name}: {len(system)} tombstones")
+    print(f"{len(keys)} tombstones predicted by all {len(systems)} systems")
+    if not keys:
+        return
+
+    cache = SmatchCache(args.cache_file)
+    start = time.perf_counter()
+    counts = np.stack([pair_counts(cache, [system[key] for key in keys]) for system in systems])
+    cache.save()
+    print(f"Triple counts in {time.perf_counter() - start:.2f} s "
+          f"({cache.misses} pairs scored, {cache.hits} taken from the cache)")
+    if args.counts:
+        np.savez(args.counts, ids=np.array(keys), systems=np.array(names), counts=counts)
+
+    start = time.perf_counter()
+    f1 = micro_f1(counts.sum(axis=1))
+    intervals = bootstrap_ci(counts, args.resamples, args.confidence, args.seed)
+    tests = {}
+    for a in range(len(systems)):
+        for b in range(a + 1, len(systems)):
+            tests[(a, b)] = randomization_test(counts[a], counts[b], args.resamples, args.seed)
+    print(f"{args.resamples} resamples in {time.perf_counter() - start:.2f} s")
+
+    rows = []
+    for a, name in enumerate(names):
+        # the macro F1 is the average F1 per tombstone that graph_eva.py prints
+        macro = micro_f1(counts[a]).mean()
+        rows.append({"system": name, "micro_f1": f"{f1[a]:.4f}", "ci_low": f"{intervals[a, 0]:.4f}",
+                     "ci_high": f"{intervals[a, 1]:.4f}", "macro_f1": f"{macro:.4f}",
+                     "ill_formed": int(np.count_nonzero(counts[a, :, 1] == 0))})
+    print(f"\n{'system':<24} {'micro F1':>8}  {args.confidence:.0%} CI          {'macro F1':>8} {'ill-formed':>10}")
+    for row in rows:
+        print(f"{row['system']:<24} {row['micro_f1']:>8}  [{row['ci_low']}, {row['ci_high']}] "
+              f"{row['macro_f1']:>8} {row['ill_formed']:>10}")
+    print("\nPaired approximate randomization tests (difference of micro F1, p-value):")
+    for (a, b), (difference, p) in tests.items():
+        print(f"  {names[a]} vs {names[b]}: {difference:+.4f}, p = {p:.4f}{' *' if p < 1 - args.confidence else ''}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8", newline="") as f:
+            writer = csv.writer(f, delimiter="\t")
+            writer.writerow(list(rows[0]) + [f"p_vs_{name}" for name in names])
+            for a, row in enumerate(rows):
+                p_values = [(tests[(min(a, b), max(a, b))][1] if a != b else "") for b in range(len(names))]
+                writer.writerow(list(row.values()) + [p if p == "" else f"{p:.4f}" for p in p_values])
+        print(f"\nTable saved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
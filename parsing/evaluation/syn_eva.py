@@ -4,7 +4,7 @@ import re
 from collections import defaultdict
 
 from utils.smatch import score_amr_pairs
-import amr
+from utils.tmr_graph import TMRGraph
 from utils.utils import *
 
 def replace_numbers_in_triple(triple):
@@ -20,18 +20,49 @@ def replace_numbers_in_triple(triple):
 
 def penman2triples(penman_text):
     """
-    将 Penman 文本解析为 AMR 对象，提取三元组和变量-概念映射。
+    将 Penman 文本解析为图，提取三元组和变量-概念映射。
     """
-    penman_obj = amr.AMR.parse_AMR_line(penman_text.replace("\n", ""))
-    penman_dict = var2concept(penman_obj)
+    graph = TMRGraph.from_penman(penman_text.replace("\n", ""))
+    penman_dict = graph.var2concept()
+    _, attributes, relations = graph.triples()
     triples = []
-    for t in penman_obj.get_triples()[1] + penman_obj.get_triples()[2]:
+    for t in attributes + relations:
         if t[0].endswith('-of'):
             triples.append((t[0][:-3], t[2], t[1]))
         else:
             triples.append((t[0], t[1], t[2]))
     return triples, penman_dict
 
+def node_sets(penman_text):
+    """
+    解析 Penman 文本，提取细粒度（node-level）评估的各类节点信息（命名实体、否定、语义角色等），
+    返回 {指标名: 集合}。金标准的集合只需计算一次，可与多个预测比较（见 count_nodes）。
+    """
+    triples, penman_dict = penman2triples(penman_text)
+    return {
+        "nam": set(disambig(namedent(penman_dict, triples))),
+        "Negation": set(disambig(negations(penman_dict, triples))),
+        "rol": set(disambig(roles(triples))),
+        "Members": set(disambig(members(triples))),
+        "Concepts": set(disambig(concepts(penman_dict))),
+        "Con_noun": set(disambig(con_noun(penman_dict))),
+        "Con_adj": set(disambig(con_adj(penman_dict))),
+        "Con_adv": set(disambig(con_adv(penman_dict))),
+        "Con_verb": set(disambig(con_verb(penman_dict))),
+        "Discourse": set(disambig(discources(penman_dict, triples))),
+    }
+
+def count_nodes(sets_pred, sets_gold, inters, golds, preds):
+    """
+    用预测和金标准的 node_sets 更新三个字典：inters（交集计数）、preds（预测计数）和 golds（金标准计数）。
+    """
+    for metric, set_pred in sets_pred.items():
+        set_gold = sets_gold[metric]
+        inters[metric] += len(set_pred & set_gold)
+        preds[metric] += len(set_pred)
+        golds[metric] += len(set_gold)
+    return inters, golds, preds
+
 def score_nodes(penman_pred, penman_gold, inters, golds, preds):
     """
     细粒度（node-level）评估：
@@ -39,80 +70,7 @@ def score_nodes(penman_pred, penman_gold, inters, golds, preds):
       并更新三个字典：inters（交集计数）、preds（预测计数）和 golds（金标准计数）。
     注意：函数要求第一个参数为预测结果，第二个为金标准。
     """
-    triples_pred, dict_pred = penman2triples(penman_pred)
-    triples_gold, dict_gold = penman2triples(penman_gold)
-
-    # nam
-    list_pred = disambig(namedent(dict_pred, triples_pred))
-    list_gold = disambig(namedent(dict_gold, triples_gold))
-    inters["nam"] += len(set(list_pred) & set(list_gold))
-    preds["nam"] += len(set(list_pred))
-    golds["nam"] += len(set(list_gold))
-
-    # Negation
-    list_pred = disambig(negations(dict_pred, triples_pred))
-    list_gold = disambig(negations(dict_gold, triples_gold))
-    inters["Negation"] += len(set(list_pred) & set(list_gold))
-    preds["Negation"] += len(set(list_pred))
-    golds["Negation"] += len(set(list_gold))
-
-    # Roles
-    list_pred = disambig(roles(triples_pred))
-    list_gold = disambig(roles(triples_gold))
-    inters["rol"] += len(set(list_pred) & set(list_gold))
-    preds["rol"] += len(set(list_pred))
-    golds["rol"] += len(set(list_gold))
-
-    # Members
-    list_pred = disambig(members(triples_pred))
-    list_gold = disambig(members(triples_gold))
-    inters["Members"] += len(set(list_pred) & set(list_gold))
-    preds["Members"] += len(set(list_pred))
-    golds["Members"] += len(set(list_gold))
-
-    # Concepts
-    list_pred = disambig(concepts(dict_pred))
-    list_gold = disambig(concepts(dict_gold))
-    inters["Concepts"] += len(set(list_pred) & set(list_gold))
-    preds["Concepts"] += len(set(list_pred))
-    golds["Concepts"] += len(set(list_gold))
-
-    # Concept nouns
-    list_pred = disambig(con_noun(dict_pred))
-    list_gold = disambig(con_noun(dict_gold))
-    inters["Con_noun"] += len(set(list_pred) & set(list_gold))
-    preds["Con_noun"] += len(set(list_pred))
-    golds["Con_noun"] += len(set(list_gold))
-
-    # Concept adjectives
-    list_pred = disambig(con_adj(dict_pred))
-    list_gold = disambig(con_adj(dict_gold))
-    inters["Con_adj"] += len(set(list_pred) & set(list_gold))
-    preds["Con_adj"] += len(set(list_pred))
-    golds["Con_adj"] += len(set(list_gold))
-
-    # Concept adverbs
-    list_pred = disambig(con_adv(dict_pred))
-    list_gold = disambig(con_adv(dict_gold))
-    inters["Con_adv"] += len(set(list_pred) & set(list_gold))
-    preds["Con_adv"] += len(set(list_pred))
-    golds["Con_adv"] += len(set(list_gold))
-
-    # Concept verbs
-    list_pred = disambig(con_verb(dict_pred))
-    list_gold = disambig(con_verb(dict_gold))
-    inters["Con_verb"] += len(set(list_pred) & set(list_gold))
-    preds["Con_verb"] += len(set(list_pred))
-    golds["Con_verb"] += len(set(list_gold))
-
-    # Discourse
-    list_pred = disambig(discources(dict_pred, triples_pred))
-    list_gold = disambig(discources(dict_gold, triples_gold))
-    inters["Discourse"] += len(set(list_pred) & set(list_gold))
-    preds["Discourse"] += len(set(list_pred))
-    golds["Discourse"] += len(set(list_gold))
-
-    return inters, golds, preds
+    return count_nodes(node_sets(penman_pred), node_sets(penman_gold), inters, golds, preds)
 
 def evaluate_jsonl(args):
     """
@@ -0,0 +1,425 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Linear-time tokenizer and recursive-descent parser for tombstone meaning representations (PENMAN).
+
+parse_penman reads a TMR in one pass and returns a PenmanGraph holding integer triples: nodes are numbered
+in the order their concept is read, and concepts, roles and values are interned in a SymbolTable that can be
+shared by many graphs. Well-formed text is read with a single regular expression scan (one match per node,
+edge or ')'); any other text goes through the tokenizer and the recursive-descent parser, which raises
+PenmanError with the offset of the offending token in the text if it is ill-formed.
+
+The graph follows amr.AMR.parse_AMR_line, so that smatch scores do not change with the parser:
+  - "-of" roles are inverted (except prep-on-behalf-of, prep-out-of and consist-of), :mod becomes an
+    inverted :domain, and an inverted role can only point to a node.
+  - A value that names a node (a re-entrancy like :pod x2, also to a node defined later) is a relation.
+  - The root gets the attribute (TOP, root, top).
+  - Nodes still open at the end of the text are closed (truncated generations are scored, not rejected),
+    and words after a value are ignored.
+  - triples() returns the string triples of amr.AMR.get_triples, in the same order, with a quoted value
+    reduced to its first word (with a trailing "_" if it has one word) as the amr module reads it.
+"""
+
+import re
+
+# tokens: parentheses, slashes, roles (":nam") and words, a word being a run of symbols and quoted strings
+# without whitespace in between (amr.AMR reads "\"DE as one value); whitespace is skipped
+TOKEN = re.compile(r'[()/]|:[^\s()/:"]*|(?:"[^"]*"?|[^\s()/:"]+)+')
+WORD = "w"
+END = ""
+
+# well-formed text in one scan, one match per edge ":role value", role of a node (":role" before a "("),
+# ")" and node "(var / concept"; anything else (the last group) is left to the recursive descent parser
+SIMPLE = re.compile(r':([^\s()/:"]*)(?:\s+("[^"]*"|[^\s()/:"]+))?|(\))|\(\s*([^\s()/:"]+)\s*/\s*([^\s()/:"]+)|(\S)')
+
+# "-of" roles that are not inversions, as in the amr module
+NOT_INVERTED = {"prep-on-behalf-of", "prep-out-of", "consist-of"}
+
+
+class PenmanError(ValueError):
+    """Ill-formed PENMAN, offset is the position of the offending token in the text"""
+
+    def __init__(self, message, text, offset):
+        self.offset = offset
+        context = text[max(0, offset - 30):offset + 30].replace("\n", " ")
+        super(PenmanError, self).__init__(f"{message} at offset {offset}: ...{context}...")
+
+
+class SymbolTable(object):
+    """Interned strings: every symbol gets an integer id, in order of first occurrence"""
+
+    def __init__(self, symbols=()):
+        self.symbols = list(symbols)
+        self.ids = {symbol: idx for idx, symbol in enumerate(self.symbols)}
+
+    def intern(self, symbol):
+        idx = self.ids.get(symbol)
+        if idx is None:
+            idx = self.ids[symbol] = len(self.symbols)
+            self.symbols.append(symbol)
+        return idx
+
+    def __getitem__(self, idx):
+        return self.symbols[idx]
+
+    def __len__(self):
+        return len(self.symbols)
+
+
+def tokenize(text):
+    """
+    Tokens of a text and their kinds ("(", ")", "/", ":" or WORD). The kinds end with END, also at a quote
+    that is never closed, since the amr module reads the rest of the text as part of the string.
+    """
+    tokens = TOKEN.findall(text)
+    kinds = [token[0] if token[0] in "()/:" else WORD for token in tokens]
+    if tokens and kinds[-1] == WORD and tokens[-1].count('"') % 2:
+        kinds[-1] = END
+    kinds.append(END)
+    return tokens, kinds
+
+
+def amr_value(value):
+    """
+    A value as amr.AMR.parse_AMR_line reads it: quotes are dropped (a closing quote leaves a "_") and the
+    value is cut at its first space, so "JAN WERKMAN" is read as JAN and "23" as 23_.
+    """
+    if '"' not in value:
+        return value
+    if value.count('"') == 2 and value[0] == value[-1] == '"':
+        return (value[1:-1] + "_").split()[0]
+    chars = []
+    in_quote = False
+    for c in value:
+        if c == '"':
+            if in_quote:
+                chars.append("_")
+            in_quote = not in_quote
+        else:
+            chars.append(c)
+    words = "".join(chars).split()
+    return words[0] if words else ""
+
+
+def squash(word):
+    """A word outside a value as the amr module keeps it: without spaces and quotes, a closing quote leaves a "_" """
+    if '"' not in word:
+        return word
+    chars = []
+    in_quote = False
+    for c in word:
+        if c == '"':
+            if in_quote:
+                chars.append("_")
+            in_quote = not in_quote
+        elif c != " ":
+            chars.append(c)
+    return "".join(chars)
+
+
+class PenmanGraph(object):
+    """
+    A parsed TMR with integer triples.
+    Members:
+        variables: variable name of every node, node i is variables[i] (the root is node 0)
+        instances: (node, concept id) of every node
+        attributes: (role id, node, value id) triples, values are kept as written (quotes included)
+        relations: (role id, node 1, node 2) triples
+        symbols: SymbolTable of the concepts, roles and values
+        truncated: True if nodes were still open at the end of the text
+    """
+
+    def __init__(self, symbols):
+        self.symbols = symbols
+        self.variables = []
+        self.instances = []
+        self.attributes = []
+        self.relations = []
+        self.truncated = False
+
+    def triples(self, prefix=None):
+        """
+        Instance, attribute and relation triples as strings, as amr.AMR.get_triples returns them
+        (after rename_node(prefix) if prefix is given).
+        """
+        if prefix is None:
+            names = self.variables
+        else:
+            names = [prefix + str(i) for i in range(len(self.variables))]
+        symbols = self.symbols.symbols
+        instances = [("instance", names[node], symbols[concept]) for node, concept in self.instances]
+        attributes = [(symbols[role], names[node], amr_value(symbols[value]))
+                      for role, node, value in self.attributes]
+        relations = [(symbols[role], names[node1], names[node2]) for role, node1, node2 in self.relations]
+        return instances, attributes, relations
+
+    def var2concept(self):
+        """{variable: concept}, as utils.var2concept of an amr.AMR"""
+        return {self.variables[node]: self.symbols[concept] for node, concept in self.instances}
+
+
+class _Parser(object):
+    """
+    Recursive descent over the tokens. Edges are collected per variable name as the amr module does:
+    known holds the edges to nodes already defined, pending the edges whose value is only resolved
+    (node or constant) when the whole graph has been read.
+    Words outside the values (e.g. a comment after a node) are not dropped by the amr module but glued to
+    the next variable or role name, carry holds them until then.
+    """
+
+    def __init__(self, text, symbols):
+        self.text = text
+        self.tokens = self.kinds = None
+        self.pos = 0
+        self.graph = PenmanGraph(symbols)
+        self.index = {}
+        self.concepts = []
+        self.known = {}
+        self.pending = {}
+        self.carry = ""
+
+    def error(self, message, pos=None):
+        pos = self.pos if pos is None else pos
+        offsets = [m.start() for m in TOKEN.finditer(self.text)]
+        raise PenmanError(message, self.text, offsets[pos] if pos < len(offsets) else len(self.text))
+
+    def words(self):
+        """Skip the words at the current position, and return them as the amr module joins them"""
+        tokens, kinds = self.tokens, self.kinds
+        words = []
+        while kinds[self.pos] == WORD:
+            words.append(squash(tokens[self.pos]))
+            self.pos += 1
+        return "".join(words)
+
+    def add_edge(self, edges, source, role, target):
+        """Store the edge source -role-> target, inverted for -of roles and :mod"""
+        if role[-3:] == "-of" and role not in NOT_INVERTED:
+            # an inverted edge to a constant is lost, as in the amr module
+            if isinstance(target, tuple):
+                target = target[1]
+            edges.setdefault(target, []).append((role[:-3], source))
+        elif role == "mod":
+            if isinstance(target, tuple):
+                target = target[1]
+            edges.setdefault(target, []).append(("domain", source))
+        else:
+            edges.setdefault(source, []).append((role, target))
+
+    def parse_simple(self):
+        """
+        Parse well-formed text with one scan of SIMPLE, returns False (before anything is interned) as
+        soon as the text needs the full parser.
+        """
+        index, known, pending = self.index, self.known, self.pending
+        variables = self.graph.variables
+        matches = SIMPLE.findall(self.text)
+        # a concept or a value is only stored by the amr module at the next ':' or ')'
+        if not matches or matches[-1][1] or matches[-1][4]:
+            return False
+        stack = []
+        role = None
+        for edge_role, value, close, var, concept, other in matches:
+            if value:
+                if not stack or not edge_role or role is not None:
+                    return False
+                # SIMPLE only matches plain symbols and strings with two quotes, see amr_value
+                name = (value[1:-1] + "_").split()[0] if value[0] == '"' else value
+                if edge_role[-3:] == "-of" or edge_role == "mod":
+                    if name in index:
+                        self.add_edge(known, stack[-1], edge_role, name)
+                    else:
+                        self.add_edge(pending, stack[-1], edge_role, (value, name))
+                elif name in index:
+                    known.setdefault(stack[-1], []).append((edge_role, name))
+                else:
+                    pending.setdefault(stack[-1], []).append((edge_role, (value, name)))
+            elif close:
+                if not stack or role is not None:
+                    return False
+                stack.pop()
+            elif concept:
+                if var in index or (stack and role is None):
+                    return False
+                index[var] = len(variables)
+                variables.append(var)
+                self.concepts.append(concept)
+                if role:
+                    self.add_edge(known, stack[-1], role, var)
+                role = None
+                stack.append(var)
+            elif other or not stack or role is not None:
+                return False
+            else:
+                role = edge_role
+        if not variables or role is not None:
+            return False
+        self.graph.truncated = bool(stack)
+        self.build()
+        return True
+
+    def parse(self):
+        self.tokens, self.kinds = tokenize(self.text)
+        kinds = self.kinds
+        # further top-level nodes are read as unconnected nodes of the same graph, as in the amr module
+        while kinds[self.pos] != END:
+            kind = kinds[self.pos]
+            if kind == WORD:
+                # e.g. the ``` fences around a generated TMR
+                self.carry += self.words()
+            elif kind == "(":
+                self.parse_node(None, None)
+            elif kind == ":" and all(k == WORD for k in kinds[self.pos + 1:-1]):
+                break
+            else:
+                self.error("Unexpected token outside the graph")
+        if not self.graph.variables:
+            self.error("No node")
+        return self.build()
+
+    def parse_node(self, parent, role):
+        """Parse (var / concept :role value ...), the current token is '('"""
+        kinds = self.kinds
+        self.pos += 1
+        var_pos = self.pos
+        var = self.carry + self.words()
+        kind = kinds[self.pos]
+        if kind != "/":
+            if kind == ")" and parent is not None:
+                # (x6) or ("text") without a concept: the amr module keeps the words and lets the ')' close
+                # the parent node instead
+                self.carry = var
+                return
+            if kind == END:
+                self.graph.truncated = True
+                return
+            self.error("Expected '/'" if var else "Expected a variable")
+        self.carry = ""
+        if var in self.index:
+            self.error(f"Duplicate variable {var}", var_pos)
+        self.pos += 1
+        self.index[var] = len(self.graph.variables)
+        self.graph.variables.append(var)
+        # a node after a ':' without a role name is not connected, as in the amr module
+        if role:
+            self.add_edge(self.known, parent, role, var)
+        # the words of a concept are joined, as in the amr module
+        concept = self.words()
+        kind = kinds[self.pos]
+        if kind != ":" and kind != ")":
+            if kind == END:
+                self.error(f"Unexpected end of the text in the concept of {var}")
+            self.error("Expected a role or ')'")
+        self.concepts.append(concept)
+        self.parse_edges(var)
+        if kinds[self.pos] == END:
+            self.graph.truncated = True
+        else:
+            self.pos += 1
+
+    def parse_edges(self, var):
+        """Parse the edges of var up to its ')' (or the end of the text)"""
+        tokens, kinds, index = self.tokens, self.kinds, self.index
+        while kinds[self.pos] == ":":
+            role_pos = self.pos
+            role = self.carry + tokens[self.pos][1:]
+            self.carry = ""
+            self.pos += 1
+            if not role and kinds[self.pos] == WORD:
+                # ": moy "09"", the amr module reads the first word after the ':' as the role
+                role = amr_value(tokens[self.pos])
+                self.pos += 1
+            kind = kinds[self.pos]
+            if kind == "(":
+                self.parse_node(var, role)
+                if kinds[self.pos] == WORD:
+                    self.carry += self.words()
+            elif kind == WORD:
+                value = tokens[self.pos]
+                self.pos += 1
+                # words after the value are ignored, as in the amr module
+                while kinds[self.pos] == WORD:
+                    self.pos += 1
+                # the amr module only stores a value when it reaches the next ':' or ')'
+                if kinds[self.pos] == END:
+                    return
+                name = amr_value(value)
+                if name in index:
+                    self.add_edge(self.known, var, role, name)
+                else:
+                    # (role, value as written, value as the amr module reads it)
+                    self.add_edge(self.pending, var, role, (value, name))
+            elif kind == END:
+                return
+            else:
+                self.error(f"Expected a value of :{role}", role_pos)
+            kind = kinds[self.pos]
+            if kind != ":" and kind != ")" and kind != END:
+                self.error("Expected a role or ')'")
+
+    def build(self):
+        graph = self.graph
+        ids, intern = graph.symbols.ids, graph.symbols.intern
+        index, known, pending = self.index, self.known, self.pending
+        instances, attributes, relations = graph.instances, graph.attributes, graph.relations
+        for node, var in enumerate(graph.variables):
+            concept = self.concepts[node]
+            instances.append((node, ids[concept] if concept in ids else intern(concept)))
+            for role, target in known.get(var, ()):
+                relations.append((ids[role] if role in ids else intern(role), node, index[target]))
+            node_attributes = []
+            for role, target in pending.get(var, ()):
+                if isinstance(target, tuple):
+                    value, name = target
+                else:
+                    # an inverted edge stored under a node defined later
+                    value = name = target
+                role = ids[role] if role in ids else intern(role)
+                if name in index:
+                    relations.append((role, node, index[name]))
+                else:
+                    node_attributes.append((role, node, ids[value] if value in ids else intern(value)))
+            if node == 0:
+                node_attributes.append((intern("TOP"), 0, intern("top")))
+            attributes.extend(node_attributes)
+        return graph
+
+
+def parse_penman(text, symbols=None):
+    """
+    Parse one TMR in PENMAN notation (on one or more lines).
+    Arguments:
+        text: the PENMAN text
+        symbols: SymbolTable to intern the concepts, roles and values in (default: a new one)
+    Returns:
+        PenmanGraph of the TMR, raises PenmanError if the text is ill-formed
+    """
+    if symbols is None:
+        symbols = SymbolTable()
+    parser = _Parser(text, symbols)
+    if parser.parse_simple():
+        return parser.graph
+    return _Parser(text, symbols).parse()
+
+
+def get_penman_line(input_f):
+    """
+    Next TMR of a file handle (or any iterable of lines) on one line, as amr.AMR.get_amr_line:
+    TMRs are separated by a blank line and lines starting with "#" are skipped.
+    """
+    cur_amr = []
+    has_content = False
+    for line in input_f:
+        line = line.strip()
+        if line == "":
+            if not has_content:
+                continue
+            else:
+                break
+        if line.startswith("#"):
+            continue
+        else:
+            has_content = True
+            cur_amr.append(line)
+    return "".join(cur_amr)
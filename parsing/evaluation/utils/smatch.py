@@ -10,12 +10,26 @@ For detailed description of smatch, see http://www.isi.edu/natural-language/amr/
 
 import random
 
-import amr
 import sys
 
+try:
+    from .penman_parser import get_penman_line
+    from .tmr_graph import TMRGraph
+except ImportError:
+    from penman_parser import get_penman_line
+    from tmr_graph import TMRGraph
+
+try:
+    import amr
+except ImportError:
+    amr = None
+
 # total number of iteration in smatch computation
 iteration_num = 5
 
+# parse the AMRs with amr.AMR.parse_AMR_line instead of penman_parser.py (the triples are the same)
+use_amr_parser = False
+
 # verbose output switch.
 # Default false (no verbose output)
 verbose = False
@@ -43,7 +57,7 @@ match_triple_dict = {}
 
 def get_best_match(instance1, attribute1, relation1,
                    instance2, attribute2, relation2,
-                   prefix1, prefix2, doinstance=True, doattribute=True, dorelation=True):
+                   prefix1, prefix2, doinstance=True, doattribute=True, dorelation=True, seed_mapping=None):
     """
     Get the highest triple match number between two sets of triples via hill-climbing.
     Arguments:
@@ -55,6 +69,8 @@ def get_best_match(instance1, attribute1, relation1,
         relation2: relation triples of AMR 2 (relation name, node 1 name, node 2 name)
         prefix1: prefix label for AMR 1
         prefix2: prefix label for AMR 2
+        seed_mapping: node mapping the first hill-climbing starts from instead of the smart initialization
+                      (e.g. the best mapping of a previous version of one of the AMRs)
     Returns:
         best_match: the node mapping that results in the highest triple matching number
         best_match_num: the highest triple matching number
@@ -72,7 +88,22 @@ def get_best_match(instance1, attribute1, relation1,
         print(candidate_mappings, file=DEBUG_LOG)
         print("Weight dictionary", file=DEBUG_LOG)
         print(weight_dict, file=DEBUG_LOG)
+    return hill_climb(candidate_mappings, weight_dict, instance1, instance2, seed_mapping)
+
 
+def hill_climb(candidate_mappings, weight_dict, instance1, instance2, seed_mapping=None):
+    """
+    Hill-climbing from a smart initialization (or seed_mapping) and iteration_num - 1 random initializations.
+    Arguments:
+        candidate_mappings: candidate node match list (see compute_pool)
+        weight_dict: triple match numbers of node pairs (see compute_pool)
+        instance1: instance triples of AMR 1
+        instance2: instance triples of AMR 2
+        seed_mapping: node mapping of the first round instead of the smart initialization
+    Returns:
+        best_match: the node mapping that results in the highest triple matching number
+        best_match_num: the highest triple matching number
+    """
     best_match_num = 0
     # initialize best match mapping
     # the ith entry is the node index in AMR 2 which maps to the ith node in AMR 1
@@ -80,7 +111,10 @@ def get_best_match(instance1, attribute1, relation1,
     for i in range(iteration_num):
         if veryVerbose:
             print("Iteration", i, file=DEBUG_LOG)
-        if i == 0:
+        if i == 0 and seed_mapping is not None:
+            # warm start from a given mapping
+            cur_mapping = seed_init_mapping(seed_mapping, instance1, instance2)
+        elif i == 0:
             # smart initialization used for the first round
             cur_mapping = smart_init_mapping(candidate_mappings, instance1, instance2)
         else:
@@ -280,6 +314,23 @@ def smart_init_mapping(candidate_mapping, instance1, instance2):
     return result
 
 
+def seed_init_mapping(seed_mapping, instance1, instance2):
+    """
+    Initialize mapping from a given node mapping: nodes of AMR 1 the seed does not cover, and nodes mapped to a
+    node that is not in AMR 2 or that is already taken, are unmapped (-1).
+    """
+    matched_dict = {}
+    result = []
+    for i in range(len(instance1)):
+        node_index = seed_mapping[i] if i < len(seed_mapping) else -1
+        if 0 <= node_index < len(instance2) and node_index not in matched_dict:
+            matched_dict[node_index] = 1
+            result.append(node_index)
+        else:
+            result.append(-1)
+    return result
+
+
 def random_init_mapping(candidate_mapping):
     """
     Generate a random node mapping.
@@ -644,8 +695,8 @@ def generate_amr_lines(f1, f2):
     :return: generator of cur_amr1, cur_amr2 pairs: one-line AMR strings
     """
     while True:
-        cur_amr1 = amr.AMR.get_amr_line(f1)
-        cur_amr2 = amr.AMR.get_amr_line(f2)
+        cur_amr1 = get_penman_line(f1)
+        cur_amr2 = get_penman_line(f2)
         if not cur_amr1 and not cur_amr2:
             pass
         elif not cur_amr1:
@@ -660,30 +711,43 @@ def generate_amr_lines(f1, f2):
         break
 
 
-def get_amr_match(cur_amr1, cur_amr2, sent_num=1, justinstance=False, justattribute=False, justrelation=False):
-    amr_pair = []
-    for i, cur_amr in (1, cur_amr1), (2, cur_amr2):
+def get_triples(cur_amr, prefix):
+    """
+    Instance, attribute and relation triples of one AMR, with the nodes renamed to prefix + index
+    Raises an exception (penman_parser.PenmanError with the offset of the error) if the AMR is ill-formed.
+    """
+    if use_amr_parser:
+        amr_obj = amr.AMR.parse_AMR_line(cur_amr)
+        if amr_obj is None:
+            raise ValueError("amr.AMR.parse_AMR_line could not parse the AMR")
+        amr_obj.rename_node(prefix)
+        return amr_obj.get_triples()
+    return TMRGraph.from_penman(cur_amr).triples(prefix)
+
+
+def get_normalized_triples(cur_amr, prefix):
+    """Triples of one AMR (see get_triples) with the values stripped and without underscores, as they are compared"""
+    return tuple([(x, y, z.strip().replace("_", "")) for x, y, z in triples]
+                 for triples in get_triples(cur_amr, prefix))
+
+
+def get_amr_match(cur_amr1, cur_amr2, sent_num=1, justinstance=False, justattribute=False, justrelation=False,
+                  diagnostics=False):
+    """
+    Best match number, triple numbers of AMR 1 and AMR 2, and the unmatched triples of AMR 1 and AMR 2
+    (None unless diagnostics is True).
+    """
+    amr_triples = []
+    # Rename nodes to "a1", "a2", .etc and "b1", "b2", .etc
+    for i, cur_amr, prefix in (1, cur_amr1, "a"), (2, cur_amr2, "b"):
         try:
-            amr_pair.append(amr.AMR.parse_AMR_line(cur_amr))
+            amr_triples.append(get_normalized_triples(cur_amr, prefix))
         except Exception as e:
             print("Error in parsing amr %d: %s" % (i, cur_amr), file=ERROR_LOG)
             print("Please check if the AMR is ill-formatted. Ignoring remaining AMRs", file=ERROR_LOG)
             print("Error message: %s" % e, file=ERROR_LOG)
-    amr1, amr2 = amr_pair
-    prefix1 = "a"
-    prefix2 = "b"
-    # Rename node to "a1", "a2", .etc
-    amr1.rename_node(prefix1)
-    # Renaming node to "b1", "b2", .etc
-    amr2.rename_node(prefix2)
-    (instance1, attributes1, relation1) = amr1.get_triples()
-    instance1 = [(x, y, z.strip().replace("_", "")) for x, y, z in instance1]
-    attributes1 = [(x, y, z.strip().replace("_", "")) for x, y, z in attributes1]
-    relation1 = [(x, y, z.strip().replace("_", "")) for x, y, z in relation1]
-    (instance2, attributes2, relation2) = amr2.get_triples()
-    instance2 = [(x, y, z.strip().replace("_", "")) for x, y, z in instance2]
-    attributes2 = [(x, y, z.strip().replace("_", "")) for x, y, z in attributes2]
-    relation2 = [(x, y, z.strip().replace("_", "")) for x, y, z in relation2]
+            raise
+    (instance1, attributes1, relation1), (instance2, attributes2, relation2) = amr_triples
 
     if verbose:
         print("AMR pair", sent_num, file=DEBUG_LOG)
@@ -702,6 +766,22 @@ def get_amr_match(cur_amr1, cur_amr2, sent_num=1, justinstance=False, justattrib
         print(attributes2, file=DEBUG_LOG)
         print("Relation triples of AMR 2:", len(relation2), file=DEBUG_LOG)
         print(relation2, file=DEBUG_LOG)
+    _, best_match_num, test_triple_num, gold_triple_num, unmatched_1, unmatched_2 = match_triples(
+        amr_triples[0], amr_triples[1], justinstance=justinstance, justattribute=justattribute,
+        justrelation=justrelation, diagnostics=diagnostics)
+    return best_match_num, test_triple_num, gold_triple_num, unmatched_1, unmatched_2
+
+
+def match_triples(triples1, triples2, justinstance=False, justattribute=False, justrelation=False,
+                  diagnostics=False, seed_mapping=None):
+    """
+    Match the normalized triples of two AMRs (see get_normalized_triples, with the prefixes "a" and "b"),
+    the hill-climbing starts from seed_mapping if it is given (see get_best_match).
+    Returns:
+        best node mapping, best match number, triple numbers of AMR 1 and AMR 2, and the unmatched triples of
+        AMR 1 and AMR 2 (None unless diagnostics is True)
+    """
+    (instance1, attributes1, relation1), (instance2, attributes2, relation2) = triples1, triples2
     # optionally turn off some of the node comparison
     doinstance = doattribute = dorelation = True
     if justinstance:
@@ -712,193 +792,127 @@ def get_amr_match(cur_amr1, cur_amr2, sent_num=1, justinstance=False, justattrib
         doinstance = doattribute = False
     (best_mapping, best_match_num) = get_best_match(instance1, attributes1, relation1,
                                                     instance2, attributes2, relation2,
-                                                    prefix1, prefix2, doinstance=doinstance,
-                                                    doattribute=doattribute, dorelation=dorelation)
+                                                    "a", "b", doinstance=doinstance,
+                                                    doattribute=doattribute, dorelation=dorelation,
+                                                    seed_mapping=seed_mapping)
     if verbose:
         print("best match number", best_match_num, file=DEBUG_LOG)
         print("best node mapping", best_mapping, file=DEBUG_LOG)
         print("Best node mapping alignment:", print_alignment(best_mapping, instance1, instance2), file=DEBUG_LOG)
-    if justinstance:
-        test_triple_num = len(instance1)
-        gold_triple_num = len(instance2)
-    elif justattribute:
-        test_triple_num = len(attributes1)
-        gold_triple_num = len(attributes2)
-    elif justrelation:
-        test_triple_num = len(relation1)
-        gold_triple_num = len(relation2)
-    else:
-        test_triple_num = len(instance1) + len(attributes1) + len(relation1)
-        gold_triple_num = len(instance2) + len(attributes2) + len(relation2)
+    test_triple_num = count_triples(triples1, justinstance, justattribute, justrelation)
+    gold_triple_num = count_triples(triples2, justinstance, justattribute, justrelation)
 
-    # unmatched
-    (unmatched_1_instance, unmatched_1_attr, unmatched_1_rel,
-     unmatched_2_instance, unmatched_2_attr, unmatched_2_rel) = get_matched_unmatched_triples(
-        best_mapping, instance1, attributes1, relation1,
-        instance2, attributes2, relation2,
-        prefix1, prefix2
-    )
+    # unmatched triples, only computed on request
+    unmatched_1 = unmatched_2 = None
+    if diagnostics:
+        unmatched_1, unmatched_2 = get_unmatched_triples(best_mapping, instance1, attributes1, relation1,
+                                                         instance2, attributes2, relation2)
 
-    return (best_match_num,
-            test_triple_num,
-            gold_triple_num,
-            unmatched_1_instance + unmatched_1_attr + unmatched_1_rel,
-            unmatched_2_instance + unmatched_2_attr + unmatched_2_rel)
+    return best_mapping, best_match_num, test_triple_num, gold_triple_num, unmatched_1, unmatched_2
 
 
-def triple_to_key(triple, prefix_length):
-    """
-    将triple中节点的名称转换为整数索引，以便根据mapping进行转换。
-    triple的格式可能是：
-    - 实例: ("instance", "a1", "concept")
-    - 属性: ("attribute_name", "a1", "value")
-    - 关系: ("relation_name", "a1", "a2")
-    对于instance和attribute，第三个元素是value或concept，不需要映射。
-    对于relation，第三个元素也是node，需要映射。
-    """
-    rel = triple[0]
-    node1 = triple[1]
-    node2 = triple[2]
-
-    # 提取整数索引（去掉前缀）
-    node1_id = int(node1[prefix_length:])
-    # 判断 node2 是否是节点名称( relation 的第三项是另一个节点，需要映射 )
-    # instance: node2是concept，不用映射；attribute: node2是值，不用映射；relation: node2是节点，需要映射
-    # 我们在返回时加入一个标记，指明node2是否为节点
-    is_relation = (rel.lower() not in ["instance"]) and (node2.startswith("a") or node2.startswith("b"))
-    if is_relation:
-        node2_id = int(node2[prefix_length:])
-        return (rel, node1_id, node2_id, True)
-    else:
-        return (rel, node1_id, node2, False)
+def count_triples(triples, justinstance=False, justattribute=False, justrelation=False):
+    """Number of triples of one AMR that are scored"""
+    instance, attributes, relation = triples
+    if justinstance:
+        return len(instance)
+    if justattribute:
+        return len(attributes)
+    if justrelation:
+        return len(relation)
+    return len(instance) + len(attributes) + len(relation)
+
 
-def convert_triple(triple, mapping, prefix1_len, prefix2, is_relation):
+def delta_match(mapping, match_num, triples1, old_triples2, triples2, justinstance=False, justattribute=False,
+                justrelation=False):
     """
-    根据 mapping 将AMR1的triple映射到AMR2中对应的triple形式。
-    如果是relation triple，则第三项也是节点，需要映射。
-    对于instance和attribute triple，第三项为concept或值，不需要node映射。
-    prefix2是AMR2的前缀，用来构造对应的节点名称。
+    Match number of a node mapping after AMR 2 changed, counting only the triples that changed: the triple
+    matches of the triples of old_triples2 that are not in triples2 are subtracted and those of the new
+    triples added (a triple of AMR 2 matches every triple of AMR 1 with the same normalized relation and value
+    whose nodes are mapped to its nodes, as compute_pool and compute_match count them).
+    Arguments:
+        mapping: node mapping of AMR 1 and the old AMR 2 (e.g. its best mapping)
+        match_num: match number of the mapping with the old AMR 2
+        triples1, old_triples2, triples2: normalized triples of AMR 1, the old AMR 2 and AMR 2
+            (see get_normalized_triples)
+    Returns:
+        match number of the mapping with AMR 2, None if the nodes of AMR 2 changed (then the mapping does not
+        apply, and the AMRs must be matched again, e.g. with the mapping as seed_mapping)
     """
-    rel = triple[0]
-    node1 = triple[1]
-    node2 = triple[2]
-
-    node1_id = int(node1[prefix1_len:])
-    mapped_node1_id = mapping[node1_id]
-    if mapped_node1_id == -1:
-        return None  # 没有映射，无法匹配
-
-    # 对relation triple，需要映射第二个节点
-    if is_relation:
-        node2_id = int(node2[prefix1_len:])
-        mapped_node2_id = mapping[node2_id]
-        if mapped_node2_id == -1:
-            return None
-        # 构造在AMR2中的triple
-        return (rel, prefix2 + str(mapped_node1_id), prefix2 + str(mapped_node2_id))
-    else:
-        # instance 或 attribute
-        # 只需要对node1进行映射，node2是概念/值，不需要映射
-        return (rel, prefix2 + str(mapped_node1_id), node2)
+    if len(old_triples2[0]) != len(triples2[0]):
+        return None
+    kinds = [not justattribute and not justrelation, not justinstance and not justrelation,
+             not justinstance and not justattribute]
+    counts = {}
+    for kind, old, new in zip(range(3), old_triples2, triples2):
+        if kinds[kind]:
+            for triple in old:
+                counts[(kind,) + triple] = counts.get((kind,) + triple, 0) + 1
+            for triple in new:
+                counts[(kind,) + triple] = counts.get((kind,) + triple, 0) - 1
+    changed = [(key, -count) for key, count in counts.items() if count]
+    if not changed:
+        return match_num
+
+    # triples of AMR 1 with their nodes mapped to node indices of AMR 2, keyed as the triples of AMR 2
+    index1 = {name: i for i, (_, name, _) in enumerate(triples1[0])}
+    mapped1 = {}
+    for kind, triples in enumerate(triples1):
+        if not kinds[kind]:
+            continue
+        for rel, node, value in triples:
+            node = mapping[index1[node]]
+            value = mapping[index1[value]] if kind == 2 else normalize(value)
+            if node != -1 and value != -1:
+                key = (kind, normalize(rel), node, value)
+                mapped1[key] = mapped1.get(key, 0) + 1
+    # node names of AMR 2 are prefix + index
+    for (kind, rel, node, value), count in changed:
+        node = int(node[1:])
+        value = int(value[1:]) if kind == 2 else normalize(value)
+        match_num += count * mapped1.get((kind, normalize(rel), node, value), 0)
+    return match_num
 
 
-def get_matched_unmatched_triples(mapping, instance1, attributes1, relation1,
-                                  instance2, attributes2, relation2,
-                                  prefix1, prefix2):
+def get_unmatched_triples(mapping, instance1, attributes1, relation1, instance2, attributes2, relation2):
     """
-    根据最佳节点映射(mapping)，获取匹配和不匹配的triples。
+    根据最佳节点映射(mapping)，获取两个AMR中不匹配的triples。
+    节点名称只在开始时转换为整数索引（节点在instance列表中的位置），
+    之后每个AMR只遍历一次：AMR2的triples以 (类型, 关系, 节点索引, 值或节点索引) 为键放入一个set，
+    AMR1的triples映射到AMR2的索引后在set中查找，AMR2中没有被匹配到的键即为AMR2的unmatched。
+    Returns:
+        unmatched triples of AMR 1, unmatched triples of AMR 2 (instance, attribute, relation order)
     """
-    prefix1_len = len(prefix1)
-    prefix2_len = len(prefix2)
-
-    # 将AMR2的triples转为set，便于查找
-    instance2_set = set(instance2)
-    attribute2_set = set(attributes2)
-    relation2_set = set(relation2)
-
-    unmatched_1_instance = []
-    unmatched_2_instance = []
-    unmatched_1_attr = []
-    unmatched_2_attr = []
-    unmatched_1_rel = []
-    unmatched_2_rel = []
-
-    # 对AMR1的instance triples检查匹配
-    for t in instance1:
-        # t: ("instance", "aX", "concept")
-        mapped_t = convert_triple(t, mapping, prefix1_len, prefix2, False)
-        if mapped_t is not None and mapped_t in instance2_set:
-            # matched
-            pass
-        else:
-            unmatched_1_instance.append(t)
-
-    # 对AMR1的attribute triples检查匹配
-    for t in attributes1:
-        # t: (attr_name, "aX", value)
-        mapped_t = convert_triple(t, mapping, prefix1_len, prefix2, False)
-        if mapped_t is not None and mapped_t in attribute2_set:
-            # matched
-            pass
-        else:
-            unmatched_1_attr.append(t)
-
-    # 对AMR1的relation triples检查匹配
-    for t in relation1:
-        # t: (relation_name, "aX", "aY")
-        mapped_t = convert_triple(t, mapping, prefix1_len, prefix2, True)
-        if mapped_t is not None and mapped_t in relation2_set:
-            # matched
-            pass
+    # node name -> index of the mapped node in AMR 2 (-1 if unmapped) / index in AMR 2
+    mapped1 = {name: mapping[i] for i, (_, name, _) in enumerate(instance1)}
+    index2 = {name: i for i, (_, name, _) in enumerate(instance2)}
+    triples1 = (instance1, attributes1, relation1)
+    triples2 = (instance2, attributes2, relation2)
+
+    keys2 = []
+    for kind, triples in enumerate(triples2):
+        if kind == 2:
+            keys2.extend((kind, rel, index2[node1], index2[node2]) for rel, node1, node2 in triples)
         else:
-            unmatched_1_rel.append(t)
-
-    # 计算AMR2中未匹配的triples（即AMR2中有但AMR1没有匹配上的）
-    # 我们需要对AMR2的triples进行相同的映射逆检查，
-    # 但是更简单的方式是：已匹配的不会出现在unmatched里面，
-    # 我们可以利用上面matched的逻辑，但是上面没有存matched的集合。
-    # 为了不重复计算，我们可以通过再次检查AMR2的triples是否有对应的AMR1 triple。
-    # 或者换一种策略：用总集减去匹配集。
-    # 为了简单，这里再写一段对AMR2 triple的检查（可以优化但逻辑清晰）
-
-    # 为高效，我们先把AMR1的triples都映射到AMR2视角，存进一个set。
-    mapped_instance_from_amr1 = set()
-    mapped_attribute_from_amr1 = set()
-    mapped_relation_from_amr1 = set()
-
-    for t in instance1:
-        mt = convert_triple(t, mapping, prefix1_len, prefix2, False)
-        if mt is not None:
-            mapped_instance_from_amr1.add(mt)
-
-    for t in attributes1:
-        mt = convert_triple(t, mapping, prefix1_len, prefix2, False)
-        if mt is not None:
-            mapped_attribute_from_amr1.add(mt)
-
-    for t in relation1:
-        mt = convert_triple(t, mapping, prefix1_len, prefix2, True)
-        if mt is not None:
-            mapped_relation_from_amr1.add(mt)
-
-    # AMR2中的unmatched即为AMR2中不存在于映射后AMR1 triple集的那些
-    for t in instance2:
-        if t not in mapped_instance_from_amr1:
-            unmatched_2_instance.append(t)
-
-    for t in attributes2:
-        if t not in mapped_attribute_from_amr1:
-            unmatched_2_attr.append(t)
-
-    for t in relation2:
-        if t not in mapped_relation_from_amr1:
-            unmatched_2_rel.append(t)
-
-    return (unmatched_1_instance, unmatched_1_attr, unmatched_1_rel,
-            unmatched_2_instance, unmatched_2_attr, unmatched_2_rel)
-
-
-def score_amr_pairs(f1, f2, justinstance=False, justattribute=False, justrelation=False):
+            keys2.extend((kind, rel, index2[node], value) for rel, node, value in triples)
+    key_set2 = set(keys2)
+
+    matched = set()
+    unmatched_1 = []
+    for kind, triples in enumerate(triples1):
+        for triple in triples:
+            rel, node, value = triple
+            key = (kind, rel, mapped1.get(node, -1), mapped1.get(value, -1) if kind == 2 else value)
+            if key[2] != -1 and key[3] != -1 and key in key_set2:
+                matched.add(key)
+            else:
+                unmatched_1.append(triple)
+    unmatched_2 = [triple for triple, key in zip((t for triples in triples2 for t in triples), keys2)
+                   if key not in matched]
+    return unmatched_1, unmatched_2
+
+
+def score_amr_pairs(f1, f2, justinstance=False, justattribute=False, justrelation=False, diagnostics=False):
     """
     Score one pair of AMR lines at a time from each file handle
     :param f1: file handle (or any iterable of strings) to read AMR 1 lines from
@@ -906,7 +920,8 @@ def score_amr_pairs(f1, f2, justinstance=False, justattribute=False, justrelatio
     :param justinstance: just pay attention to matching instances
     :param justattribute: just pay attention to matching attributes
     :param justrelation: just pay attention to matching relations
-    :return: generator of cur_amr1, cur_amr2 pairs: one-line AMR strings
+    :param diagnostics: also return the unmatched triples of AMR 1 and AMR 2 (None otherwise)
+    :return: (precision, recall, f_score), unmatched triples of AMR 1, unmatched triples of AMR 2
     """
     # matching triple number, triple number in test file, triple number in gold file
     total_match_num = total_test_num = total_gold_num = 0
@@ -916,7 +931,8 @@ def score_amr_pairs(f1, f2, justinstance=False, justattribute=False, justrelatio
                                                                          sent_num=sent_num,  # sentence number
                                                                          justinstance=justinstance,
                                                                          justattribute=justattribute,
-                                                                         justrelation=justrelation)
+                                                                         justrelation=justrelation,
+                                                                         diagnostics=diagnostics)
 
         total_match_num += best_match_num
         total_test_num += test_triple_num
@@ -936,6 +952,7 @@ def main(arguments):
     global single_score
     global pr_flag
     global match_triple_dict
+    global use_amr_parser
     # set the iteration number
     # total iteration number = restart number + 1
     iteration_num = arguments.r + 1
@@ -947,6 +964,8 @@ def main(arguments):
         veryVerbose = True
     if arguments.pr:
         pr_flag = True
+    if arguments.amr_parser:
+        use_amr_parser = True
     # significant digits to print out
     floatdisplay = "%%.%df" % arguments.significant
     for (precision, recall, best_f_score) in score_amr_pairs(args.f[0], args.f[1],
@@ -1019,6 +1038,11 @@ if __name__ == "__main__":
         action='store_true',
         default=False,
         help="just pay attention to matching relations")
+    parser.add_argument(
+        '--amr_parser',
+        action='store_true',
+        default=False,
+        help="parse the AMRs with the amr module instead of penman_parser.py")
 
     args = parser.parse_args()
     main(args)
\ No newline at end of file
@@ -0,0 +1,185 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Persistent memo store of smatch results, so that re-evaluating a prediction file only scores the pairs that
+changed (e.g. the RieAG predictions that only differ in their :geo codes).
+
+A pair is keyed by the SHA-1 of the normalized triples of both TMRs (smatch.get_normalized_triples: the nodes
+are renamed, so variable names, line breaks and indentation do not change the key), the options of the match
+(justinstance, justattribute, justrelation) and smatch.iteration_num. The cache stores the best match number,
+the triple numbers and the best node mapping (the alignment) of every pair in a JSON file; precision, recall
+and F1 are computed from them, and the unmatched triples (diagnostics) from the mapping.
+
+A prediction that was edited (e.g. the :geo codes replaced by RieAG/rag/hco_geo_combine.py) is rescored from the
+match of its previous version (rescore): the hill-climbing starts from the previous best mapping, or with
+delta=True, only the triples that changed are rescored under that mapping (smatch.delta_match), a lower bound
+of the smatch match number that equals it when the previous alignment is still the best one.
+
+The TMRs are read as score_amr_pairs reads them, and every text is parsed once per run (the gold TMRs are
+shared by all prediction files).
+
+Example:
+    cache = SmatchCache("smatch_cache.json")
+    (precision, recall, best_f_score), _, _ = cache.score_amr_pair(gold_penman, pred_penman)
+    cache.save()
+"""
+
+import os
+import json
+import hashlib
+
+try:
+    from . import smatch
+except ImportError:
+    import smatch
+
+# increase when the stored results change, so that cached results are recomputed
+CACHE_VERSION = 1
+
+
+def triples_digest(triples):
+    """SHA-1 of the normalized triples of one TMR"""
+    return hashlib.sha1(json.dumps(triples, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+
+class SmatchCache(object):
+    """
+    smatch results of TMR pairs, kept in memory and in a JSON file.
+    Members:
+        path: JSON file of the cache (None: in memory only)
+        entries: {key: [best match number, test triple number, gold triple number, best mapping]}
+        hits, misses: number of pairs taken from the cache / scored since the cache was loaded
+    """
+
+    def __init__(self, path=None):
+        self.path = path
+        self.entries = {}
+        self.hits = 0
+        self.misses = 0
+        self._triples = {}
+        self._changed = False
+        if path and os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                self.entries = json.load(f)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def triples(self, text, prefix):
+        """Normalized triples of a TMR and their digest, raises an exception if the TMR is ill-formed"""
+        key = (text, prefix)
+        if key not in self._triples:
+            triples = smatch.get_normalized_triples(smatch.get_penman_line([text]), prefix)
+            self._triples[key] = triples, triples_digest(triples)
+        return self._triples[key]
+
+    def _key(self, digest1, digest2, options, mode="match"):
+        return hashlib.sha1(json.dumps([CACHE_VERSION, mode, digest1, digest2, options,
+                                        smatch.iteration_num]).encode()).hexdigest()
+
+    def _store(self, key, entry):
+        self.entries[key] = entry
+        self._changed = True
+        return entry
+
+    def lookup(self, amr1, amr2, justinstance=False, justattribute=False, justrelation=False):
+        """Cached match of two TMRs (see match), None if the pair was not scored before"""
+        _, digest1 = self.triples(amr1, "a")
+        _, digest2 = self.triples(amr2, "b")
+        entry = self.entries.get(self._key(digest1, digest2, [justinstance, justattribute, justrelation]))
+        if entry is not None:
+            self.hits += 1
+        return entry
+
+    def store(self, amr1, amr2, entry, justinstance=False, justattribute=False, justrelation=False):
+        """Add the match of two TMRs scored elsewhere (e.g. in another process), see match"""
+        _, digest1 = self.triples(amr1, "a")
+        _, digest2 = self.triples(amr2, "b")
+        self.misses += 1
+        return self._store(self._key(digest1, digest2, [justinstance, justattribute, justrelation]), list(entry))
+
+    def match(self, amr1, amr2, justinstance=False, justattribute=False, justrelation=False):
+        """
+        Match of two TMRs, from the cache or scored with smatch.match_triples.
+        Returns:
+            best match number, test triple number, gold triple number, best node mapping (the index of the
+            node of AMR 2 every node of AMR 1 is mapped to, -1 for none)
+        """
+        entry = self.lookup(amr1, amr2, justinstance, justattribute, justrelation)
+        if entry is not None:
+            return entry
+        mapping, match_num, test_num, gold_num, _, _ = smatch.match_triples(
+            self.triples(amr1, "a")[0], self.triples(amr2, "b")[0], justinstance=justinstance,
+            justattribute=justattribute, justrelation=justrelation)
+        # clear the matching triple dictionary for the next AMR pair
+        smatch.match_triple_dict.clear()
+        return self.store(amr1, amr2, [match_num, test_num, gold_num, mapping], justinstance, justattribute,
+                          justrelation)
+
+    def rescore(self, amr1, previous_amr2, amr2, justinstance=False, justattribute=False, justrelation=False,
+                delta=False):
+        """
+        Match of amr1 and amr2, an edited version of previous_amr2, warm-started from the match of amr1 and
+        previous_amr2 (taken from the cache, or scored).
+        Arguments:
+            delta: only rescore the triples that changed under the previous mapping (smatch.delta_match), if
+                   the nodes of amr2 are those of previous_amr2; otherwise the hill-climbing starts from the
+                   previous mapping
+        Returns:
+            best match number, test triple number, gold triple number, best node mapping (see match)
+        """
+        options = [justinstance, justattribute, justrelation]
+        triples1, digest1 = self.triples(amr1, "a")
+        triples2, digest2 = self.triples(amr2, "b")
+        previous_triples2, previous_digest2 = self.triples(previous_amr2, "b")
+        if previous_digest2 == digest2:
+            return self.match(amr1, amr2, justinstance, justattribute, justrelation)
+        # a full match is taken from the cache before a delta match
+        keys = [self._key(digest1, digest2, options), self._key(digest1, digest2, options, "delta")]
+        for key in keys[:2 if delta else 1]:
+            if key in self.entries:
+                self.hits += 1
+                return self.entries[key]
+        previous_num, _, _, previous_mapping = self.match(amr1, previous_amr2, justinstance, justattribute,
+                                                          justrelation)
+        self.misses += 1
+        if delta:
+            match_num = smatch.delta_match(previous_mapping, previous_num, triples1, previous_triples2, triples2,
+                                           justinstance=justinstance, justattribute=justattribute,
+                                           justrelation=justrelation)
+            if match_num is not None:
+                return self._store(keys[1], [match_num, smatch.count_triples(triples1, *options),
+                                             smatch.count_triples(triples2, *options), previous_mapping])
+        mapping, match_num, test_num, gold_num, _, _ = smatch.match_triples(
+            triples1, triples2, justinstance=justinstance, justattribute=justattribute, justrelation=justrelation,
+            seed_mapping=previous_mapping)
+        smatch.match_triple_dict.clear()
+        return self._store(keys[0], [match_num, test_num, gold_num, mapping])
+
+    def score_amr_pair(self, amr1, amr2, justinstance=False, justattribute=False, justrelation=False,
+                       diagnostics=False):
+        """
+        smatch.score_amr_pairs([amr1], [amr2]) with the cache.
+        Returns:
+            (precision, recall, f_score), unmatched triples of AMR 1, unmatched triples of AMR 2 (None unless
+            diagnostics is True)
+        """
+        match_num, test_num, gold_num, mapping = self.match(amr1, amr2, justinstance=justinstance,
+                                                            justattribute=justattribute, justrelation=justrelation)
+        unmatched_1 = unmatched_2 = None
+        if diagnostics:
+            triples1, _ = self.triples(amr1, "a")
+            triples2, _ = self.triples(amr2, "b")
+            unmatched_1, unmatched_2 = smatch.get_unmatched_triples(mapping, *triples1, *triples2)
+        return smatch.compute_f(match_num, test_num, gold_num), unmatched_1, unmatched_2
+
+    def save(self):
+        """Write the cache to its file, if pairs were scored since it was loaded"""
+        if not self.path or not self._changed:
+            return
+        temp_path = self.path + ".tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump(self.entries, f)
+        os.replace(temp_path, self.path)
+        self._changed = False
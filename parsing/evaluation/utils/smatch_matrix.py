@@ -0,0 +1,236 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Pairwise smatch matrix of N TMRs of the same tombstone (samples of one model, or the outputs of several
+models) and their medoid, the TMR with the highest mean smatch F1 against the others (a consensus parse).
+
+Calling score_amr_pairs for every pair parses both TMRs and compares all their triples again for every pair.
+Here every TMR is parsed once (prepare), and its instance, attribute and relation triples are indexed by
+their normalized concept, (role, value) and role, so the candidate pool of a pair (smatch.compute_pool) is
+a join of two indexes instead of a comparison of all triple pairs. The hill-climbing is smatch.hill_climb.
+Only the best match is symmetric: the hill-climbing maps the nodes of the first TMR onto the second one from
+greedy and random starts, so it can end at different local optima in both directions. Every pair is scored in
+both directions and the higher F1 (the closer one to the best match smatch approximates) is kept, which makes
+the matrix symmetric; the upper triangle is computed, one row per task (in parallel with workers > 1).
+
+Parameters (of the command line, which picks the medoid of the outputs of several systems per image):
+  --predictions : Prediction files, JSON {image: TMR} of the few-shot scripts, or JSON Lines with a "predict"
+                  field (keyed by line number).
+  --output      : JSON file {image: medoid TMR} (default: consensus.json).
+  --workers     : Number of processes, the images are scored in parallel (default: 1).
+
+Example:
+  python smatch_matrix.py --predictions ../../few_shot/qwen_*/qwen_*_one_shot.json
+"""
+
+import os
+import json
+import argparse
+import multiprocessing as mp
+
+import numpy as np
+
+try:
+    from . import smatch
+except ImportError:
+    import smatch
+
+
+class PreparedGraph(object):
+    """
+    Triples of a TMR as get_amr_match normalizes them, and their indexes.
+    Members:
+        instances: instance triples (smatch.hill_climb needs their concepts)
+        triple_num: number of triples
+        concepts: {normalized concept: [node]}
+        attributes: {(normalized role, normalized value): [node]}
+        relations: {normalized role: [(node 1, node 2)]}
+    """
+
+    __slots__ = ("instances", "triple_num", "concepts", "attributes", "relations")
+
+    def __init__(self, instances, attributes, relations):
+        normalize = smatch.normalize
+        self.instances = instances
+        self.triple_num = len(instances) + len(attributes) + len(relations)
+        self.concepts = {}
+        self.attributes = {}
+        self.relations = {}
+        # node names are "a" + node index
+        for node, (_, _, concept) in enumerate(instances):
+            self.concepts.setdefault(normalize(concept), []).append(node)
+        for role, name, value in attributes:
+            self.attributes.setdefault((normalize(role), normalize(value)), []).append(int(name[1:]))
+        for role, name1, name2 in relations:
+            self.relations.setdefault(normalize(role), []).append((int(name1[1:]), int(name2[1:])))
+
+
+def prepare(text):
+    """PreparedGraph of a TMR read as score_amr_pairs reads it, None if it is ill-formed"""
+    try:
+        return PreparedGraph(*smatch.get_normalized_triples(smatch.get_penman_line([text]), "a"))
+    except Exception:
+        return None
+
+
+def compute_pool(graph1, graph2):
+    """candidate_mappings and weight_dict of smatch.compute_pool, from the indexes of two PreparedGraphs"""
+    candidate_mappings = [set() for _ in graph1.instances]
+    weight_dict = {}
+    for index1, index2 in (graph1.concepts, graph2.concepts), (graph1.attributes, graph2.attributes):
+        for key, nodes1 in index1.items():
+            nodes2 = index2.get(key)
+            if nodes2 is None:
+                continue
+            for node1 in nodes1:
+                candidates = candidate_mappings[node1]
+                for node2 in nodes2:
+                    candidates.add(node2)
+                    weights = weight_dict.get((node1, node2))
+                    if weights is None:
+                        weight_dict[(node1, node2)] = {-1: 1}
+                    else:
+                        weights[-1] += 1
+    for role, edges1 in graph1.relations.items():
+        edges2 = graph2.relations.get(role)
+        if edges2 is None:
+            continue
+        for source1, target1 in edges1:
+            for source2, target2 in edges2:
+                candidate_mappings[source1].add(source2)
+                candidate_mappings[target1].add(target2)
+                node_pair1 = (source1, source2)
+                node_pair2 = (target1, target2)
+                if node_pair1 != node_pair2:
+                    if source1 > target1:
+                        node_pair1, node_pair2 = node_pair2, node_pair1
+                    weights = weight_dict.setdefault(node_pair1, {-1: 0})
+                    weights[node_pair2] = weights.get(node_pair2, 0) + 1
+                    weights = weight_dict.setdefault(node_pair2, {-1: 0})
+                    weights[node_pair1] = weights.get(node_pair1, 0) + 1
+                else:
+                    weight_dict.setdefault(node_pair1, {-1: 0})[-1] += 1
+    return candidate_mappings, weight_dict
+
+
+def pair_score(graph1, graph2):
+    """smatch F1 of two PreparedGraphs"""
+    candidate_mappings, weight_dict = compute_pool(graph1, graph2)
+    _, match_num = smatch.hill_climb(candidate_mappings, weight_dict, graph1.instances, graph2.instances)
+    # the match numbers of the mappings are only valid for this pair
+    smatch.match_triple_dict.clear()
+    return smatch.compute_f(match_num, graph1.triple_num, graph2.triple_num)[2]
+
+
+_graphs = []
+
+
+def _init_worker(graphs):
+    global _graphs
+    _graphs = graphs
+
+
+def _score_row(i):
+    """Scores of graph i against the graphs after it (the upper triangle of row i), the higher of both directions"""
+    graph1 = _graphs[i]
+    return i, [max(pair_score(graph1, graph2), pair_score(graph2, graph1)) if graph2 is not None else 0.0
+               for graph2 in _graphs[i + 1:]]
+
+
+def medoid(matrix, valid):
+    """
+    Index of the TMR with the highest mean F1 against the other valid TMRs (the first one on a tie),
+    None if no TMR is valid.
+    """
+    candidates = np.flatnonzero(valid)
+    if len(candidates) == 0:
+        return None
+    if len(candidates) == 1:
+        return int(candidates[0])
+    scores = matrix[np.ix_(candidates, candidates)].sum(axis=1) - matrix[candidates, candidates]
+    return int(candidates[np.argmax(scores)])
+
+
+def pairwise_smatch(texts, workers=1):
+    """
+    Pairwise smatch F1 of TMRs.
+    Arguments:
+        texts: the TMRs (PENMAN text)
+        workers: number of processes the rows are scored in
+    Returns:
+        symmetric N x N matrix of the smatch F1 of every pair, the higher of both directions (1 on the diagonal,
+        0 for ill-formed TMRs), and the index of the medoid (None if all TMRs are ill-formed)
+    """
+    graphs = [prepare(text) for text in texts]
+    valid = np.array([graph is not None for graph in graphs], dtype=bool)
+    matrix = np.zeros((len(texts), len(texts)))
+    rows = [i for i in range(len(texts) - 1) if valid[i]]
+    if workers > 1 and len(rows) > 1:
+        with mp.get_context("spawn").Pool(workers, initializer=_init_worker, initargs=(graphs,)) as pool:
+            results = list(pool.imap_unordered(_score_row, rows))
+    else:
+        _init_worker(graphs)
+        results = [_score_row(i) for i in rows]
+    for i, scores in results:
+        matrix[i, i + 1:] = scores
+    matrix += matrix.T
+    matrix[valid, valid] = 1.0
+    return matrix, medoid(matrix, valid)
+
+
+def load_predictions(path):
+    """{key: TMR} of a prediction file"""
+    with open(path, encoding="utf-8") as f:
+        if path.endswith(".jsonl"):
+            return {f"{i}": json.loads(line)["predict"] for i, line in enumerate(f) if line.strip()}
+        return json.load(f)
+
+
+def _consensus(item):
+    key, texts = item
+    matrix, index = pairwise_smatch(texts)
+    return key, matrix, index
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Medoid (consensus) TMR of the outputs of several systems.")
+    parser.add_argument("--predictions", type=str, nargs="+", required=True, help="Prediction files")
+    parser.add_argument("--output", type=str, default="consensus.json", help="JSON file {image: medoid TMR}")
+    parser.add_argument("--workers", type=int, default=1, help="Number of processes (default: 1)")
+    args = parser.parse_args()
+
+    systems = [load_predictions(path) for path in args.predictions]
+    keys = sorted(set.intersection(*(set(predictions) for predictions in systems)))
+    items = [(key, [predictions[key] for predictions in systems]) for key in keys]
+    print(f"{len(keys)} images predicted by all {len(systems)} systems")
+
+    if args.workers > 1:
+        with mp.get_context("spawn").Pool(args.workers) as pool:
+            results = list(pool.imap(_consensus, items, chunksize=8))
+    else:
+        results = [_consensus(item) for item in items]
+
+    consensus = {}
+    chosen = np.zeros(len(systems), dtype=int)
+    agreement = np.zeros((len(systems), len(systems)))
+    for (key, texts), (_, matrix, index) in zip(items, results):
+        agreement += matrix
+        if index is not None:
+            consensus[key] = texts[index]
+            chosen[index] += 1
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(consensus, f, ensure_ascii=False, indent=1)
+
+    names = [os.path.basename(path) for path in args.predictions]
+    print("\nMean pairwise smatch F1:")
+    for name, row in zip(names, agreement / max(len(items), 1)):
+        print(f"  {name:<30} " + " ".join(f"{score:.3f}" for score in row))
+    print("\nMedoid chosen:")
+    for name, count in zip(names, chosen):
+        print(f"  {name:<30} {count}")
+    print(f"\n{len(consensus)} consensus TMRs saved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
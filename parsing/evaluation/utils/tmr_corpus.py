@@ -0,0 +1,228 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Columnar binary store of the TMR annotations (NumPy .npz).
+
+tombs_grounded.txt is parsed once by export_corpus, and the graphs of all tombstones are saved as flat arrays
+that TMRCorpus loads in a few milliseconds, without parsing. The arrays (all readable with np.load, without
+pickle):
+  ids                : id of every tombstone (t00000, ...), its position in the annotation file
+  text, text_offsets : the TMRs as written (UTF-8 bytes), TMR i is text[text_offsets[i]:text_offsets[i + 1]]
+  symbols            : interned concepts, roles and values (see penman_parser.SymbolTable)
+  variables, concepts: variable name and concept id of every node
+  edges              : (src, role id, dst) of every relation, src and dst are node numbers within the tombstone
+  attributes         : (node, role id, value id) of every attribute, values as written (quotes included)
+  node_offsets, edge_offsets, attribute_offsets : the nodes, edges and attributes of tombstone i are the rows
+                       offsets[i]:offsets[i + 1] of the arrays
+  parsed, truncated  : per tombstone, False if the TMR could not be parsed (it has no nodes) / True if nodes
+                       were still open at the end of the text
+  source_sha1        : SHA-1 of the annotation file the corpus was exported from
+
+Statistics over the corpus are column scans, e.g. np.bincount(corpus.concepts) counts every concept.
+
+Parameters:
+  --annotation_file : TMR annotations (default: ../../../data/annotation/tombs_grounded.txt).
+  --output          : Corpus file (default: the annotation file with the extension .npz).
+
+Example:
+  python tmr_corpus.py
+"""
+
+import os
+import io
+import time
+import hashlib
+import argparse
+
+import numpy as np
+
+try:
+    from .penman_parser import SymbolTable, get_penman_line
+    from .tmr_graph import TMRGraph
+except ImportError:
+    from penman_parser import SymbolTable, get_penman_line
+    from tmr_graph import TMRGraph
+
+
+def _offsets(lengths):
+    return np.concatenate(([0], np.cumsum(lengths, dtype=np.int64)))
+
+
+def build_corpus(content):
+    """
+    Arrays of the corpus (see the module docstring) of the content of an annotation file.
+    The TMRs are read as smatch reads them (get_penman_line), a TMR that cannot be parsed is kept (its text)
+    without nodes.
+    """
+    texts = content.split("\n\n")
+    symbols = SymbolTable()
+    variables = []
+    concepts = [np.empty(0, dtype=np.int32)]
+    edges = [np.empty((0, 3), dtype=np.int32)]
+    attributes = [np.empty((0, 3), dtype=np.int32)]
+    lengths = {"node": [], "edge": [], "attribute": []}
+    parsed, truncated = [], []
+    for text in texts:
+        try:
+            graph = TMRGraph.from_penman(get_penman_line(io.StringIO(text)), symbols)
+        except ValueError:
+            graph = None
+        parsed.append(graph is not None)
+        truncated.append(graph is not None and graph.truncated)
+        if graph is None:
+            for key in lengths:
+                lengths[key].append(0)
+            continue
+        variables.extend(graph.variables)
+        concepts.append(graph.concepts)
+        edges.append(graph.edges)
+        attributes.append(graph.attributes)
+        lengths["node"].append(len(graph.variables))
+        lengths["edge"].append(len(graph.edges))
+        lengths["attribute"].append(len(graph.attributes))
+
+    encoded = [text.encode("utf-8") for text in texts]
+    return {
+        "ids": np.array([f"t{i:05d}" for i in range(len(texts))]),
+        "text": np.frombuffer(b"".join(encoded), dtype=np.uint8),
+        "text_offsets": _offsets([len(text) for text in encoded]),
+        "symbols": np.array(symbols.symbols, dtype=str),
+        "variables": np.array(variables, dtype=str),
+        "concepts": np.concatenate(concepts),
+        "edges": np.concatenate(edges),
+        "attributes": np.concatenate(attributes),
+        "node_offsets": _offsets(lengths["node"]),
+        "edge_offsets": _offsets(lengths["edge"]),
+        "attribute_offsets": _offsets(lengths["attribute"]),
+        "parsed": np.array(parsed),
+        "truncated": np.array(truncated),
+        "source_sha1": np.array(hashlib.sha1(content.encode("utf-8")).hexdigest()),
+    }
+
+
+def export_corpus(annotation_file, output_path):
+    """
+    Parse the annotation file and save it as a columnar corpus.
+    Returns:
+        number of TMRs, number of TMRs that could not be parsed
+    """
+    with open(annotation_file, encoding="utf-8") as f:
+        arrays = build_corpus(f.read())
+    np.savez(output_path, **arrays)
+    return len(arrays["ids"]), int(np.count_nonzero(~arrays["parsed"]))
+
+
+class TMRCorpus(object):
+    """
+    The arrays of a corpus file (see the module docstring) as members, and the TMRs of single tombstones
+    as TMRGraph objects whose arrays are views of the corpus arrays.
+    """
+
+    def __init__(self, arrays):
+        self.ids = arrays["ids"]
+        self.text = arrays["text"]
+        self.text_offsets = arrays["text_offsets"]
+        self.symbols = arrays["symbols"]
+        self.variables = arrays["variables"]
+        self.concepts = arrays["concepts"]
+        self.edges = arrays["edges"]
+        self.attributes = arrays["attributes"]
+        self.node_offsets = arrays["node_offsets"]
+        self.edge_offsets = arrays["edge_offsets"]
+        self.attribute_offsets = arrays["attribute_offsets"]
+        self.parsed = arrays["parsed"]
+        self.truncated = arrays["truncated"]
+        self.source_sha1 = str(arrays["source_sha1"])
+        self._symbol_table = None
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            return cls({name: data[name] for name in data.files})
+
+    def __len__(self):
+        return len(self.ids)
+
+    @property
+    def symbol_table(self):
+        """SymbolTable of the symbols (built on first use), shared by the graphs of the corpus"""
+        if self._symbol_table is None:
+            self._symbol_table = SymbolTable(self.symbols.tolist())
+        return self._symbol_table
+
+    def symbol_ids(self, symbols):
+        """Ids of symbols, -1 for the symbols that are not in the corpus"""
+        ids = self.symbol_table.ids
+        return np.array([ids.get(symbol, -1) for symbol in symbols], dtype=np.int32)
+
+    def tmr(self, i):
+        """Text of TMR i, as written in the annotation file"""
+        return self.text[self.text_offsets[i]:self.text_offsets[i + 1]].tobytes().decode("utf-8")
+
+    def tmrs(self):
+        """{id: TMR text} of all tombstones, as load_annotations returns them"""
+        return {idx: self.tmr(i) for i, idx in enumerate(self.ids.tolist())}
+
+    def graph(self, i):
+        """TMRGraph of tombstone i (None if it could not be parsed), its arrays are views of the corpus"""
+        if not self.parsed[i]:
+            return None
+        nodes = slice(self.node_offsets[i], self.node_offsets[i + 1])
+        return TMRGraph(self.symbol_table, self.variables[nodes].tolist(), self.concepts[nodes],
+                        self.edges[self.edge_offsets[i]:self.edge_offsets[i + 1]],
+                        self.attributes[self.attribute_offsets[i]:self.attribute_offsets[i + 1]],
+                        bool(self.truncated[i]))
+
+    def node_tombstones(self):
+        """Tombstone number of every node (to group the node columns per tombstone)"""
+        return np.repeat(np.arange(len(self.ids)), np.diff(self.node_offsets))
+
+    def concept_counts(self):
+        """Number of nodes with every concept, indexed by symbol id"""
+        return np.bincount(self.concepts, minlength=len(self.symbols))
+
+
+def load_corpus(path):
+    """TMRCorpus of a corpus file (.npz), or of an annotation file (parsed in memory)"""
+    if path.endswith(".npz"):
+        return TMRCorpus.load(path)
+    with open(path, encoding="utf-8") as f:
+        return TMRCorpus(build_corpus(f.read()))
+
+
+def load_annotations(path):
+    """
+    {id: TMR text} of an annotation file or of a corpus file (.npz), the id of a TMR is its position in the
+    annotation file. Only the text columns of a corpus file are read. This is the loader of the annotations
+    of the whole repository (data/split/split_for_llamafactory.py, parsing/few_shot/qwen_infer.py).
+    """
+    if path.endswith(".npz"):
+        with np.load(path) as corpus:
+            ids, text, offsets = corpus["ids"].tolist(), corpus["text"].tobytes(), corpus["text_offsets"].tolist()
+        return {idx: text[offsets[i]:offsets[i + 1]].decode("utf-8") for i, idx in enumerate(ids)}
+    with open(path, encoding="utf-8") as f:
+        return {f"t{i:05d}": text for i, text in enumerate(f.read().split("\n\n"))}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export the TMR annotations as a columnar corpus (.npz).")
+    parser.add_argument("--annotation_file", type=str, default="../../../data/annotation/tombs_grounded.txt",
+                        help="TMR annotations")
+    parser.add_argument("--output", type=str, default=None,
+                        help="Corpus file (default: the annotation file with the extension .npz)")
+    args = parser.parse_args()
+
+    output = args.output or os.path.splitext(args.annotation_file)[0] + ".npz"
+    start = time.perf_counter()
+    total, failed = export_corpus(args.annotation_file, output)
+    print(f"{total} TMRs ({failed} could not be parsed) exported to {output} "
+          f"in {time.perf_counter() - start:.2f} s, {os.path.getsize(output) / 1e6:.2f} MB")
+    start = time.perf_counter()
+    corpus = TMRCorpus.load(output)
+    print(f"Loaded in {(time.perf_counter() - start) * 1e3:.1f} ms: {len(corpus.concepts)} nodes, "
+          f"{len(corpus.edges)} edges, {len(corpus.attributes)} attributes, {len(corpus.symbols)} symbols")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,209 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Compact TMR graph: interned symbols and NumPy edge arrays.
+
+A TMRGraph holds one tombstone meaning representation as integer arrays over a SymbolTable (concepts, roles
+and values are interned, the table can be shared by all the graphs of a corpus):
+  - variables: variable name of every node (node 0 is the root)
+  - concepts:  concept id of every node, int32 array of shape (nodes,)
+  - edges:     (src, role id, dst) of every relation, int32 array of shape (relations, 3)
+  - attributes: (node, role id, value id) of every attribute, int32 array of shape (attributes, 3),
+                values are kept as written (quotes included), so that to_penman writes them back
+
+Both arrays are sorted by their first column, so the edges and attributes of a node are a slice (a view, no
+copy) of the arrays: see edges_of and attributes_of. triples() returns the string triples smatch scores, as
+penman_parser.PenmanGraph.triples (and amr.AMR.get_triples) does, in the same order.
+"""
+
+import numpy as np
+
+try:
+    from .penman_parser import parse_penman, amr_value, NOT_INVERTED
+except ImportError:
+    from penman_parser import parse_penman, amr_value, NOT_INVERTED
+
+# columns of TMRGraph.edges and TMRGraph.attributes
+SRC, ROLE, DST = 0, 1, 2
+NODE, VALUE = 0, 2
+
+
+def unquote(value):
+    """A value as written without its quotes ("2747409" -> 2747409), None if it is not a quoted string"""
+    if len(value) > 1 and value[0] == value[-1] == '"':
+        return value[1:-1]
+    return None
+
+
+def _triple_array(triples):
+    # no copy if triples already is an int32 array (e.g. a slice of a TMRCorpus)
+    return np.asarray(triples, dtype=np.int32).reshape(-1, 3)
+
+
+class TMRGraph(object):
+    """
+    A TMR as interned symbols and integer arrays, see the module docstring.
+    Members:
+        symbols: SymbolTable of the concepts, roles and values
+        variables: variable name of every node
+        concepts: concept id of every node
+        edges: (src, role id, dst) of every relation, sorted by src
+        attributes: (node, role id, value id) of every attribute, sorted by node (the root has TOP)
+        truncated: True if nodes were still open at the end of the text
+    """
+
+    __slots__ = ("symbols", "variables", "concepts", "edges", "attributes", "truncated",
+                 "_edge_offsets", "_attribute_offsets")
+
+    def __init__(self, symbols, variables, concepts, edges, attributes, truncated=False):
+        self.symbols = symbols
+        self.variables = variables
+        self.concepts = np.asarray(concepts, dtype=np.int32)
+        self.edges = _triple_array(edges)
+        self.attributes = _triple_array(attributes)
+        self.truncated = truncated
+        self._edge_offsets = None
+        self._attribute_offsets = None
+
+    @classmethod
+    def from_penman_graph(cls, graph):
+        """TMRGraph of a penman_parser.PenmanGraph, sharing its SymbolTable"""
+        concepts = [concept for _, concept in graph.instances]
+        edges = [(node1, role, node2) for role, node1, node2 in graph.relations]
+        attributes = [(node, role, value) for role, node, value in graph.attributes]
+        return cls(graph.symbols, graph.variables, concepts, edges, attributes, graph.truncated)
+
+    @classmethod
+    def from_penman(cls, text, symbols=None):
+        """
+        Parse one TMR in PENMAN notation.
+        Arguments:
+            text: the PENMAN text (on one or more lines)
+            symbols: SymbolTable to intern the concepts, roles and values in (default: a new one)
+        Returns:
+            TMRGraph of the TMR, raises penman_parser.PenmanError if the text is ill-formed
+        """
+        return cls.from_penman_graph(parse_penman(text, symbols))
+
+    def to_penman(self):
+        """
+        The graph in PENMAN notation, on one line. Nodes are nested along the edges from the root (an edge
+        to a node that is already written is written as its variable, an edge only reachable backwards as
+        :role-of), nodes that are not reachable from the root follow as further top-level nodes.
+        An edge is only written in a direction the parser reads back as the same edge: :role-of is not an
+        inversion for the roles of penman_parser.NOT_INVERTED (:consist-of), and :mod or a role ending in -of
+        written forwards would be inverted; such edges are written from their other node. from_penman of the
+        text gives the same triples, raises ValueError for an edge that can be written in neither direction.
+        """
+        symbols = self.symbols.symbols
+        variables = self.variables
+        concepts = self.concepts.tolist()
+        top = self.symbols.ids.get("TOP")
+        outgoing = [[] for _ in variables]
+        incoming = [[] for _ in variables]
+        for edge, (src, role, dst) in enumerate(self.edges.tolist()):
+            name = symbols[role]
+            forward = name != "mod" and (name[-3:] != "-of" or name in NOT_INVERTED)
+            backward = name + "-of" not in NOT_INVERTED
+            if not forward and not backward:
+                raise ValueError(f"Edge :{name} can not be written in PENMAN notation")
+            if forward:
+                outgoing[src].append((edge, role, dst, ""))
+            if backward:
+                incoming[dst].append((edge, role, src, "-of"))
+        values = [[] for _ in variables]
+        for node, role, value in self.attributes.tolist():
+            if node != 0 or role != top:
+                values[node].append((role, value))
+        written = [False] * len(variables)
+        edge_written = [False] * len(self.edges)
+        parts = []
+
+        def write(node):
+            written[node] = True
+            parts.append(f"({variables[node]} / {symbols[concepts[node]]}")
+            for role, value in values[node]:
+                parts.append(f" :{symbols[role]} {symbols[value]}")
+            for edge, role, other, suffix in outgoing[node] + incoming[node]:
+                if edge_written[edge]:
+                    continue
+                edge_written[edge] = True
+                parts.append(f" :{symbols[role]}{suffix} ")
+                if written[other]:
+                    parts.append(variables[other])
+                else:
+                    write(other)
+            parts.append(")")
+
+        for node in range(len(variables)):
+            if not written[node]:
+                if parts:
+                    parts.append(" ")
+                write(node)
+        return "".join(parts)
+
+    def __getstate__(self):
+        return (self.symbols, self.variables, self.concepts, self.edges, self.attributes, self.truncated)
+
+    def __setstate__(self, state):
+        self.symbols, self.variables, self.concepts, self.edges, self.attributes, self.truncated = state
+        self._edge_offsets = None
+        self._attribute_offsets = None
+
+    def __len__(self):
+        return len(self.variables)
+
+    def __repr__(self):
+        return (f"TMRGraph({self.variables[0] if self.variables else ''}: {len(self.variables)} nodes, "
+                f"{len(self.edges)} edges, {len(self.attributes)} attributes)")
+
+    def edges_of(self, node):
+        """Edges (src, role id, dst) from a node, a view of edges"""
+        if self._edge_offsets is None:
+            self._edge_offsets = np.searchsorted(self.edges[:, SRC], np.arange(len(self.variables) + 1))
+        return self.edges[self._edge_offsets[node]:self._edge_offsets[node + 1]]
+
+    def attributes_of(self, node):
+        """Attributes (node, role id, value id) of a node, a view of attributes"""
+        if self._attribute_offsets is None:
+            self._attribute_offsets = np.searchsorted(self.attributes[:, NODE],
+                                                      np.arange(len(self.variables) + 1))
+        return self.attributes[self._attribute_offsets[node]:self._attribute_offsets[node + 1]]
+
+    def role_id(self, role):
+        """Id of a role, -1 if it is not in the symbol table (so it matches nothing)"""
+        return self.symbols.ids.get(role, -1)
+
+    def values(self, role, node=None):
+        """Values (as written) of the attributes with a role, of one node or of all nodes"""
+        attributes = self.attributes if node is None else self.attributes_of(node)
+        symbols = self.symbols.symbols
+        return [symbols[value] for value in attributes[attributes[:, ROLE] == self.role_id(role), VALUE].tolist()]
+
+    def targets(self, role, node=None):
+        """Nodes at the end of the edges with a role, from one node or from all nodes"""
+        edges = self.edges if node is None else self.edges_of(node)
+        return edges[edges[:, ROLE] == self.role_id(role), DST].tolist()
+
+    def triples(self, prefix=None):
+        """
+        Instance, attribute and relation triples as strings, as penman_parser.PenmanGraph.triples returns
+        them (the nodes are renamed to prefix + index if prefix is given).
+        """
+        if prefix is None:
+            names = self.variables
+        else:
+            names = [prefix + str(i) for i in range(len(self.variables))]
+        symbols = self.symbols.symbols
+        instances = [("instance", names[node], symbols[concept])
+                     for node, concept in enumerate(self.concepts.tolist())]
+        attributes = [(symbols[role], names[node], amr_value(symbols[value]))
+                      for node, role, value in self.attributes.tolist()]
+        relations = [(symbols[role], names[src], names[dst]) for src, role, dst in self.edges.tolist()]
+        return instances, attributes, relations
+
+    def var2concept(self):
+        """{variable: concept}, as utils.var2concept of an amr.AMR"""
+        symbols = self.symbols.symbols
+        return {var: symbols[concept] for var, concept in zip(self.variables, self.concepts.tolist())}
@@ -0,0 +1,230 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Generation helpers shared by the Qwen2.5-VL PENMAN parsers.
+
+PenmanLogitsProcessor restricts sampling to tokens that keep the generated text a valid TMR prefix (see
+penman_grammar.py), so the output can always be parsed by amr.AMR.parse_AMR_line.
+PenmanStoppingCriteria ends generation as soon as the root graph is closed, instead of letting the model
+ramble on until max_new_tokens.
+ForwardCounter counts forward passes, which gives the acceptance rate of assisted (speculative) generation.
+"""
+
+import time
+
+import torch
+from transformers import (LogitsProcessor, StoppingCriteria, TemperatureLogitsWarper, TopKLogitsWarper,
+                          TopPLogitsWarper)
+
+from penman_grammar import PenmanState, ClosureTracker
+
+
+class PenmanLogitsProcessor(LogitsProcessor):
+    """
+    Mask every token that would make the generated text an ill-formed TMR.
+
+    Checking the whole vocabulary at every step is too slow, so for every row only the max_checks highest
+    scoring tokens are checked (tokens already masked to -inf by an earlier processor are never allowed), and
+    the first top_k valid ones are kept. Once the root graph is closed only the end-of-sequence token is
+    allowed. If none of the checked tokens is valid, only the end-of-sequence token is allowed, or, with
+    prune_invalid (beam search), all its tokens are masked so that the beam is dropped. A row is never left
+    without a finite score, so sampling never sees a row of -inf only.
+    Beams that share a prefix share its grammar state.
+
+    The sampling filters (temperature, top-k, top-p) must run after this processor, otherwise most valid tokens
+    may already be masked: see sampling_warpers.
+
+    Arguments:
+        tokenizer: tokenizer of the model (processor.tokenizer for Qwen2.5-VL)
+        prompt_length: length of the prompt in input_ids, generated tokens start after it
+        eos_token_id: end-of-sequence token id (or list of ids)
+        top_k: number of valid tokens kept per step
+        max_checks: number of candidate tokens checked per step
+        prune_invalid: mask all tokens of rows without a valid continuation
+    """
+
+    def __init__(self, tokenizer, prompt_length, eos_token_id, top_k=50, max_checks=400, prune_invalid=False):
+        self.tokenizer = tokenizer
+        self.prompt_length = prompt_length
+        if isinstance(eos_token_id, int):
+            eos_token_id = [eos_token_id]
+        self.eos_token_id = set(eos_token_id)
+        self.special_ids = set(tokenizer.all_special_ids)
+        self.top_k = top_k
+        self.max_checks = max_checks
+        self.prune_invalid = prune_invalid
+        # decoded text of each token id, filled lazily
+        self.token_text = {}
+        # grammar state of each generated prefix of the previous step, keyed by the generated ids
+        self.states = {}
+
+    def _text(self, token_id):
+        if token_id not in self.token_text:
+            token = self.tokenizer.convert_ids_to_tokens(token_id)
+            # the embedding matrix may be padded beyond the tokenizer vocabulary
+            self.token_text[token_id] = None if token is None else self.tokenizer.convert_tokens_to_string([token])
+        return self.token_text[token_id]
+
+    def _state(self, generated):
+        # rows may be reordered between steps (beam search), so states are looked up by prefix, not by row
+        if generated in self.states:
+            return self.states[generated]
+        parent = self.states.get(generated[:-1]) if generated else None
+        if parent is not None:
+            state = parent.copy()
+            tail = generated[-1:]
+        else:
+            state = PenmanState()
+            tail = generated
+        for token_id in tail:
+            if token_id in self.eos_token_id:
+                break
+            state.feed(self._text(token_id) or "")
+        return state
+
+    def allowed_tokens(self, state, scores):
+        """Return the ids of the best scoring tokens that are valid continuations of state"""
+        if state.complete:
+            return list(self.eos_token_id)
+        if state.error is not None:
+            return []
+        top = torch.topk(scores, min(self.max_checks, scores.shape[-1]))
+        allowed = []
+        for score, token_id in zip(top.values.tolist(), top.indices.tolist()):
+            if score == float("-inf"):
+                # the candidates are sorted, the remaining ones are masked too
+                break
+            if token_id in self.special_ids:
+                continue
+            text = self._text(token_id)
+            if text is not None and state.accepts(text):
+                allowed.append(token_id)
+                if len(allowed) >= self.top_k:
+                    break
+        return allowed
+
+    def __call__(self, input_ids, scores):
+        states = {}
+        for row in range(input_ids.shape[0]):
+            generated = tuple(input_ids[row, self.prompt_length:].tolist())
+            state = self._state(generated)
+            states[generated] = state
+            allowed = self.allowed_tokens(state, scores[row])
+            if not allowed and self.prune_invalid:
+                scores[row] = float("-inf")
+                continue
+            if not allowed:
+                # no valid continuation: end the sequence rather than generate ill-formed text
+                allowed = list(self.eos_token_id)
+            mask = torch.full_like(scores[row], float("-inf"))
+            index = torch.tensor(allowed, device=scores.device)
+            mask[index] = scores[row, index]
+            if not torch.isfinite(mask).any():
+                # the allowed tokens (end-of-sequence) were masked by an earlier processor
+                mask[index] = 0.0
+            scores[row] = mask
+        self.states = states
+        return scores
+
+
+def sampling_warpers(generation_kwargs, generation_config):
+    """
+    Temperature, top-k and top-p warpers of the sampling parameters of generation_kwargs (or of the
+    generation config of the model, for the parameters generation_kwargs does not set), to append to the
+    logits processors after PenmanLogitsProcessor. generate() would run them before the custom processors;
+    they are set to neutral values in generation_kwargs, so that it does not run them a second time.
+    """
+    warpers = []
+    values = {name: generation_kwargs.get(name, getattr(generation_config, name, None))
+              for name in ("temperature", "top_k", "top_p")}
+    if values["temperature"] is not None and values["temperature"] != 1.0:
+        warpers.append(TemperatureLogitsWarper(values["temperature"]))
+    if values["top_k"]:
+        warpers.append(TopKLogitsWarper(values["top_k"]))
+    if values["top_p"] is not None and values["top_p"] < 1.0:
+        warpers.append(TopPLogitsWarper(values["top_p"]))
+    generation_kwargs.update(temperature=1.0, top_k=0, top_p=1.0)
+    return warpers
+
+
+class PenmanStoppingCriteria(StoppingCriteria):
+    """
+    Stop a sequence once the parenthesis of its root graph, e.g. "(t00004 / tombstone.n.01", is closed.
+    Parentheses inside quoted values are ignored. The text generated in the same token after the closing
+    parenthesis is not removed here, use penman_grammar.trim_penman on the decoded output.
+
+    Arguments:
+        tokenizer: tokenizer of the model
+        prompt_length: length of the prompt in input_ids, generated tokens start after it
+    """
+
+    def __init__(self, tokenizer, prompt_length):
+        self.tokenizer = tokenizer
+        self.prompt_length = prompt_length
+        self.trackers = {}
+        # number of generated tokens of each row when it was stopped, None if it was never stopped
+        self.stopped_at = {}
+
+    def __call__(self, input_ids, scores, **kwargs):
+        done = []
+        trackers = {}
+        for row in range(input_ids.shape[0]):
+            generated = tuple(input_ids[row, self.prompt_length:].tolist())
+            tracker = self.trackers.get(generated[:-1])
+            if tracker is None:
+                tracker = ClosureTracker()
+                tracker.feed(self.tokenizer.decode(generated, skip_special_tokens=True))
+            else:
+                tracker = tracker.copy()
+                tracker.feed(self.tokenizer.decode(generated[-1:], skip_special_tokens=True))
+            trackers[generated] = tracker
+            if tracker.closed and row not in self.stopped_at:
+                self.stopped_at[row] = len(generated)
+            done.append(tracker.closed)
+        self.trackers = trackers
+        return torch.tensor(done, dtype=torch.bool, device=input_ids.device)
+
+
+class ForwardCounter(object):
+    """
+    Count the forward passes of a model while the context is active.
+
+    Example:
+        with ForwardCounter(model) as target_calls:
+            model.generate(...)
+        print(target_calls.count, target_calls.seconds)
+    """
+
+    def __init__(self, model):
+        self.model = model
+        self.count = 0
+        self.seconds = 0.0
+        self.handle = None
+
+    def _hook(self, module, args, output):
+        self.count += 1
+
+    def __enter__(self):
+        self.handle = self.model.register_forward_hook(self._hook)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.seconds = time.perf_counter() - self.start
+        self.handle.remove()
+        return False
+
+
+def assisted_stats(generated_tokens, target_calls, draft_calls):
+    """
+    Statistics of one assisted generation.
+    Every forward pass of the target model verifies the drafted tokens and adds one token of its own, so the
+    number of accepted draft tokens is the number of generated tokens minus the number of target passes.
+    Returns:
+        acceptance_rate: accepted draft tokens / drafted tokens
+        tokens_per_step: generated tokens per target forward pass (1.0 without a draft model)
+    """
+    accepted = max(generated_tokens - target_calls, 0)
+    acceptance_rate = accepted / draft_calls if draft_calls > 0 else 0.0
+    tokens_per_step = generated_tokens / target_calls if target_calls > 0 else 0.0
+    return acceptance_rate, tokens_per_step
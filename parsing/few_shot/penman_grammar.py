@@ -0,0 +1,288 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Incremental PENMAN grammar for tombstone meaning representations (TMR).
+
+PenmanState consumes generated text character by character and rejects the first character that can not
+lead to a well-formed TMR: unbalanced parentheses, roles outside the TMR role inventory, unquoted or
+unterminated attribute values, and text after the root graph is closed. It is pure Python so that it can be
+used (and tested) without loading a model; decoding.py wraps it into a transformers logits processor.
+
+Example:
+    state = PenmanState()
+    state.feed('(t00004 / tombstone.n.01\n    :ent (x1 / male.n.02')   # True
+    state.accepts(' :foo')                                               # False, unknown role
+    state.accepts('))')                                                  # True, closes the root
+"""
+
+# attribute roles, their value is always a quoted string, e.g. :nam "JAN WERKMAN", :yoc "1929"
+ATTRIBUTE_ROLES = {"nam", "dom", "moy", "yoc", "geo", "hco", "pfx", "sfx"}
+
+# numeric roles, their value is a bare number, e.g. :qua 27
+NUMERIC_ROLES = {"qua"}
+
+# relation roles, their value is a node "(x1 / male.n.02 ...)" or a re-entrant variable "x2"
+RELATION_ROLES = {
+    "ent", "rol", "tgt", "equ",
+    "dob", "dod", "pob", "pod",
+    "occ", "loc", "org", "ext", "age", "mem",
+    "beg", "end", "dur", "bef", "aft",
+    "sub", "op1", "op2",
+}
+
+# full role inventory, relation roles may also be inverted (:tgt-of, :op1-of, ...)
+TMR_ROLES = ATTRIBUTE_ROLES | NUMERIC_ROLES | RELATION_ROLES | {role + "-of" for role in RELATION_ROLES}
+
+WHITESPACE = " \t\r\n"
+
+# parser modes
+_START = 0      # before the opening parenthesis of the root
+_VAR = 1        # reading the variable of a node, e.g. x12
+_SLASH = 2      # between the variable and "/"
+_CONCEPT = 3    # reading the concept of a node, e.g. date.n.05
+_BODY = 4       # inside a node, expecting a role or ")"
+_ROLE = 5       # reading a role name after ":"
+_VALUE = 6      # expecting the value of a role
+_STRING = 7     # inside a quoted value
+_ATOM = 8       # reading an unquoted value (variable or number)
+_DONE = 9       # the root graph is closed
+
+
+def _role_prefixes(roles):
+    prefixes = set()
+    for role in roles:
+        for i in range(len(role) + 1):
+            prefixes.add(role[:i])
+    return prefixes
+
+
+_DEFAULT_PREFIXES = _role_prefixes(TMR_ROLES)
+
+
+class PenmanState(object):
+    """
+    Prefix state of a TMR in PENMAN notation.
+    Arguments:
+        roles: role inventory (without ":"), defaults to TMR_ROLES
+    """
+
+    def __init__(self, roles=None):
+        self.roles = TMR_ROLES if roles is None else set(roles)
+        self.prefixes = _DEFAULT_PREFIXES if roles is None else _role_prefixes(self.roles)
+        self.mode = _START
+        self.depth = 0
+        self.buffer = ""
+        self.role = None
+        # number of characters consumed so far, and offset of the first rejected character
+        self.offset = 0
+        self.error = None
+
+    def copy(self):
+        other = PenmanState.__new__(PenmanState)
+        other.__dict__.update(self.__dict__)
+        return other
+
+    @property
+    def complete(self):
+        """True once the root graph has been closed"""
+        return self.mode == _DONE
+
+    def feed(self, text):
+        """
+        Consume text. Returns False (and records self.error) at the first character that makes the prefix
+        ill-formed; the state is then left at that character and should be discarded.
+        """
+        for ch in text:
+            if not self._step(ch):
+                self.error = self.offset
+                return False
+            self.offset += 1
+        return True
+
+    def accepts(self, text):
+        """Check whether text is a valid continuation, without changing this state"""
+        return self.copy().feed(text)
+
+    def _close(self):
+        self.depth -= 1
+        self.mode = _DONE if self.depth == 0 else _BODY
+        return True
+
+    def _start_value(self, ch):
+        base = self.role[:-3] if self.role.endswith("-of") else self.role
+        if ch == "(":
+            if base in ATTRIBUTE_ROLES or base in NUMERIC_ROLES:
+                return False
+            self.depth += 1
+            self.mode = _VAR
+            self.buffer = ""
+            return True
+        if ch == '"':
+            self.mode = _STRING
+            return True
+        if base in ATTRIBUTE_ROLES:
+            # attribute values must be quoted
+            return False
+        if base in NUMERIC_ROLES:
+            if not (ch.isdigit() or ch == "-"):
+                return False
+        elif not (ch.isalpha() and ch.isascii()):
+            # unquoted relation values are re-entrant variables, e.g. :pod x2
+            return False
+        self.mode = _ATOM
+        self.buffer = ch
+        return True
+
+    def _step(self, ch):
+        mode = self.mode
+        if mode == _START:
+            if ch in WHITESPACE:
+                return True
+            if ch == "(":
+                self.depth = 1
+                self.mode = _VAR
+                self.buffer = ""
+                return True
+            return False
+        if mode == _VAR:
+            if ch in WHITESPACE:
+                if self.buffer:
+                    self.mode = _SLASH
+                return True
+            if ch == "/" and self.buffer:
+                self.mode = _CONCEPT
+                self.buffer = ""
+                return True
+            if ch.isascii() and (ch.isalpha() or (self.buffer and (ch.isdigit() or ch == "_"))):
+                self.buffer += ch
+                return True
+            return False
+        if mode == _SLASH:
+            if ch in WHITESPACE:
+                return True
+            if ch == "/":
+                self.mode = _CONCEPT
+                self.buffer = ""
+                return True
+            return False
+        if mode == _CONCEPT:
+            if ch in WHITESPACE:
+                if self.buffer:
+                    self.mode = _BODY
+                return True
+            if ch == ")":
+                return bool(self.buffer) and self._close()
+            if ch in '(":/':
+                return False
+            self.buffer += ch
+            return True
+        if mode == _BODY:
+            if ch in WHITESPACE:
+                return True
+            if ch == ":":
+                self.mode = _ROLE
+                self.buffer = ""
+                return True
+            if ch == ")":
+                return self._close()
+            return False
+        if mode == _ROLE:
+            if ch in WHITESPACE or ch in '("':
+                if self.buffer not in self.roles:
+                    return False
+                self.role = self.buffer
+                self.mode = _VALUE
+                return True if ch in WHITESPACE else self._start_value(ch)
+            candidate = self.buffer + ch
+            if candidate not in self.prefixes:
+                return False
+            self.buffer = candidate
+            return True
+        if mode == _VALUE:
+            if ch in WHITESPACE:
+                return True
+            return self._start_value(ch)
+        if mode == _STRING:
+            if ch == '"':
+                self.mode = _BODY
+                return True
+            # quoted values never span lines, a newline means the quote was never closed
+            return ch not in "\r\n"
+        if mode == _ATOM:
+            if ch in WHITESPACE:
+                self.mode = _BODY
+                return True
+            if ch == ")":
+                return self._close()
+            base = self.role[:-3] if self.role.endswith("-of") else self.role
+            if base in NUMERIC_ROLES:
+                if ch.isdigit() or ch == ".":
+                    self.buffer += ch
+                    return True
+                return False
+            if ch.isascii() and (ch.isalnum() or ch == "_"):
+                self.buffer += ch
+                return True
+            return False
+        # _DONE: only trailing whitespace may follow the root graph
+        return ch in WHITESPACE
+
+
+def is_well_formed(penman_text, roles=None):
+    """Check whether penman_text is one complete, well-formed TMR"""
+    state = PenmanState(roles)
+    return state.feed(penman_text) and state.complete
+
+
+class ClosureTracker(object):
+    """
+    Track the parenthesis depth of (possibly ill-formed) generated text, ignoring parentheses inside quoted
+    values, to find where the root graph is closed.
+    """
+
+    def __init__(self):
+        self.depth = 0
+        self.in_string = False
+        self.started = False
+        self.offset = 0
+        # offset just after the ")" closing the root, None while the root is open
+        self.end = None
+
+    def copy(self):
+        other = ClosureTracker.__new__(ClosureTracker)
+        other.__dict__.update(self.__dict__)
+        return other
+
+    @property
+    def closed(self):
+        return self.end is not None
+
+    def feed(self, text):
+        """Consume text, returns True once the root graph is closed"""
+        if self.end is not None:
+            self.offset += len(text)
+            return True
+        for i, ch in enumerate(text):
+            if self.in_string:
+                if ch == '"' or ch == "\n":
+                    self.in_string = False
+            elif ch == '"' and self.started:
+                self.in_string = True
+            elif ch == "(":
+                self.depth += 1
+                self.started = True
+            elif ch == ")" and self.started:
+                self.depth -= 1
+                if self.depth == 0:
+                    self.end = self.offset + i + 1
+                    break
+        self.offset += len(text)
+        return self.end is not None
+
+
+def trim_penman(text):
+    """Cut off everything generated after the root graph is closed"""
+    tracker = ClosureTracker()
+    if tracker.feed(text):
+        return text[:tracker.end]
+    return text
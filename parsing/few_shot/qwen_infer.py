@@ -0,0 +1,323 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Shared few-shot PENMAN parser for the Qwen2.5-VL models (3B, 7B and 72B).
+
+This script does the same as qwen_*/qwen_*_shot.py, but the model and the few-shot examples are arguments,
+and the generation path offers grammar-constrained decoding.
+
+Parameters:
+  --model            : Hugging Face model name (default: Qwen/Qwen2.5-VL-72B-Instruct).
+  --folder_path      : Folder containing the tombstone images to parse.
+  --output_json_path : JSON file the results are (incrementally) saved to.
+  --shots            : Ids of annotated tombstones used as examples, e.g. t00004 t00007 (default: none).
+  --annotation_file  : TMR annotations the examples are taken from (or a .npz corpus).
+  --example_folder   : Folder containing the images of the examples.
+  --constrained      : Mask tokens that would make the output an ill-formed TMR (see penman_grammar.py).
+  --stop_on_close    : Stop generating once the root graph is closed and trim the trailing text.
+  --draft_model      : Smaller Qwen2.5-VL model used as draft for assisted (speculative) generation,
+                       e.g. Qwen/Qwen2.5-VL-3B-Instruct for the 72B target.
+  --measure_speedup  : With --draft_model, also generate without the draft to log the speedup per image.
+  --decoding         : "sample" (default, as the qwen_*_shot.py scripts), or the deterministic "greedy" or
+                       "beam" presets, which give the same output on every run (see DECODING_PRESETS).
+  --num_beams        : Beam width of the "beam" preset (default: 4).
+  --image_cache      : Folder of downscaled copies (data/downscale/downscale.py); an image (or example) with a
+                       copy there is read from it. The prompt still uses the original file name.
+"""
+
+import argparse
+import json
+import os
+import sys
+import torch
+from transformers import (Qwen2_5_VLForConditionalGeneration, AutoProcessor, LogitsProcessorList,
+                          StoppingCriteriaList)
+from qwen_vl_utils import process_vision_info
+
+from decoding import (PenmanLogitsProcessor, PenmanStoppingCriteria, ForwardCounter, assisted_stats,
+                      sampling_warpers)
+from penman_grammar import trim_penman
+
+# the image cache is built and looked up by data/downscale/downscale.py, the annotations are read by
+# parsing/evaluation/utils/tmr_corpus.py
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "data", "downscale"))
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "evaluation", "utils"))
+from downscale import cached_image
+from tmr_corpus import load_annotations
+
+# Set seed for reproducibility
+torch.manual_seed(1234)
+
+# Select device dynamically
+device = "cuda" if torch.cuda.is_available() else "cpu"
+
+min_pixels = 256 * 28 * 28
+max_pixels = 1280 * 28 * 28
+
+max_new_tokens = 512  # Increased max_new_tokens for AMR
+
+# Decoding parameters of the presets. "sample" is what the qwen_*_shot.py scripts use, its outputs differ
+# between runs. "greedy" and "beam" are deterministic; PENMAN repeats roles and dates by design, so they
+# do not penalize repetition, and they always use grammar-constrained decoding, which also drops beams
+# that can not be completed into a well-formed TMR.
+DECODING_PRESETS = {
+    "sample": {"do_sample": True, "temperature": 0.7, "top_p": 0.9, "repetition_penalty": 1.2},
+    "greedy": {"do_sample": False, "temperature": None, "top_p": None, "top_k": None, "num_beams": 1},
+    "beam": {"do_sample": False, "temperature": None, "top_p": None, "top_k": None, "num_beams": 4,
+             "early_stopping": True},
+}
+
+NUMBER_WORDS = ["one", "two", "three", "four", "five", "six", "seven", "eight", "nine", "ten"]
+ORDINAL_WORDS = ["first", "second", "third", "fourth", "fifth", "sixth", "seventh", "eighth", "ninth", "tenth",
+                 "eleventh"]
+
+
+def load_model(model_name, device_map="auto"):
+    model = Qwen2_5_VLForConditionalGeneration.from_pretrained(
+        model_name,
+        torch_dtype="auto",
+        device_map=device_map
+    )
+    model.eval()
+    processor = AutoProcessor.from_pretrained(model_name, min_pixels=min_pixels, max_pixels=max_pixels)
+    return model, processor
+
+
+def load_examples(annotation_file, example_folder, shots):
+    """
+    Return (image path, TMR) pairs for the given tombstone ids. The id of a TMR is its position in the
+    annotation file (or a .npz corpus), see tmr_corpus.load_annotations.
+    """
+    annotations = load_annotations(annotation_file)
+    examples = []
+    for idx in shots:
+        examples.append((os.path.join(example_folder, f"{idx}.jpg"), annotations[f"t{int(idx[1:]):05d}"]))
+    return examples
+
+
+def build_messages(image_path, examples):
+    content = [{"type": "image", "image": example_path} for example_path, _ in examples]
+    content.append({"type": "image", "image": image_path})
+    if examples:
+        amr_text = "\n\n".join(example_amr for _, example_amr in examples)
+        n = len(examples)
+        if n == 1:
+            intro = "Below are one example of a meaning representation in PENMAN format for a tombstone in the first image:\n"
+        else:
+            intro = (f"Below are {NUMBER_WORDS[n - 1]} examples of meaning representations in PENMAN format for "
+                     f"tombstones in the first {NUMBER_WORDS[n - 1]} image seperately:\n")
+        text = (
+            intro +
+            f"{amr_text}\n\n"
+            f"Generate a meaning representation in PENMAN format for the tombstone in the {ORDINAL_WORDS[n]} image "
+            f"({os.path.basename(image_path).strip()})."
+            f"Don't give any other text or explanations."
+        )
+    else:
+        text = "Generate a meaning representation in PENMAN format for this image of a tombstone."
+    content.append({"type": "text", "text": text})
+    return [{"role": "user", "content": content}]
+
+
+def prepare_inputs(processor, messages, device=device):
+    text = processor.apply_chat_template(messages, tokenize=False, add_generation_prompt=True)
+    image_inputs, video_inputs = process_vision_info(messages)
+
+    inputs = processor(
+        text=[text],
+        images=image_inputs,
+        videos=video_inputs,
+        padding=True,
+        return_tensors="pt",
+    )
+    return inputs.to(device)
+
+
+def process_image(model, processor, image_path, examples, constrained=False, stop_on_close=False,
+                  assistant_model=None, measure_speedup=False, decoding="sample", num_beams=None):
+    """
+    Parse one tombstone image. Returns the generated TMR and the decoding statistics:
+    the number of generated tokens, the number of tokens of the max_new_tokens budget saved by stopping
+    when the root graph was closed, and with a draft (assistant) model the acceptance rate of the drafted
+    tokens, the generated tokens per target forward pass and, if measure_speedup, the wall-clock speedup over
+    generating without the draft model.
+    decoding selects one of DECODING_PRESETS, num_beams overrides the beam width of the "beam" preset.
+    """
+    # Prepare inputs for inference
+    messages = build_messages(image_path, examples)
+    inputs = prepare_inputs(processor, messages, device=model.device)
+
+    generation_kwargs = dict(DECODING_PRESETS[decoding])
+    if decoding != "sample":
+        constrained = True
+        if decoding == "beam" and num_beams:
+            generation_kwargs["num_beams"] = num_beams
+
+    # the sampling filters run after the grammar mask, so that they only see valid tokens
+    warpers = []
+    if constrained and generation_kwargs.get("do_sample"):
+        warpers = sampling_warpers(generation_kwargs, model.generation_config)
+
+    def generate(assistant=None):
+        logits_processor = LogitsProcessorList()
+        if constrained:
+            logits_processor.append(PenmanLogitsProcessor(processor.tokenizer,
+                                                          prompt_length=inputs.input_ids.shape[1],
+                                                          eos_token_id=model.generation_config.eos_token_id,
+                                                          prune_invalid=generation_kwargs.get("num_beams", 1) > 1))
+            logits_processor.extend(warpers)
+        stopping_criteria = StoppingCriteriaList()
+        closure = PenmanStoppingCriteria(processor.tokenizer, prompt_length=inputs.input_ids.shape[1])
+        if stop_on_close:
+            stopping_criteria.append(closure)
+
+        # Generate response with controlled decoding parameters
+        generated_ids = model.generate(
+            **inputs,
+            max_new_tokens=max_new_tokens,
+            logits_processor=logits_processor,
+            stopping_criteria=stopping_criteria,
+            assistant_model=assistant,
+            **generation_kwargs,
+        )
+        return generated_ids, closure
+
+    stats = {}
+    if assistant_model is None:
+        generated_ids, closure = generate()
+    else:
+        # the draft model shares the processor (and so the input ids and image features) with the target
+        with ForwardCounter(model) as target_calls, ForwardCounter(assistant_model) as draft_calls:
+            generated_ids, closure = generate(assistant_model)
+        generated_tokens = generated_ids.shape[1] - inputs.input_ids.shape[1]
+        acceptance_rate, tokens_per_step = assisted_stats(generated_tokens, target_calls.count, draft_calls.count)
+        stats["acceptance_rate"] = acceptance_rate
+        stats["tokens_per_step"] = tokens_per_step
+        stats["seconds"] = target_calls.seconds
+        if measure_speedup:
+            with ForwardCounter(model) as baseline_calls:
+                baseline_ids, _ = generate()
+            baseline_tokens = baseline_ids.shape[1] - inputs.input_ids.shape[1]
+            # compare time per generated token, the two runs sample different outputs
+            assisted_rate = target_calls.seconds / max(generated_tokens, 1)
+            baseline_rate = baseline_calls.seconds / max(baseline_tokens, 1)
+            stats["speedup"] = baseline_rate / assisted_rate if assisted_rate > 0 else 0.0
+
+    generated_ids_trimmed = [
+        out_ids[len(in_ids):] for in_ids, out_ids in zip(inputs.input_ids, generated_ids)
+    ]
+    output_text = processor.batch_decode(
+        generated_ids_trimmed, skip_special_tokens=True, clean_up_tokenization_spaces=False
+    )
+
+    stats["generated_tokens"] = len(generated_ids_trimmed[0])
+    stats["tokens_saved"] = 0
+    output_text = output_text[0]
+    if stop_on_close:
+        output_text = trim_penman(output_text)
+        if 0 in closure.stopped_at:
+            stats["tokens_saved"] = max_new_tokens - closure.stopped_at[0]
+
+    return output_text, stats
+
+
+def format_stats(stats):
+    line = f"Generated {stats['generated_tokens']} tokens, saved {stats['tokens_saved']} tokens"
+    if "acceptance_rate" in stats:
+        line += (f", acceptance rate {stats['acceptance_rate']:.3f}, "
+                 f"{stats['tokens_per_step']:.2f} tokens per target step")
+    if "speedup" in stats:
+        line += f", speedup {stats['speedup']:.2f}x"
+    return line + "."
+
+
+def process_folder(model, processor, folder_path, examples, output_json_path, image_cache=None, **options):
+    # Load existing results if the JSON file already exists
+    if os.path.exists(output_json_path):
+        with open(output_json_path, "r", encoding="utf-8") as json_file:
+            results = json.load(json_file)
+    else:
+        results = {}
+
+    total_files = len([f for f in os.listdir(folder_path) if f.lower().endswith(('.png', '.jpg', '.jpeg'))])
+    processed_files = len(results)
+    print(f"Total files to process: {total_files}")
+    print(f"Already processed files: {processed_files}")
+
+    total_saved = 0
+    for idx, file_name in enumerate(os.listdir(folder_path), start=1):
+        file_path = os.path.join(folder_path, file_name)
+        if (
+                file_name.lower().endswith(('.png', '.jpg', '.jpeg'))  # Only process image files
+                and file_name not in results  # Skip already processed files
+        ):
+            try:
+                print(f"Processing ({idx}/{total_files}): {file_name}")
+                response, stats = process_image(model, processor, cached_image(file_path, image_cache), examples,
+                                                **options)
+                results[file_name] = response
+                total_saved += stats["tokens_saved"]
+                print(format_stats(stats))
+            except Exception as e:
+                print(f"Error processing {file_name}: {e}")
+                results[file_name] = {"error": str(e)}
+
+            # Incremental save after processing each file
+            with open(output_json_path, "w", encoding="utf-8") as json_file:
+                json.dump(results, json_file, ensure_ascii=False, indent=4)
+
+            print(f"Saved progress: {file_name} processed.")
+
+    if options.get("stop_on_close"):
+        print(f"Tokens saved by stopping on closure: {total_saved}")
+    print(f"Processing complete. Results saved to {output_json_path}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Few-shot PENMAN parsing of tombstone images with Qwen2.5-VL.")
+    parser.add_argument("--model", type=str, default="Qwen/Qwen2.5-VL-72B-Instruct",
+                        help="Model name (default: Qwen/Qwen2.5-VL-72B-Instruct)")
+    parser.add_argument("--folder_path", type=str,
+                        default="/gpfs/work4/0/prjs0885/Tombstone-Parsing/data/split/test_images",
+                        help="Folder containing the tombstone images to parse")
+    parser.add_argument("--output_json_path", type=str, default="qwen_72b_one_shot.json",
+                        help="JSON file to save the results to")
+    parser.add_argument("--shots", type=str, nargs="*", default=[],
+                        help="Ids of the annotated tombstones used as examples, e.g. t00004 t00007")
+    parser.add_argument("--annotation_file", type=str, default="../../data/annotation/tombs_grounded.txt",
+                        help="TMR annotations the examples are taken from")
+    parser.add_argument("--example_folder", type=str,
+                        default="/gpfs/work4/0/prjs0885/Tombstone-Parsing/data/split/train_images",
+                        help="Folder containing the images of the examples")
+    parser.add_argument("--constrained", action="store_true",
+                        help="Only generate well-formed TMRs (grammar-constrained decoding)")
+    parser.add_argument("--stop_on_close", action="store_true",
+                        help="Stop generating once the root graph is closed and trim the trailing text")
+    parser.add_argument("--draft_model", type=str, default=None,
+                        help="Draft model for assisted generation, e.g. Qwen/Qwen2.5-VL-3B-Instruct")
+    parser.add_argument("--measure_speedup", action="store_true",
+                        help="Also generate without the draft model to log the speedup per image")
+    parser.add_argument("--decoding", type=str, default="sample", choices=sorted(DECODING_PRESETS),
+                        help="Decoding preset: sample, greedy or beam (default: sample)")
+    parser.add_argument("--num_beams", type=int, default=None,
+                        help="Beam width of the beam preset (default: 4)")
+    parser.add_argument("--image_cache", type=str, default=None,
+                        help="Folder of downscaled image copies to read the images from when present")
+    args = parser.parse_args()
+
+    model, processor = load_model(args.model)
+    assistant_model = None
+    if args.draft_model:
+        # the draft model uses the same tokenizer and image processor, only the weights are needed
+        assistant_model, _ = load_model(args.draft_model)
+    examples = load_examples(args.annotation_file, args.example_folder, args.shots)
+    examples = [(cached_image(path, args.image_cache), amr) for path, amr in examples]
+    process_folder(model, processor, args.folder_path, examples, args.output_json_path,
+                   image_cache=args.image_cache,
+                   constrained=args.constrained, stop_on_close=args.stop_on_close,
+                   assistant_model=assistant_model, measure_speedup=args.measure_speedup,
+                   decoding=args.decoding, num_beams=args.num_beams)
+
+
+if __name__ == "__main__":
+    main()
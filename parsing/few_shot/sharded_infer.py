@@ -0,0 +1,219 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Parse a folder of tombstone images with several worker processes.
+
+Every worker loads its own copy of the model on its own device set (or on the CPU) and takes images from a
+shared queue, so a worker that gets slow images simply takes fewer of them. The main process collects the
+answers and saves them incrementally in the same JSON format as qwen_infer.py / qwen_*_shot.py, so an
+interrupted run can be resumed. A worker that dies (e.g. killed for running out of memory) loses the image it
+was parsing; the run goes on with the other workers, reports the lost images and exits with status 1.
+
+Parameters:
+  --devices          : Device set of every worker, separated by ";", e.g. "0,1;2,3" starts two workers on
+                       two GPUs each. "cpu" starts a CPU worker, "cpu;cpu" two of them.
+  --dummy            : Use a dummy parser instead of a model (no torch needed), to try the launcher on CPU.
+  The other parameters are those of qwen_infer.py.
+
+Example:
+  python sharded_infer.py --devices "0,1;2,3" --shots t00004 --stop_on_close --output_json_path out.json
+  python sharded_infer.py --devices "cpu;cpu;cpu" --dummy --folder_path ../../data/images
+"""
+
+import argparse
+import json
+import multiprocessing as mp
+import os
+import queue
+import sys
+import time
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg')
+
+# seconds between two checks for workers that died
+POLL_SECONDS = 5
+
+
+def dummy_process_image(image_path):
+    """
+    Stand-in for qwen_infer.process_image: an empty tombstone graph for every image. An image named crash*
+    kills the worker, as a worker killed while parsing (e.g. out of memory).
+    """
+    idx = os.path.splitext(os.path.basename(image_path))[0]
+    if idx.startswith("crash"):
+        os._exit(1)
+    # pretend that images take different amounts of time, to exercise the shared queue
+    time.sleep(0.01 * (sum(map(ord, idx)) % 5))
+    return f"({idx} / tombstone.n.01)", {"generated_tokens": 0, "tokens_saved": 0}
+
+
+def worker(worker_id, devices, args, tasks, results, holding):
+    """
+    Take (index, image path) tasks until a None sentinel arrives, and put (worker_id, file_name, response, stats)
+    on results. A failing image is reported as {"error": ...}, as in process_folder. The index of the image a
+    worker is parsing is kept in holding[worker_id] (-1 for none), shared memory that is still readable when the
+    worker dies; "ready" and "done" are put on results with file_name None.
+    """
+    # must be set before torch is imported in this process
+    os.environ["CUDA_VISIBLE_DEVICES"] = "" if devices == "cpu" else devices
+    if args.dummy:
+        def parse(image_path):
+            return dummy_process_image(image_path)
+    else:
+        import qwen_infer
+
+        device_map = "cpu" if devices == "cpu" else "auto"
+        model, processor = qwen_infer.load_model(args.model, device_map=device_map)
+        assistant_model = None
+        if args.draft_model:
+            assistant_model, _ = qwen_infer.load_model(args.draft_model, device_map=device_map)
+        examples = qwen_infer.load_examples(args.annotation_file, args.example_folder, args.shots)
+        examples = [(qwen_infer.cached_image(path, args.image_cache), amr) for path, amr in examples]
+
+        def parse(image_path):
+            image_path = qwen_infer.cached_image(image_path, args.image_cache)
+            return qwen_infer.process_image(model, processor, image_path, examples,
+                                            constrained=args.constrained, stop_on_close=args.stop_on_close,
+                                            assistant_model=assistant_model, decoding=args.decoding,
+                                            num_beams=args.num_beams)
+    results.put((worker_id, None, "ready", {}))
+    while True:
+        task = tasks.get()
+        if task is None:
+            break
+        holding[worker_id], file_path = task
+        file_name = os.path.basename(file_path)
+        try:
+            response, stats = parse(file_path)
+        except Exception as e:
+            response, stats = {"error": str(e)}, {}
+        results.put((worker_id, file_name, response, stats))
+        holding[worker_id] = -1
+    results.put((worker_id, None, "done", {}))
+
+
+def process_folder_sharded(folder_path, output_json_path, devices, args):
+    """Parse the images of folder_path not in output_json_path yet, returns the results and the unprocessed files"""
+    # Load existing results if the JSON file already exists
+    if os.path.exists(output_json_path):
+        with open(output_json_path, "r", encoding="utf-8") as json_file:
+            results = json.load(json_file)
+    else:
+        results = {}
+
+    file_names = sorted(f for f in os.listdir(folder_path) if f.lower().endswith(IMAGE_EXTENSIONS))
+    pending = [f for f in file_names if f not in results]
+    print(f"Total files to process: {len(file_names)}")
+    print(f"Already processed files: {len(file_names) - len(pending)}")
+    print(f"Workers: {len(devices)} ({'; '.join(devices)})")
+
+    # spawn, so that CUDA is initialised separately in every worker
+    ctx = mp.get_context("spawn")
+    tasks = ctx.Queue()
+    answers = ctx.Queue()
+    # index in pending of the image every worker is parsing, -1 for none
+    holding = ctx.Array("i", [-1] * len(devices), lock=False)
+    for index, file_name in enumerate(pending):
+        tasks.put((index, os.path.join(folder_path, file_name)))
+    for _ in devices:
+        tasks.put(None)
+
+    processes = [ctx.Process(target=worker, args=(i, d, args, tasks, answers, holding))
+                 for i, d in enumerate(devices)]
+    for p in processes:
+        p.start()
+
+    per_worker = [0] * len(devices)
+    # whether every worker finished (sent "done" or died)
+    finished = [False] * len(devices)
+    lost = []
+    done = 0
+    while not all(finished):
+        try:
+            worker_id, file_name, response, stats = answers.get(timeout=POLL_SECONDS)
+        except queue.Empty:
+            # the queue is empty, so a dead worker will not send anything anymore
+            for i, p in enumerate(processes):
+                if not finished[i] and not p.is_alive():
+                    finished[i] = True
+                    file_name = pending[holding[i]] if holding[i] >= 0 else None
+                    print(f"Worker {i} ({devices[i]}) exited unexpectedly (exit code {p.exitcode})"
+                          + (f" while parsing {file_name}." if file_name else "."))
+                    if file_name and file_name not in results:
+                        lost.append(file_name)
+            continue
+        if file_name is None:
+            if response == "done":
+                finished[worker_id] = True
+            else:
+                print(f"Worker {worker_id} ready.")
+            continue
+        done += 1
+        per_worker[worker_id] += 1
+        results[file_name] = response
+        print(f"Processed ({done}/{len(pending)}) by worker {worker_id}: {file_name}")
+
+        # Incremental save after processing each file
+        with open(output_json_path, "w", encoding="utf-8") as json_file:
+            json.dump(results, json_file, ensure_ascii=False, indent=4)
+
+    unprocessed = [f for f in pending if f not in results]
+    if unprocessed:
+        # the paths no worker took are still in the pipe of tasks, do not wait for them to be written at exit
+        tasks.cancel_join_thread()
+        answers.cancel_join_thread()
+    for p in processes:
+        p.join()
+    for i, count in enumerate(per_worker):
+        print(f"Worker {i} ({devices[i]}) processed {count} files.")
+    if unprocessed:
+        print(f"Processing incomplete: {len(lost)} files lost by crashed workers ({', '.join(lost) or 'none'}), "
+              f"{len(unprocessed) - len(lost)} other files not processed. Results saved to {output_json_path}, "
+              f"run again to resume.")
+    else:
+        print(f"Processing complete. Results saved to {output_json_path}")
+    return results, unprocessed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sharded few-shot PENMAN parsing of tombstone images.")
+    parser.add_argument("--devices", type=str, default="cpu",
+                        help='Device set per worker, separated by ";", e.g. "0,1;2,3" or "cpu;cpu"')
+    parser.add_argument("--dummy", action="store_true",
+                        help="Use a dummy parser instead of the model")
+    parser.add_argument("--model", type=str, default="Qwen/Qwen2.5-VL-72B-Instruct",
+                        help="Model name (default: Qwen/Qwen2.5-VL-72B-Instruct)")
+    parser.add_argument("--folder_path", type=str,
+                        default="/gpfs/work4/0/prjs0885/Tombstone-Parsing/data/split/test_images",
+                        help="Folder containing the tombstone images to parse")
+    parser.add_argument("--output_json_path", type=str, default="qwen_72b_one_shot.json",
+                        help="JSON file to save the results to")
+    parser.add_argument("--shots", type=str, nargs="*", default=[],
+                        help="Ids of the annotated tombstones used as examples, e.g. t00004 t00007")
+    parser.add_argument("--annotation_file", type=str, default="../../data/annotation/tombs_grounded.txt",
+                        help="TMR annotations the examples are taken from")
+    parser.add_argument("--example_folder", type=str,
+                        default="/gpfs/work4/0/prjs0885/Tombstone-Parsing/data/split/train_images",
+                        help="Folder containing the images of the examples")
+    parser.add_argument("--constrained", action="store_true",
+                        help="Only generate well-formed TMRs (grammar-constrained decoding)")
+    parser.add_argument("--stop_on_close", action="store_true",
+                        help="Stop generating once the root graph is closed and trim the trailing text")
+    parser.add_argument("--draft_model", type=str, default=None,
+                        help="Draft model for assisted generation, e.g. Qwen/Qwen2.5-VL-3B-Instruct")
+    parser.add_argument("--decoding", type=str, default="sample", choices=["beam", "greedy", "sample"],
+                        help="Decoding preset: sample, greedy or beam (default: sample)")
+    parser.add_argument("--num_beams", type=int, default=None,
+                        help="Beam width of the beam preset (default: 4)")
+    parser.add_argument("--image_cache", type=str, default=None,
+                        help="Folder of downscaled image copies to read the images from when present")
+    args = parser.parse_args()
+
+    devices = [d.strip() for d in args.devices.split(";") if d.strip()]
+    _, unprocessed = process_folder_sharded(args.folder_path, args.output_json_path, devices, args)
+    if unprocessed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
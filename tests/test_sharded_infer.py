@@ -0,0 +1,64 @@
+import json
+import os
+import subprocess
+import sys
+
+FEW_SHOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "parsing", "few_shot")
+
+
+def make_images(folder, names):
+    folder.mkdir()
+    for name in names:
+        (folder / name).write_bytes(b"")
+
+
+def run_launcher(images, output, timeout=300):
+    return subprocess.run([sys.executable, "sharded_infer.py", "--devices", "cpu;cpu", "--dummy",
+                           "--folder_path", str(images), "--output_json_path", str(output)],
+                          cwd=FEW_SHOT, capture_output=True, text=True, timeout=timeout)
+
+
+def test_dummy_workers_merge_one_entry_per_image(tmp_path):
+    images = tmp_path / "images"
+    names = [f"t{i:05d}.jpg" for i in range(7)]
+    make_images(images, names)
+    (images / "notes.txt").write_text("not an image")
+    output = tmp_path / "out.json"
+
+    completed = run_launcher(images, output)
+
+    assert completed.returncode == 0, completed.stdout + completed.stderr
+    with open(output, encoding="utf-8") as f:
+        results = json.load(f)
+    assert sorted(results) == names
+    for name, response in results.items():
+        assert response == f"({os.path.splitext(name)[0]} / tombstone.n.01)"
+
+
+def test_crashed_worker_loses_its_image(tmp_path):
+    images = tmp_path / "images"
+    names = [f"t{i:05d}.jpg" for i in range(7)]
+    # sorted first, so one of the workers takes it and dies, the other one parses the rest
+    make_images(images, ["crash.jpg"] + names)
+    output = tmp_path / "out.json"
+
+    completed = run_launcher(images, output)
+
+    assert completed.returncode == 1
+    assert "crash.jpg" in completed.stdout
+    assert "Processing complete" not in completed.stdout
+    with open(output, encoding="utf-8") as f:
+        assert sorted(json.load(f)) == names
+
+
+def test_all_workers_crashed_does_not_hang(tmp_path):
+    images = tmp_path / "images"
+    # enough paths to fill the pipe of the task queue, which no worker reads after both crashed
+    make_images(images, ["crash0.jpg", "crash1.jpg"] + [f"t{i:05d}.jpg" for i in range(3000)])
+    output = tmp_path / "out.json"
+
+    completed = run_launcher(images, output, timeout=120)
+
+    assert completed.returncode == 1
+    assert "crash0.jpg" in completed.stdout and "crash1.jpg" in completed.stdout
+    assert not output.exists() or json.load(open(output, encoding="utf-8")) == {}
@@ -0,0 +1,45 @@
+import io
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.append(os.path.join(ROOT, "parsing", "evaluation", "utils"))
+
+from penman_parser import get_penman_line
+from tmr_graph import TMRGraph
+
+
+def assert_round_trip(text):
+    graph = TMRGraph.from_penman(text)
+    written = graph.to_penman()
+    # the nodes may be written in another order, so the triples are compared with their variable names
+    expected = [sorted(triples) for triples in graph.triples()]
+    assert [sorted(triples) for triples in TMRGraph.from_penman(written).triples()] == expected, written
+
+
+def test_round_trip_of_the_annotations():
+    with open(os.path.join(ROOT, "data", "annotation", "tombs_grounded.txt"), encoding="utf-8") as f:
+        texts = f.read().split("\n\n")
+    for text in texts:
+        assert_round_trip(get_penman_line(io.StringIO(text)))
+
+
+@pytest.mark.parametrize("text", [
+    # :consist-of is not an inversion, so a consist edge reachable only backwards is written from its source
+    "(a / x :ARG1 (c / z)) (b / y :consist a)",
+    "(a / x :consist-of (b / y))",
+    "(a / x :ARG0 (b / y :consist-of a))",
+    "(a / x :prep-out (b / y)) (c / z :prep-on-behalf a)",
+    # roles ending in -of and :mod can not be written forwards
+    "(a / x :part-of-of (b / y))",
+    "(a / x :mod (b / y))",
+])
+def test_round_trip_of_roles_that_are_not_inverted(text):
+    assert_round_trip(text)
+
+
+def test_backward_consist_edge_is_not_written_as_consist_of():
+    written = TMRGraph.from_penman("(a / x :ARG1 (c / z)) (b / y :consist a)").to_penman()
+    assert ":consist-of" not in written